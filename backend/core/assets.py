@@ -0,0 +1,165 @@
+# backend/core/assets.py
+"""
+Статика с отпечатками: backend/static → backend/static_build.
+
+    python -m backend.core.assets     # сборка при деплое (иначе — при старте приложения)
+
+Каждый файл копируется под именем с хэшем содержимого (style.3f2a9c1b7e4d.css),
+текстовые — ещё и в сжатом виде (.gz, .br если установлен brotli). Такие URL
+никогда не меняют содержимое, поэтому отдаются с Cache-Control: immutable на год:
+повторный визит не делает ни одного запроса за статикой.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import uuid
+from pathlib import Path
+
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # без brotli — только gzip
+    brotli = None
+
+STATIC_DIR = Path("backend/static")
+BUILD_DIR = Path(os.getenv("STATIC_BUILD_DIR", "backend/static_build"))
+STATIC_URL = "/static/"
+MANIFEST_NAME = "manifest.json"
+BUILD_ON_STARTUP = os.getenv("STATIC_BUILD_ON_STARTUP", "1") == "1"
+
+# пользовательские файлы меняются без деплоя — их отдаём как есть
+SKIP_DIRS = {"avatars", "uploads"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+# аватары уже названы по sha256 содержимого (services/avatars.py)
+_CONTENT_ADDRESSED = re.compile(r"^avatars/[0-9a-f]{64}[._]")
+
+_manifest: dict[str, str] = {}
+_hashed: frozenset[str] = frozenset()
+
+
+# -----------------------------------------------------
+# Сборка
+# -----------------------------------------------------
+def _write_atomic(path: Path, data: bytes) -> None:
+    # несколько воркеров могут собирать одновременно — читатель не увидит половину файла
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _variants(data: bytes) -> dict[str, bytes]:
+    out = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out[".br"] = brotli.compress(data, quality=11)
+    # сжатый вариант, который не меньше оригинала, не нужен
+    return {suffix: body for suffix, body in out.items() if len(body) < len(data)}
+
+
+def build_assets(source: Path = STATIC_DIR, target: Path = BUILD_DIR) -> dict[str, str]:
+    """Копирует статику под хэш-именами и пишет манифест {путь: путь с хэшем}."""
+    manifest = {}
+    for path in sorted(source.rglob("*")):
+        relative = path.relative_to(source)
+        if not path.is_file() or relative.parts[0] in SKIP_DIRS:
+            continue
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed = relative.with_name(f"{relative.stem}.{digest}{relative.suffix}").as_posix()
+        manifest[relative.as_posix()] = hashed
+
+        out = target / hashed
+        if out.exists():
+            continue  # то же содержимое уже собрано
+        out.parent.mkdir(parents=True, exist_ok=True)
+        if relative.suffix.lower() in COMPRESSIBLE:
+            for suffix, body in _variants(data).items():
+                _write_atomic(out.with_name(out.name + suffix), body)
+        _write_atomic(out, data)
+
+    target.mkdir(parents=True, exist_ok=True)
+    _write_atomic(target / MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(target: Path = BUILD_DIR) -> dict[str, str]:
+    try:
+        return json.loads((target / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def init_assets() -> None:
+    """При старте: собрать (или прочитать собранный при деплое) манифест."""
+    global _manifest, _hashed
+    _manifest = build_assets() if BUILD_ON_STARTUP else load_manifest()
+    _hashed = frozenset(_manifest.values())
+
+
+def static_url(path: str) -> str:
+    """
+    URL файла статики с отпечатком. Принимает 'style.css' или '/static/style.css'
+    (так хранятся картинки рамок и значков). Файлов вне манифеста — как есть.
+    """
+    if not path:
+        return path
+    relative = path.removeprefix(STATIC_URL).lstrip("/").split("?", 1)[0]
+    hashed = _manifest.get(relative)
+    if hashed is None:
+        return path if path.startswith("/") else STATIC_URL + path
+    return STATIC_URL + hashed
+
+
+# -----------------------------------------------------
+# Отдача
+# -----------------------------------------------------
+def _accepted(scope) -> set[str]:
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            return {part.split(";")[0].strip() for part in value.decode("latin-1").lower().split(",")}
+    return set()
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    /static: файлы с отпечатком — из сборки, с immutable-кэшем и готовым
+    br/gzip по Accept-Encoding; всё остальное (аватары, старые ссылки) —
+    обычный StaticFiles по исходной папке с ETag/Last-Modified.
+    """
+
+    def __init__(self, source: Path = STATIC_DIR, build: Path = BUILD_DIR):
+        build.mkdir(parents=True, exist_ok=True)
+        super().__init__(directory=source)
+        self.build = build
+
+    async def get_response(self, path: str, scope):
+        if path in _hashed:
+            return self._hashed_response(path, scope)
+        response = await super().get_response(path, scope)
+        if response.status_code == 200 and _CONTENT_ADDRESSED.match(path):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+    def _hashed_response(self, path: str, scope):
+        file = self.build / path
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+
+        accepted = _accepted(scope)
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            variant = file.with_name(file.name + suffix)
+            if encoding in accepted and variant.exists():
+                headers["Content-Encoding"] = encoding
+                return FileResponse(variant, media_type=media_type, headers=headers)
+        return FileResponse(file, media_type=media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    built = build_assets()
+    print(f"{len(built)} files → {BUILD_DIR}")
@@ -1,15 +1,82 @@
 # backend/core/auth.py
-from backend.database import SessionLocal
+from backend.database import SessionLocal, get_async_db
 from backend.models import User
-from fastapi import Request
-from sqlalchemy.orm import joinedload
+from backend.core.session_tokens import SessionClaims, session_claims
+from fastapi import Request, HTTPException, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ключ в request.state, под которым лежит пользователь текущего запроса
+_USER_STATE_KEY = "current_user"
+_MISSING = object()
 
-def current_user(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id:
-        return None
 
+def _load_user(claims: SessionClaims) -> User | None:
     db = SessionLocal()
-    user = db.query(User).options(joinedload(User.frames)).filter(User.id == user_id).first()
-    db.close()
+    try:
+        # рамки/значки страницы берут из проекции инвентаря (services/inventory.py)
+        user = db.query(User).filter(User.id == claims.user_id).first()
+    finally:
+        db.close()
+
+    # сессия отозвана (смена пароля и т.п.)
+    if user and (user.session_version or 0) != claims.version:
+        return None
+    return user
+
+
+def current_user(request: Request):
+    """
+    Пользователь текущего запроса.
+    Загружается из БД один раз за запрос и кэшируется в request.state,
+    так что middleware, Depends(current_user) и шаблоны делят один объект.
+    """
+    cached = getattr(request.state, _USER_STATE_KEY, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    claims = session_claims(request)
+    user = _load_user(claims) if claims else None
+
+    setattr(request.state, _USER_STATE_KEY, user)
+    return user
+
+
+async def current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    То же, что current_user, но через AsyncSession — для `async def` эндпоинтов.
+    Кладёт пользователя в тот же кэш request.state, поэтому вызовы
+    current_user(request) из шаблонов уже не ходят в БД и не блокируют loop.
+    """
+    cached = getattr(request.state, _USER_STATE_KEY, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    claims = session_claims(request)
+    user = None
+    if claims:
+        user = (await db.execute(
+            select(User).where(User.id == claims.user_id)
+        )).scalar_one_or_none()
+        if user and (user.session_version or 0) != claims.version:
+            user = None
+
+    setattr(request.state, _USER_STATE_KEY, user)
     return user
+
+
+def current_identity(request: Request) -> SessionClaims:
+    """
+    Только id/роль/статус профиля из подписанного токена — без загрузки User.
+    Для эндпоинтов, которым не нужна вся модель пользователя.
+    """
+    claims = session_claims(request)
+    if not claims:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return claims
+
+
+def forget_current_user(request: Request) -> None:
+    """Сбросить кэш, если пользователь изменился в ходе запроса."""
+    if hasattr(request.state, _USER_STATE_KEY):
+        delattr(request.state, _USER_STATE_KEY)
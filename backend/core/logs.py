@@ -0,0 +1,197 @@
+# backend/core/logs.py
+"""
+Логирование приложения: JSON в stdout через очередь.
+
+Код запроса только кладёт запись в очередь (без записи в stdout и без ожидания);
+пишет её отдельный поток QueueListener. Очередь ограничена — при переполнении
+записи отбрасываются, а не тормозят запросы.
+
+    LOG_LEVEL=INFO                                   # уровень по умолчанию
+    LOG_LEVELS=backend.services.email_service=DEBUG,sqlalchemy.engine=WARNING
+    LOG_FORMAT=json | text
+    LOG_DEBUG_SAMPLE_RATE=0.01                       # доля запросов, чьи DEBUG-записи пишутся
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from backend.core.request_context import current_request_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# поля LogRecord, которые не считаются «extra»
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+# -----------------------------------------------------
+# Фильтры (выполняются в потоке, который пишет лог)
+# -----------------------------------------------------
+class RequestIdFilter(logging.Filter):
+    """Добавляет id текущего HTTP-запроса (X-Request-ID) к каждой записи."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = current_request_id()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    DEBUG-записи пишутся для доли запросов rate. Решение принимается по id запроса,
+    поэтому у попавшего в выборку запроса видны все его DEBUG-записи.
+    """
+
+    def __init__(self, rate: float = DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.threshold = int(rate * 10_000)
+        self._counter = 0
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.threshold >= 10_000:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            return zlib.crc32(request_id.encode()) % 10_000 < self.threshold
+        # вне запроса — каждая N-я
+        self._counter += 1
+        return self.threshold > 0 and self._counter % (10_000 // self.threshold) == 0
+
+
+SENSITIVE_KEYS = (
+    "password", "passwd", "secret", "token", "api_key", "apikey", "authorization", "cookie",
+    "code", "verification_code", "email_code",
+)
+# extra-поле скрывается, если его имя — целиком из SENSITIVE_KEYS или одна из частей
+# через «_» отсюда (new_password, access_token). «code» только целиком: status_code — не секрет
+SENSITIVE_PARTS = frozenset({"password", "passwd", "secret", "token", "apikey", "authorization", "cookie"})
+_SENSITIVE_TEXT = re.compile(
+    r"(?i)\b(" + "|".join(SENSITIVE_KEYS) + r"|key)\b(\s*[:=]\s*)(\"[^\"]*\"|'[^']*'|\S+)"
+)
+_BEARER = re.compile(r"(?i)\bbearer\s+[A-Za-z0-9._~+/=-]+")
+REDACTED = "[REDACTED]"
+
+
+def sensitive_key(key: str) -> bool:
+    key = key.lower()
+    return key in SENSITIVE_KEYS or not SENSITIVE_PARTS.isdisjoint(key.split("_"))
+
+
+def redact(text: str) -> str:
+    # сначала «Bearer <токен>», иначе правило ключей съест только слово Bearer
+    text = _BEARER.sub(f"Bearer {REDACTED}", text)
+    return _SENSITIVE_TEXT.sub(lambda m: f"{m.group(1)}{m.group(2)}{REDACTED}", text)
+
+
+class RedactionFilter(logging.Filter):
+    """Секреты и коды — из текста сообщения и из extra-полей с «опасными» именами."""
+
+    def filter(self, record):
+        message = record.getMessage()
+        cleaned = redact(message)
+        if cleaned != message:
+            record.msg, record.args = cleaned, None
+        for key in list(vars(record)):
+            if key not in _RESERVED and sensitive_key(key):
+                setattr(record, key, REDACTED)
+        return True
+
+
+# -----------------------------------------------------
+# Вывод
+# -----------------------------------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Не ждёт места в очереди: переполнена — запись теряется (и считается)."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # в очередь — копия с готовым текстом: args и traceback не переживут поток
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: QueueListener | None = None
+
+
+def setup_logging() -> None:
+    """Один раз при старте процесса; повторный вызов ничего не делает."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    for log_filter in (RequestIdFilter(), DebugSamplingFilter(), RedactionFilter()):
+        handler.addFilter(log_filter)
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Дописать очередь и остановить поток вывода."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,90 @@
+# backend/core/request_context.py
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+from fastapi import Request
+from sqlalchemy import event
+
+# -----------------------------------------------------
+# Счётчик SQL-запросов текущего HTTP-запроса
+# -----------------------------------------------------
+# В contextvar лежит изменяемый счётчик: sync-эндпоинты выполняются
+# в threadpool с копией контекста, поэтому инкременты видны middleware.
+_query_counter: ContextVar[list | None] = ContextVar("query_counter", default=None)
+
+QUERY_COUNT_HEADER = "X-DB-Queries"
+
+
+def install_query_counter(engine) -> None:
+    """Подписывает engine на подсчёт запросов в рамках текущего HTTP-запроса."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def current_query_count() -> int:
+    counter = _query_counter.get()
+    return counter[0] if counter is not None else 0
+
+
+async def track_request_queries(request: Request, call_next):
+    """Middleware: считает SQL-запросы запроса и отдаёт их в заголовке."""
+    counter = [0]
+    token = _query_counter.set(counter)
+    try:
+        response = await call_next(request)
+    finally:
+        _query_counter.reset(token)
+
+    request.state.db_queries = counter[0]
+    response.headers[QUERY_COUNT_HEADER] = str(counter[0])
+    return response
+
+
+# -----------------------------------------------------
+# Id запроса для логов (X-Request-ID)
+# -----------------------------------------------------
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+logger = logging.getLogger(__name__)
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+async def track_request_id(request: Request, call_next):
+    """
+    Middleware: берёт id от балансировщика (X-Request-ID) или выдаёт свой;
+    он попадает в каждую запись лога этого запроса и в заголовок ответа.
+    """
+    incoming = request.headers.get(REQUEST_ID_HEADER, "")
+    request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex[:16]
+    token = _request_id.set(request_id)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+        logger.debug(
+            "request finished",
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "db_queries": getattr(request.state, "db_queries", None),
+            },
+        )
+    finally:
+        _request_id.reset(token)
+
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
@@ -0,0 +1,198 @@
+# backend/core/session_tokens.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from fastapi import Request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import update
+
+from backend.database import SessionLocal
+from backend.models import User
+
+SESSION_COOKIE = "auth_token"
+TOKEN_MAX_AGE = 86400 * 7  # 7 дней, как и у SessionMiddleware
+
+# как часто (сек) перепроверять claims по БД — окно, за которое
+# отзыв сессии из другого процесса гарантированно вступит в силу
+REVALIDATE_SECONDS = int(os.getenv("SESSION_REVALIDATE_SECONDS", "30"))
+CACHE_MAX_ENTRIES = 10_000
+
+_serializer = URLSafeTimedSerializer(
+    os.getenv("SESSION_SECRET_KEY", "supersecretkey123"),
+    salt="auth-session",
+)
+
+_CLAIMS_STATE_KEY = "session_claims"
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class SessionClaims:
+    user_id: int
+    role_id: int | None
+    profile_completed: bool
+    version: int
+
+    @property
+    def id(self) -> int:
+        return self.user_id
+
+
+@dataclass
+class _CacheEntry:
+    claims: SessionClaims
+    checked_at: float
+
+
+# -----------------------------------------------------
+# Процессный кэш проверенных токенов
+# -----------------------------------------------------
+_cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+_cache_lock = threading.Lock()
+# минимальная валидная версия сессии по user_id (локальный отзыв без ожидания):
+# user_id → (версия, время отзыва). Через REVALIDATE_SECONDS запись не нужна —
+# все закэшированные claims к тому времени перепроверятся по БД
+_revoked_before: "OrderedDict[int, tuple[int, float]]" = OrderedDict()
+
+
+def _prune_revoked(now: float) -> None:
+    # порядок — по времени отзыва: устаревшие в начале (вызывать под _cache_lock)
+    while _revoked_before:
+        _, revoked_at = next(iter(_revoked_before.values()))
+        if now - revoked_at < REVALIDATE_SECONDS:
+            break
+        _revoked_before.popitem(last=False)
+
+
+def _min_version(user_id: int, now: float) -> int:
+    with _cache_lock:
+        _prune_revoked(now)
+        revoked = _revoked_before.get(user_id)
+    return revoked[0] if revoked else 0
+
+
+def issue_session_token(user: User) -> str:
+    return _serializer.dumps({
+        "id": user.id,
+        "r": user.role_id,
+        "pc": bool(user.profile_completed),
+        "v": user.session_version or 0,
+    })
+
+
+def set_session_cookie(response, user: User) -> None:
+    response.set_cookie(
+        SESSION_COOKIE,
+        issue_session_token(user),
+        max_age=TOKEN_MAX_AGE,
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def clear_session_cookie(response) -> None:
+    response.delete_cookie(SESSION_COOKIE)
+    response.delete_cookie("user_id")  # старая cookie до перехода на токены
+
+
+def _decode(token: str) -> SessionClaims | None:
+    try:
+        data = _serializer.loads(token, max_age=TOKEN_MAX_AGE)
+        return SessionClaims(
+            user_id=int(data["id"]),
+            role_id=data.get("r"),
+            profile_completed=bool(data.get("pc")),
+            version=int(data.get("v", 0)),
+        )
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def _revalidate(claims: SessionClaims) -> SessionClaims | None:
+    """Один лёгкий SELECT без ORM-гидрации: версия, роль, статус профиля."""
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(User.session_version, User.role_id, User.profile_completed)
+            .filter(User.id == claims.user_id)
+            .first()
+        )
+    finally:
+        db.close()
+
+    if row is None or (row.session_version or 0) != claims.version:
+        return None
+    return replace(claims, role_id=row.role_id, profile_completed=bool(row.profile_completed))
+
+
+def verify_session_token(token: str) -> SessionClaims | None:
+    now = time.monotonic()
+
+    with _cache_lock:
+        entry = _cache.get(token)
+        if entry is not None:
+            _cache.move_to_end(token)
+
+    if entry is not None:
+        claims = entry.claims
+        if claims.version < _min_version(claims.user_id, now):
+            invalidate_token(token)
+            return None
+        if now - entry.checked_at < REVALIDATE_SECONDS:
+            return claims
+    else:
+        claims = _decode(token)
+        if claims is None:
+            return None
+
+    claims = _revalidate(claims)
+    if claims is None:
+        invalidate_token(token)
+        return None
+
+    with _cache_lock:
+        _cache[token] = _CacheEntry(claims, now)
+        _cache.move_to_end(token)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return claims
+
+
+def invalidate_token(token: str) -> None:
+    with _cache_lock:
+        _cache.pop(token, None)
+
+
+def revoke_sessions(db, user_id: int) -> int:
+    """
+    Отзывает все выданные сессии пользователя (bump версии).
+    Вызывающий сам делает commit; новая версия возвращается,
+    чтобы текущему клиенту можно было сразу выдать свежий токен.
+    """
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(session_version=User.session_version + 1)
+    )
+    version = db.query(User.session_version).filter(User.id == user_id).scalar()
+    with _cache_lock:
+        now = time.monotonic()
+        _prune_revoked(now)
+        _revoked_before[user_id] = (version, now)
+        _revoked_before.move_to_end(user_id)
+    return version
+
+
+def session_claims(request: Request) -> SessionClaims | None:
+    """Claims из cookie текущего запроса (кэшируются в request.state)."""
+    cached = getattr(request.state, _CLAIMS_STATE_KEY, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    token = request.cookies.get(SESSION_COOKIE)
+    claims = verify_session_token(token) if token else None
+    setattr(request.state, _CLAIMS_STATE_KEY, claims)
+    return claims
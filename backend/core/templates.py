@@ -1,19 +1,11 @@
 from fastapi.templating import Jinja2Templates
+from backend.core.auth import current_user
+from backend.core.assets import static_url
 
 templates = Jinja2Templates(directory="backend/templates")
 
-from fastapi.templating import Jinja2Templates
-from backend.database import SessionLocal
-from backend.models import User
-
-
-def current_user(request):
-    user_id = request.cookies.get("user_id")
-    if not user_id:
-        return None
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
-    db.close()
-    return user
-
+# тот же request-scoped current_user, что и в Depends(current_user)
 templates.env.globals["current_user"] = current_user
+
+# URL статики с отпечатком содержимого: {{ static_url('style.css') }}
+templates.env.globals["static_url"] = static_url
@@ -1,12 +1,11 @@
+from backend.services.xp import XP_STEP, award_xp
+
+
 def xp_to_next_level(level: int) -> int:
     # простая формула: каждые 100 * уровень XP
-    return 100 * level
+    return XP_STEP * level
 
 def add_xp(user, amount: int, db):
-    user.xp += amount
-    needed = xp_to_next_level(user.level)
-    while user.xp >= needed:
-        user.xp -= needed
-        user.level += 1
-        needed = xp_to_next_level(user.level)
-    db.commit()
+    """Начислить XP одному пользователю. Уровень считается по формуле в том же UPDATE;
+    коммитит вызывающий (для пачки пользователей — services.xp.award_xp)."""
+    award_xp(db, {user.id: amount})
@@ -1,18 +1,107 @@
+import os
+from dataclasses import dataclass, field
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-MYSQL_USER = "root"
-MYSQL_PASSWORD = ""  # пароль пустой
-MYSQL_HOST = "localhost"
-MYSQL_PORT = "3306"
-MYSQL_DB = "tournaments_db"
+MYSQL_USER = os.getenv("MYSQL_USER", "root")
+MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")  # пароль пустой
+MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
+MYSQL_PORT = os.getenv("MYSQL_PORT", "3306")
+MYSQL_DB = os.getenv("MYSQL_DB", "tournaments_db")
 
-SQLALCHEMY_DATABASE_URL = (
+MYSQL_DATABASE_URL = (
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
 )
+# локальная замена MySQL для нагрузочных тестов
+SQLITE_DATABASE_URL = "sqlite:///./backend/loadtest.db"
+
+
+# -----------------------------------------------------
+# Профили движка: dev / test / prod
+# -----------------------------------------------------
+@dataclass
+class DatabaseSettings:
+    url: str = MYSQL_DATABASE_URL
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_pre_ping: bool = True
+    pool_recycle: int = 3600  # MySQL рвёт простаивающие соединения (wait_timeout)
+    echo: str = "none"        # none / info (SQL) / debug (SQL + строки результата)
+    connect_args: dict = field(default_factory=dict)
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+
+PROFILES = {
+    "dev": DatabaseSettings(echo="info"),
+    "test": DatabaseSettings(url=SQLITE_DATABASE_URL, pool_pre_ping=False),
+    "prod": DatabaseSettings(pool_size=20, max_overflow=20, pool_recycle=1800),
+}
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def load_settings(profile: str | None = None) -> DatabaseSettings:
+    """Профиль из DB_PROFILE + точечные переопределения через DB_* переменные."""
+    profile = profile or os.getenv("DB_PROFILE", "dev")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}', expected one of {sorted(PROFILES)}")
+    base = PROFILES[profile]
+
+    return DatabaseSettings(
+        url=os.getenv("DATABASE_URL", base.url),
+        pool_size=int(os.getenv("DB_POOL_SIZE", base.pool_size)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", base.max_overflow)),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", base.pool_timeout)),
+        pool_pre_ping=_env_bool("DB_POOL_PRE_PING", base.pool_pre_ping),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", base.pool_recycle)),
+        echo=os.getenv("DB_ECHO", base.echo).lower(),
+        connect_args=dict(base.connect_args),
+    )
+
+
+ECHO_LEVELS = {"none": False, "info": True, "debug": "debug"}
+
+
+def build_engine(settings: DatabaseSettings):
+    # в prod логирование SQL выключено: echo само по себе съедает заметную долю CPU
+    echo = ECHO_LEVELS.get(settings.echo, False)
+
+    if settings.is_sqlite:
+        connect_args = {"check_same_thread": False, **settings.connect_args}
+        if ":memory:" in settings.url or settings.url in ("sqlite://", "sqlite:///"):
+            # одна общая in-memory база на все потоки
+            return create_engine(settings.url, echo=echo, connect_args=connect_args, poolclass=StaticPool)
+        return create_engine(settings.url, echo=echo, connect_args=connect_args)
+
+    return create_engine(
+        settings.url,
+        echo=echo,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_recycle=settings.pool_recycle,
+        connect_args=settings.connect_args,
+    )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+
+settings = load_settings()
+SQLALCHEMY_DATABASE_URL = settings.url
+
+engine = build_engine(settings)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -22,3 +111,57 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# -----------------------------------------------------
+# Async-движок для эндпоинтов `async def`
+# -----------------------------------------------------
+# тот же URL и пул, но с асинхронным драйвером: запросы не держат
+# поток из threadpool и не блокируют event loop
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def build_async_engine(settings: DatabaseSettings):
+    url = to_async_url(settings.url)
+    echo = ECHO_LEVELS.get(settings.echo, False)
+
+    if settings.is_sqlite:
+        if ":memory:" in url or url.endswith("://"):
+            return create_async_engine(url, echo=echo, poolclass=StaticPool)
+        return create_async_engine(url, echo=echo)
+
+    return create_async_engine(
+        url,
+        echo=echo,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_recycle=settings.pool_recycle,
+    )
+
+
+async_engine = build_async_engine(settings)
+# expire_on_commit=False: после commit шаблоны читают атрибуты без ленивых запросов
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def init_sqlite_schema() -> None:
+    """Для SQLite-стенда схема создаётся напрямую, без Alembic (миграции под MySQL)."""
+    if settings.is_sqlite:
+        import backend.models  # noqa: F401 — регистрируем все модели в Base.metadata
+        Base.metadata.create_all(bind=engine)
@@ -0,0 +1,100 @@
+"""
+Нагрузочная проверка ачивок: стоимость обработки одного события результата
+матча при разной длине истории пользователя.
+
+    python -m backend.dev_bench_achievements [событий] [истории через запятую]
+
+История — реальные сыгранные матчи в БД и такие же значения счётчиков.
+Время и число SQL-запросов на событие не должны расти вместе с историей.
+"""
+import statistics
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, event, insert, select
+
+from backend.database import SessionLocal, engine, init_sqlite_schema
+from backend.models import User, Team, Tournament, Match, UserStats, UserAchievement
+from backend.services.achievements import invalidate_rules  # импорт подписывает обработчики на события
+from backend.services.catalog_seed import sync_catalog
+from backend.services.events import MATCH_RESULT, publish
+from backend.services.standings import MatchResult
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+HISTORIES = [int(x) for x in sys.argv[2].split(",")] if len(sys.argv) > 2 else [0, 1_000, 10_000, 100_000]
+PREFIX = f"bench-{uuid.uuid4().hex[:8]}"
+
+init_sqlite_schema()
+
+queries = [0]
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(*args):
+    queries[0] += 1
+
+
+# --------------------------
+# Данные
+# --------------------------
+db = SessionLocal()
+sync_catalog(db, sections=("achievements",))
+db.commit()
+invalidate_rules()
+
+tournament = Tournament(name=PREFIX, format="round_robin", discipline="CS2")
+db.add(tournament)
+db.flush()
+tournament_id = tournament.id
+db.execute(insert(User), [
+    {"email": f"{PREFIX}-{i}@bench.local", "password": "-", "profile_completed": True}
+    for i in range(len(HISTORIES) + 1)
+])
+user_ids = db.execute(select(User.id).where(User.email.like(f"{PREFIX}-%")).order_by(User.id)).scalars().all()
+db.execute(insert(Team), [{"name": f"{PREFIX}-{i}", "created_by": user_id} for i, user_id in enumerate(user_ids)])
+team_ids = db.execute(select(Team.id).where(Team.name.like(f"{PREFIX}-%")).order_by(Team.id)).scalars().all()
+opponent = team_ids[-1]
+
+for team_id, user_id, history in zip(team_ids, user_ids, HISTORIES):
+    for start in range(0, history, 10_000):
+        db.execute(insert(Match), [
+            {"tournament_id": tournament_id, "team1_id": team_id, "team2_id": opponent,
+             "score_team1": 1, "score_team2": 0, "round_number": 1, "bracket": "main", "position": i}
+            for i in range(start, min(start + 10_000, history))
+        ])
+    db.execute(insert(UserStats).values(user_id=user_id, matches_played=history, wins=history))
+db.commit()
+db.close()
+
+# --------------------------
+# Нагрузка
+# --------------------------
+print(f"Событий на пользователя: {EVENTS}")
+print(f"{'история':>10} {'p50, мс':>9} {'p99, мс':>9} {'запросов/событие':>17}")
+for team_id, history in zip(team_ids, HISTORIES):
+    latencies = []
+    queries[0] = 0
+    for _ in range(EVENTS):
+        session = SessionLocal()
+        started = time.perf_counter()
+        publish(session, MATCH_RESULT, before=None, after=MatchResult(team_id, opponent, 1, 0))
+        session.commit()
+        latencies.append(time.perf_counter() - started)
+        session.close()
+    latencies.sort()
+    print(f"{history:>10} {statistics.median(latencies) * 1000:>9.2f} "
+          f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>9.2f} {queries[0] / EVENTS:>17.2f}")
+
+# --------------------------
+# Уборка
+# --------------------------
+db = SessionLocal()
+db.execute(delete(Match).where(Match.tournament_id == tournament_id))
+db.execute(delete(UserAchievement).where(UserAchievement.user_id.in_(user_ids)))
+db.execute(delete(UserStats).where(UserStats.user_id.in_(user_ids)))
+db.execute(delete(Team).where(Team.id.in_(team_ids)))
+db.execute(delete(User).where(User.id.in_(user_ids)))
+db.execute(delete(Tournament).where(Tournament.id == tournament_id))
+db.commit()
+db.close()
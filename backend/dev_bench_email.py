@@ -0,0 +1,93 @@
+"""
+Нагрузочная проверка отправки писем: сколько ждёт HTTP-запрос, который
+отправляет код подтверждения, когда провайдер здоров, медленный или лежит.
+
+    python -m backend.dev_bench_email [запросов] [задержка провайдера, с]
+
+Провайдер — FileTransport во временной папке. Для сравнения — старый путь:
+синхронная отправка в пуле потоков прямо из обработчика запроса.
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from backend.services import email_service
+from backend.services.email_service import CircuitBreaker, EmailMessage, EmailQueue, FileTransport
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+SLOW = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+DRAIN = 5.0
+
+email_service.BACKOFF_BASE = 0.05  # чтобы повторы уложились в прогон
+
+sink = tempfile.mkdtemp(prefix="mail-sink-")
+SCENARIOS = {
+    "healthy": FileTransport(sink, delay=0.02),
+    "slow": FileTransport(sink, delay=SLOW),
+    "down": FileTransport(sink, delay=0.02, failure_rate=1.0),
+}
+
+
+async def run(send) -> tuple[list[float], float]:
+    """REQUESTS одновременных «запросов»; возвращает их время и худшую задержку event loop."""
+    lag = [0.0]
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag[0] = max(lag[0], time.perf_counter() - started - 0.01)
+
+    async def request(i):
+        started = time.perf_counter()
+        await send(EmailMessage(f"user{i}@bench.local", "Verification Code", "Your code: 123456"))
+        return time.perf_counter() - started
+
+    tick = asyncio.create_task(ticker())
+    latencies = sorted(await asyncio.gather(*(request(i) for i in range(REQUESTS))))
+    done.set()
+    await tick
+    return latencies, lag[0]
+
+
+def row(name, mode, latencies, lag, extra=""):
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"{name:>8} {mode:>7} {statistics.median(latencies) * 1000:>9.2f} {p99 * 1000:>9.2f} "
+          f"{lag * 1000:>9.2f}  {extra}")
+
+
+async def main():
+    print(f"Запросов: {REQUESTS}, медленный провайдер: {SLOW} с")
+    print(f"{'провайдер':>8} {'путь':>7} {'p50, мс':>9} {'p99, мс':>9} {'лаг, мс':>9}")
+    for name, transport in SCENARIOS.items():
+        # старый путь: запрос ждёт провайдера
+        async def direct(message):
+            try:
+                await run_in_threadpool(transport.send, message)
+            except email_service.TransientEmailError:
+                pass
+
+        latencies, lag = await run(direct)
+        row(name, "direct", latencies, lag)
+
+        outbox = EmailQueue(transport, maxsize=REQUESTS, breaker=CircuitBreaker(threshold=5, reset=1.0))
+        outbox.start()
+
+        async def queued(message):
+            if not outbox.send(message):
+                raise RuntimeError("queue full")
+
+        latencies, lag = await run(queued)
+        await run_in_threadpool(outbox.stop, DRAIN)
+        stats = outbox.stats
+        row(name, "queue", latencies, lag,
+            f"sent={stats['sent']} failed={stats['failed']} retried={stats['retried']} "
+            f"pending={outbox.pending()} breaker={outbox.breaker.state}")
+
+
+asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Нагрузочная проверка логина: поток параллельных POST /login и одновременно
+замер задержки «посторонней» страницы (GET /auth), которой bcrypt не нужен.
+
+    python -m backend.dev_bench_passwords [параллельных логинов] [секунд на режим]
+
+Режимы: inline — bcrypt в общем пуле потоков (как было раньше),
+pool — services/passwords.py (пул процессов с ограниченной очередью).
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert
+
+from backend.database import SessionLocal, init_sqlite_schema
+from backend.main import app
+from backend.models import User
+from backend.services import passwords
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+DURATION = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+PROBE_INTERVAL = 0.05
+EMAIL = f"bench-{uuid.uuid4().hex[:8]}@bench.local"
+PASSWORD = "bench-password"
+
+pooled_run = passwords._run
+
+
+async def inline_run(fn, *args):
+    return await run_in_threadpool(fn, *args)
+
+
+async def flood(client, stop, counts, logins):
+    while not stop.is_set():
+        started = time.perf_counter()
+        r = await client.post("/login", data={"email": EMAIL, "password": PASSWORD})
+        if stop.is_set():
+            break  # досчитываются после окна замера — не учитываем
+        counts[r.status_code] = counts.get(r.status_code, 0) + 1
+        if r.status_code == 303:
+            logins.append(time.perf_counter() - started)
+        if r.status_code == 503:
+            await asyncio.sleep(float(r.headers.get("Retry-After", 1)))
+
+
+async def probe(client, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/auth")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def run(mode):
+    passwords._run = inline_run if mode == "inline" else pooled_run
+    counts, logins, latencies = {}, [], []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/auth")  # прогрев шаблонов
+        tasks = [asyncio.create_task(flood(client, stop, counts, logins)) for _ in range(CONCURRENCY)]
+        tasks.append(asyncio.create_task(probe(client, stop, latencies)))
+        await asyncio.sleep(DURATION)
+        stop.set()
+        await asyncio.gather(*tasks)
+
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    login_p50 = statistics.median(logins) * 1000 if logins else float("nan")
+    print(f"{mode:>7} {len(logins) / DURATION:>11.1f} {login_p50:>14.0f} {counts.get(503, 0):>6} "
+          f"{statistics.median(latencies) * 1000:>12.1f} {p99 * 1000:>12.1f}")
+
+
+async def main():
+    print(f"Параллельных логинов: {CONCURRENCY}, {DURATION:.0f} с на режим, "
+          f"bcrypt rounds={passwords.BCRYPT_ROUNDS}, воркеров={passwords.HASH_WORKERS}")
+    print(f"{'режим':>7} {'логинов/с':>11} {'логин p50, мс':>14} {'503':>6} {'/auth p50, мс':>12} {'/auth p99, мс':>12}")
+    for mode in ("inline", "pool"):
+        await run(mode)
+    passwords.shutdown_pool()
+
+
+# пул процессов стартует через forkserver — дочерние процессы импортируют этот
+# модуль заново, поэтому подготовка и запуск только под __main__
+if __name__ == "__main__":
+    init_sqlite_schema()
+
+    db = SessionLocal()
+    db.execute(insert(User).values(email=EMAIL, password=passwords.pwd_context.hash(PASSWORD), profile_completed=True))
+    db.commit()
+    db.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        db = SessionLocal()
+        db.execute(delete(User).where(User.email == EMAIL))
+        db.commit()
+        db.close()
@@ -0,0 +1,127 @@
+"""
+Нагрузочная проверка покупок: тысячи параллельных покупок одних и тех же
+предметов одними и теми же пользователями, с повторами по Idempotency-Key.
+
+    python -m backend.dev_bench_purchases [пользователей] [покупок] [потоков]
+
+Проверяет, что нет двойных списаний, дублей владения и отрицательных
+балансов, и что сумма журнала сходится с балансом каждого пользователя.
+"""
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from backend.database import SessionLocal, init_sqlite_schema
+from backend.models import User, ProfileFrame, UserFrame, CoinTransaction
+from backend.services.coins import CoinError, buy, check_ledger, credit
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+PURCHASES = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+THREADS = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+FRAMES = 20
+START_COINS = 3000
+PREFIX = f"bench-{uuid.uuid4().hex[:8]}"
+
+init_sqlite_schema()
+
+# --------------------------
+# Данные
+# --------------------------
+db = SessionLocal()
+db.execute(insert(User), [
+    {"email": f"{PREFIX}-{i}@bench.local", "password": "-", "profile_completed": True, "coins": 0}
+    for i in range(USERS)
+])
+db.execute(insert(ProfileFrame), [
+    {"name": f"{PREFIX}-frame-{i}", "image_url": "/static/frames/gold_frame.png", "price": 100 + 50 * i}
+    for i in range(FRAMES)
+])
+user_ids = db.execute(select(User.id).where(User.email.like(f"{PREFIX}-%"))).scalars().all()
+frames = dict(db.execute(select(ProfileFrame.id, ProfileFrame.price).where(ProfileFrame.name.like(f"{PREFIX}-%"))).all())
+for user_id in user_ids:
+    credit(db, user_id, START_COINS, "grant")
+db.commit()
+db.close()
+
+# каждая операция повторяется 1–3 раза с тем же ключом (ретраи клиента)
+operations = []
+for _ in range(PURCHASES):
+    op = (random.choice(user_ids), random.choice(list(frames)), uuid.uuid4().hex)
+    operations.extend([op] * random.randint(1, 3))
+random.shuffle(operations)
+
+# --------------------------
+# Нагрузка
+# --------------------------
+outcomes = Counter()
+latencies = []
+
+
+def run(op):
+    user_id, frame_id, key = op
+    session = SessionLocal()
+    started = time.perf_counter()
+    try:
+        result = buy(session, user_id, "frame", frame_id, frames[frame_id], key)
+        outcomes["replayed" if result.replayed else "bought"] += 1
+    except CoinError as e:
+        outcomes[str(e)] += 1
+    except OperationalError as e:
+        # lock wait timeout / deadlock — то, чего быть не должно
+        outcomes[f"db error: {e.orig}"] += 1
+    finally:
+        latencies.append(time.perf_counter() - started)
+        session.close()
+
+
+started = time.perf_counter()
+with ThreadPoolExecutor(THREADS) as pool:
+    list(pool.map(run, operations))
+elapsed = time.perf_counter() - started
+
+# --------------------------
+# Проверка
+# --------------------------
+db = SessionLocal()
+duplicates = db.execute(
+    select(UserFrame.user_id, UserFrame.frame_id)
+    .where(UserFrame.user_id.in_(user_ids))
+    .group_by(UserFrame.user_id, UserFrame.frame_id)
+    .having(func.count() > 1)
+).all()
+negative = db.scalar(select(func.count()).where(User.id.in_(user_ids), User.coins < 0))
+broken_ledgers = [user_id for user_id in user_ids if not check_ledger(db, user_id)]
+owned_price = db.scalar(
+    select(func.coalesce(func.sum(ProfileFrame.price), 0))
+    .join(UserFrame, UserFrame.frame_id == ProfileFrame.id)
+    .where(UserFrame.user_id.in_(user_ids))
+)
+spent = USERS * START_COINS - db.scalar(select(func.sum(User.coins)).where(User.id.in_(user_ids)))
+
+latencies.sort()
+print(f"Операций: {len(operations)} ({PURCHASES} уникальных ключей), потоков: {THREADS}")
+print(f"Время: {elapsed:.2f} c, {len(operations) / elapsed:.0f} оп/с")
+print(f"Задержка: p50 {statistics.median(latencies) * 1000:.1f} мс, "
+      f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} мс")
+for outcome, count in outcomes.most_common():
+    print(f"  {outcome}: {count}")
+print(f"Дубли владения: {len(duplicates)}, отрицательных балансов: {negative}, "
+      f"журнал не сходится: {len(broken_ledgers)}")
+print(f"Списано {spent}, стоимость купленного {owned_price} — {'OK' if spent == owned_price else 'ДВОЙНОЕ СПИСАНИЕ'}")
+
+# --------------------------
+# Уборка
+# --------------------------
+db.execute(delete(CoinTransaction).where(CoinTransaction.user_id.in_(user_ids)))
+db.execute(delete(UserFrame).where(UserFrame.user_id.in_(user_ids)))
+db.execute(delete(User).where(User.id.in_(user_ids)))
+db.execute(delete(ProfileFrame).where(ProfileFrame.id.in_(list(frames))))
+db.commit()
+db.close()
@@ -5,32 +5,43 @@ from starlette.middleware.sessions import SessionMiddleware
 env_path = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(env_path)
 
-print("ENV LOADED:", env_path)
-print("MAILGUN_API_KEY =", os.getenv("MAILGUN_API_KEY"))
+# ✅ логирование — до остальных импортов (уровни LOG_* могут прийти из .env)
+import logging
+from backend.core.logs import setup_logging
 
+setup_logging()
+logger = logging.getLogger("backend.main")
+logger.info("env loaded", extra={"env_path": env_path, "mailgun_configured": bool(os.getenv("MAILGUN_API_KEY"))})
 
 
 from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
 from contextlib import asynccontextmanager
-from threading import Thread
-from datetime import datetime, timedelta
-import time
 
 # Project imports
-from backend.database import get_db, SessionLocal
+from backend.database import get_db, get_async_db, engine, async_engine, init_sqlite_schema
 from backend.models import User, Tournament, UserFrame
 from backend.routers import profile
 from backend.routers.country_list import countries
+from backend.services import maintenance, avatars, email_service, passwords, coins, catalog_seed
+from backend.services import achievements  # noqa: F401 — подписки на события матчей и покупок
+from backend.services.catalog import get_catalog
+from backend.services.inventory import load_inventory
+from backend.services.leaderboard import user_rank
+from backend.services.xp import level_progress
 
 # ---------------------- TEMPLATES ----------------------
-from backend.core.templates import templates, current_user
+from backend.core.templates import templates
 from backend.core.auth import current_user
+from backend.core.session_tokens import session_claims, set_session_cookie, clear_session_cookie
+from backend.core.request_context import install_query_counter, track_request_queries, track_request_id
+from backend.core.assets import AssetStaticFiles, init_assets
 
 # ---------------------- JINJA FILTERS ----------------------
 def get_flag(country_name: str):
@@ -41,24 +52,20 @@ def get_flag(country_name: str):
     
 templates.env.filters["flag"] = get_flag
 
-# ---------------------- Remove unfinished profiles after 24h ----------------------
-def delete_incomplete_users():
-    while True:
-        time.sleep(3600)
-        db = next(get_db())
-        cutoff = datetime.now() - timedelta(hours=24)
-
-        db.query(User).filter(
-            User.profile_completed == False,
-            User.created_at < cutoff
-        ).delete()
-
-        db.commit()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Thread(target=delete_incomplete_users, daemon=True).start()
+    init_sqlite_schema()  # no-op на MySQL
+    await run_in_threadpool(init_assets)  # хэши и сжатые копии статики
+    email_service.outbox.start()  # фоновая отправка писем
+    # ✅ фоновые задачи (очистка незавершённых регистраций и т.п.): выполняет один воркер на кластер
+    if maintenance.ENABLED:
+        maintenance.scheduler.start()
     yield
+    maintenance.scheduler.stop()
+    avatars.shutdown_pool()
+    passwords.shutdown_pool()
+    await run_in_threadpool(email_service.outbox.stop)  # досылаем очередь
+    await async_engine.dispose()
 
 # ---------------------- FastAPI App ----------------------
 app = FastAPI(lifespan=lifespan)
@@ -76,9 +83,29 @@ app.include_router(profile.router)
 templates.env.globals["current_user"] = current_user
 
 
-app.mount("/static", StaticFiles(directory="backend/static"), name="static")
+# ✅ статика: хэш-имена из сборки с immutable-кэшем, остальное — как раньше (core/assets.py)
+app.mount("/static", AssetStaticFiles(), name="static")
+
+# ✅ bcrypt считается в пуле процессов (services/passwords.py); очередь полна — 503
+@app.exception_handler(passwords.PasswordServiceBusy)
+async def password_service_busy(request: Request, exc: passwords.PasswordServiceBusy):
+    return JSONResponse({"detail": "Server is busy, try again later"}, status_code=503, headers={"Retry-After": "1"})
+
+
+# ✅ ошибки операций с монетами (services/coins.py) → HTTP
+@app.exception_handler(coins.IdempotencyConflict)
+async def idempotency_conflict(request: Request, exc: coins.IdempotencyConflict):
+    return JSONResponse({"detail": str(exc)}, status_code=409)
+
+
+@app.exception_handler(coins.CoinError)
+async def coin_error(request: Request, exc: coins.CoinError):
+    return JSONResponse({"detail": str(exc)}, status_code=400)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@app.exception_handler(catalog_seed.CatalogFileError)
+async def catalog_file_error(request: Request, exc: catalog_seed.CatalogFileError):
+    return JSONResponse({"detail": str(exc)}, status_code=400)
 
 WHITELIST = {
     "/auth", "/register", "/login",
@@ -94,27 +121,24 @@ def path_in_whitelist(path: str) -> bool:
 
 @app.middleware("http")
 async def enforce_profile_completion(request: Request, call_next):
-    print("MIDDLEWARE:", request.url.path)
     if request.url.path.startswith("/static"):
         return await call_next(request)
 
-    user_id = request.cookies.get("user_id")
-    if not user_id:
-        return await call_next(request)
-
-    db: Session = SessionLocal()
-    try:
-        user = db.query(User).filter(User.id == int(user_id)).first()
-        if user:    
-            db.refresh(user)  # ✅ получаем актуальные данные
-        if user and user.profile_completed != True:
-            if not path_in_whitelist(request.url.path):
-                return RedirectResponse("/setup-profile")
-    finally:
-        db.close()
+    # ✅ статус профиля берём из подписанного токена — без запроса к users
+    claims = session_claims(request)
+    if claims and not claims.profile_completed:
+        if not path_in_whitelist(request.url.path):
+            return RedirectResponse("/setup-profile")
 
     return await call_next(request)
 
+# ✅ считаем SQL-запросы на каждый HTTP-запрос (заголовок X-DB-Queries)
+install_query_counter(engine)
+install_query_counter(async_engine.sync_engine)
+app.middleware("http")(track_request_queries)
+# ✅ X-Request-ID — самый внешний middleware: id есть у всех записей лога запроса
+app.middleware("http")(track_request_id)
+
 # ---------------------- Routes ----------------------
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request, db: Session = Depends(get_db)):
@@ -135,32 +159,40 @@ def setup_profile_page(request: Request):
     return templates.TemplateResponse("setup_profile.html", {"request": request, "countries": countries})
 
 @app.post("/register")
-def register(request: Request, email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == email).first():
+async def register(request: Request, email: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    if (await db.execute(select(User.id).where(User.email == email))).first():
         raise HTTPException(400, "Email already registered")
 
-    new_user = User(email=email, password=pwd_context.hash(password))
+    new_user = User(email=email, password=await passwords.hash_password(password))
     db.add(new_user)
-    db.commit()
+    await db.commit()
+    await db.refresh(new_user)
 
     response = RedirectResponse("/setup-profile", status_code=303)
-    response.set_cookie("user_id", str(new_user.id))
+    set_session_cookie(response, new_user)
     return response
 
 @app.post("/login")
-def login(request: Request, email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not pwd_context.verify(password, user.password):
+async def login(request: Request, email: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if not user:
+        raise HTTPException(400, "Invalid email or password")
+    ok, new_hash = await passwords.verify_password(password, user.password)
+    if not ok:
         raise HTTPException(400, "Invalid email or password")
+    if new_hash:
+        # ✅ стоимость bcrypt поменялась — пересохраняем хэш
+        user.password = new_hash
+        await db.commit()
 
     response = RedirectResponse("/", status_code=303)
-    response.set_cookie("user_id", str(user.id))
+    set_session_cookie(response, user)
     return response
 
 @app.get("/logout")
 def logout():
     response = RedirectResponse("/", status_code=303)
-    response.delete_cookie("user_id")
+    clear_session_cookie(response)
     return response
 
 # ---------------------- Profile page ----------------------
@@ -172,15 +204,22 @@ def profile_page(request: Request, db: Session = Depends(get_db)):
     if not user_cookie:
         return RedirectResponse("/auth")
 
-    # Загружаем пользователя с рамками
-    user = db.query(User)\
-        .options(joinedload(User.frames).joinedload(UserFrame.frame))\
-        .filter(User.id == user_cookie.id)\
-        .first()
+    # пользователь уже загружен в этом запросе; рамки/значки — проекция + кэш каталога
+    catalog = get_catalog(db)
+    inventory = load_inventory(db, user_cookie.id)
 
     return templates.TemplateResponse(
         "profile.html",
-        {"request": request, "user": user}
+        {
+            "request": request,
+            "user": user_cookie,
+            "equipped_frame": inventory.equipped_frame(catalog.frames),
+            "equipped_badge": inventory.equipped_badge(catalog.badges),
+            "owned_badges": inventory.badges(catalog.badges),
+            "global_rank": user_rank(db, user_cookie.id),
+            # (уровень, XP внутри уровня, XP на весь уровень) — из xp_total, без формул в шаблоне
+            "progress": level_progress(user_cookie.xp_total or 0),
+        }
     )
 
 
@@ -225,6 +264,13 @@ app.include_router(badges_router)
 from backend.routers import tournaments
 app.include_router(tournaments.router)
 
+#---------------------- Matches routes ----------------------
+from backend.routers import matches
+app.include_router(matches.router)
+
+#---------------------- Leaderboard routes ----------------------
+from backend.routers import leaderboards
+app.include_router(leaderboards.router)
+
 
-for route in app.routes:
-    print("ROUTE:", route.path)
+logger.debug("routes registered", extra={"routes": [getattr(route, "path", None) for route in app.routes]})
@@ -14,6 +14,10 @@ import backend.models  # ✅ Импортируем, чтобы Alembic виде
 config = context.config
 fileConfig(config.config_file_name)
 
+# ✅ DATABASE_URL из окружения важнее строки в alembic.ini
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+
 target_metadata = Base.metadata
 
 
@@ -0,0 +1,39 @@
+"""tournament listing indexes and entry price
+
+Revision ID: 0bb4d874c912
+Revises: d7ac0b916139
+Create Date: 2026-10-18 13:42:18.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0bb4d874c912'
+down_revision: Union[str, Sequence[str], None] = 'd7ac0b916139'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tournaments', sa.Column('entry_price', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_index('ix_tournaments_start_id', 'tournaments', ['start_date', 'id'], unique=False)
+    op.create_index('ix_tournaments_discipline_start', 'tournaments', ['discipline', 'start_date', 'id'], unique=False)
+    op.create_index('ix_tournaments_format_start', 'tournaments', ['format', 'start_date', 'id'], unique=False)
+    op.create_index('ix_tournaments_status_start', 'tournaments', ['status', 'start_date', 'id'], unique=False)
+    op.create_index('ix_tournaments_price_start', 'tournaments', ['entry_price', 'start_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tournaments_price_start', table_name='tournaments')
+    op.drop_index('ix_tournaments_status_start', table_name='tournaments')
+    op.drop_index('ix_tournaments_format_start', table_name='tournaments')
+    op.drop_index('ix_tournaments_discipline_start', table_name='tournaments')
+    op.drop_index('ix_tournaments_start_id', table_name='tournaments')
+    op.drop_column('tournaments', 'entry_price')
@@ -0,0 +1,79 @@
+"""unique catalog names
+
+Revision ID: 0c1802e81c7d
+Revises: 39c23198d931
+Create Date: 2026-10-18 16:02:44.905318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c1802e81c7d'
+down_revision: Union[str, Sequence[str], None] = '39c23198d931'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (каталог, ограничение, [(таблица, колонка, доп. условие, уникальна ли пара с user_id)])
+CATALOGS = (
+    ('profile_frames', 'uq_profile_frames_name', [
+        ('user_frames', 'frame_id', None, True),
+        ('users', 'equipped_frame_id', None, False),
+        ('coin_transactions', 'item_id', "item_type = 'frame'", False),
+    ]),
+    ('profile_badges', 'uq_profile_badges_name', [
+        ('user_badges', 'badge_id', None, True),
+        ('users', 'equipped_badge_id', None, False),
+        ('coin_transactions', 'item_id', "item_type = 'badge'", False),
+    ]),
+    ('achievements', 'uq_achievements_name', [
+        ('user_achievements', 'achievement_id', None, False),
+    ]),
+)
+
+
+def _mapping(catalog: str) -> str:
+    """Дубль → самая ранняя строка с тем же name."""
+    return f"""(
+        SELECT d.id AS dup_id, MIN(k.id) AS keep_id
+        FROM {catalog} d
+        JOIN {catalog} k ON k.name = d.name AND k.id < d.id
+        GROUP BY d.id
+    )"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for catalog, constraint, references in CATALOGS:
+        mapping = _mapping(catalog)
+
+        # ✅ ссылки на дубли переводим на оставшуюся строку
+        for table, column, condition, unique_per_user in references:
+            extra = f"AND t.{condition}" if condition else ""
+            # IGNORE: если у пользователя уже есть оставшийся предмет, строку пропускаем...
+            op.execute(f"""
+                UPDATE {'IGNORE ' if unique_per_user else ''}{table} t
+                JOIN {mapping} m ON t.{column} = m.dup_id {extra}
+                SET t.{column} = m.keep_id
+            """)
+            if unique_per_user:
+                # ...и удаляем — это повторная покупка того же предмета
+                op.execute(f"""
+                    DELETE t FROM {table} t
+                    JOIN {mapping} m ON t.{column} = m.dup_id
+                """)
+
+        op.execute(f"""
+            DELETE d FROM {catalog} d
+            JOIN {catalog} k ON k.name = d.name AND k.id < d.id
+        """)
+        op.create_unique_constraint(constraint, catalog, ['name'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for catalog, constraint, _ in CATALOGS:
+        op.drop_constraint(constraint, catalog, type_='unique')
@@ -0,0 +1,48 @@
+"""xp total, unique user achievements and tournament rewards
+
+Revision ID: 157f227e79be
+Revises: 0c1802e81c7d
+Create Date: 2026-10-18 16:41:09.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '157f227e79be'
+down_revision: Union[str, Sequence[str], None] = '0c1802e81c7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('xp_total', sa.Integer(), server_default='0', nullable=False))
+
+    # ✅ суммарный XP = порог текущего уровня (50·L·(L−1)) + прогресс внутри уровня
+    op.execute("""
+        UPDATE users
+        SET xp_total = 50 * COALESCE(level, 1) * (COALESCE(level, 1) - 1) + COALESCE(xp, 0)
+    """)
+
+    # ✅ одна ачивка — один раз: оставляем самую раннюю запись
+    op.execute("""
+        DELETE d FROM user_achievements d
+        JOIN user_achievements k
+          ON k.user_id = d.user_id AND k.achievement_id = d.achievement_id AND k.id < d.id
+    """)
+    op.create_unique_constraint(
+        'uq_user_achievements_user_achievement', 'user_achievements', ['user_id', 'achievement_id'],
+    )
+
+    op.add_column('tournaments', sa.Column('rewards_granted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tournaments', 'rewards_granted_at')
+    op.drop_constraint('uq_user_achievements_user_achievement', 'user_achievements', type_='unique')
+    op.drop_column('users', 'xp_total')
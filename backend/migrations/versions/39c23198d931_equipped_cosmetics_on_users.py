@@ -0,0 +1,57 @@
+"""equipped cosmetics on users
+
+Revision ID: 39c23198d931
+Revises: 56f78d78470d
+Create Date: 2026-10-18 15:31:09.472615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '39c23198d931'
+down_revision: Union[str, Sequence[str], None] = '56f78d78470d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (колонка users, таблица владения, колонка предмета, каталог, имя FK)
+SLOTS = (
+    ('equipped_frame_id', 'user_frames', 'frame_id', 'profile_frames', 'fk_users_equipped_frame'),
+    ('equipped_badge_id', 'user_badges', 'badge_id', 'profile_badges', 'fk_users_equipped_badge'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column, table, item_column, catalog, fk_name in SLOTS:
+        op.add_column('users', sa.Column(column, sa.Integer(), nullable=True))
+        op.create_foreign_key(fk_name, 'users', catalog, [column], ['id'])
+
+        # ✅ перенос флагов; если надето несколько (гонка старого кода) — берём последний купленный
+        op.execute(f"""
+            UPDATE users u
+            JOIN (
+                SELECT user_id, {item_column} AS item_id,
+                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) AS rn
+                FROM {table}
+                WHERE equipped = 1
+            ) e ON e.user_id = u.id AND e.rn = 1
+            SET u.{column} = e.item_id
+        """)
+        op.drop_column(table, 'equipped')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column, table, item_column, catalog, fk_name in SLOTS:
+        op.add_column(table, sa.Column('equipped', sa.Boolean(), nullable=True))
+        op.execute(f"""
+            UPDATE {table} t
+            JOIN users u ON u.id = t.user_id
+            SET t.equipped = (u.{column} IS NOT NULL AND u.{column} = t.{item_column})
+        """)
+        op.drop_constraint(fk_name, 'users', type_='foreignkey')
+        op.drop_column('users', column)
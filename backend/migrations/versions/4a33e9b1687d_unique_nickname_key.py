@@ -0,0 +1,72 @@
+"""unique nickname key
+
+Revision ID: 4a33e9b1687d
+Revises: 662a9b4b639e
+Create Date: 2026-10-18 19:41:06.218734
+
+"""
+from typing import Sequence, Union
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a33e9b1687d'
+down_revision: Union[str, Sequence[str], None] = '662a9b4b639e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _key(nickname: str) -> str:
+    # копия services/nicknames.nickname_key — миграция не зависит от кода приложения
+    return unicodedata.normalize("NFKC", nickname).strip().casefold()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('nickname_key', mysql.VARCHAR(length=100, collation='utf8mb4_bin'), nullable=True))
+
+    # ✅ дубли (без учёта регистра): ник остаётся у самого раннего аккаунта,
+    # остальным дописываем _<id>; пустые ники — NULL
+    bind = op.get_bind()
+    users = bind.execute(sa.text(
+        "SELECT id, nickname FROM users WHERE nickname IS NOT NULL ORDER BY id"
+    )).all()
+
+    # сначала все исходные ключи: переименованный дубль не отберёт чужой настоящий ник
+    owners = {}
+    for user_id, nickname in users:
+        owners.setdefault(_key(nickname), user_id)
+    taken = set(owners)
+
+    updates = []
+    for user_id, nickname in users:
+        nickname = nickname.strip()
+        key = _key(nickname) or None
+        if key is not None and owners[key] != user_id:
+            base, suffix, n = nickname, f"_{user_id}", 1
+            while _key(base[:100 - len(suffix)] + suffix) in taken:
+                n += 1
+                suffix = f"_{user_id}_{n}"
+            nickname = base[:100 - len(suffix)] + suffix
+            key = _key(nickname)
+        if key is not None:
+            taken.add(key)
+        updates.append({"id": user_id, "nickname": nickname or None, "nickname_key": key})
+
+    if updates:
+        bind.execute(
+            sa.text("UPDATE users SET nickname = :nickname, nickname_key = :nickname_key WHERE id = :id"),
+            updates,
+        )
+
+    op.create_unique_constraint('uq_users_nickname_key', 'users', ['nickname_key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_users_nickname_key', 'users', type_='unique')
+    op.drop_column('users', 'nickname_key')
@@ -0,0 +1,77 @@
+"""coin ledger and unique ownership
+
+Revision ID: 56f78d78470d
+Revises: d476ea8d64a8
+Create Date: 2026-10-18 14:48:26.117530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '56f78d78470d'
+down_revision: Union[str, Sequence[str], None] = 'd476ea8d64a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (таблица, колонка предмета, имя ограничения)
+OWNERSHIP = (
+    ('user_frames', 'frame_id', 'uq_user_frames_user_frame'),
+    ('user_badges', 'badge_id', 'uq_user_badges_user_badge'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('coin_transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('balance_after', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=30), nullable=False),
+    sa.Column('item_type', sa.String(length=20), nullable=True),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'idempotency_key', name='uq_coin_tx_idempotency')
+    )
+    op.create_index('ix_coin_tx_user_created', 'coin_transactions', ['user_id', 'created_at'], unique=False)
+
+    # ✅ стартовый баланс, чтобы сумма журнала сходилась с users.coins
+    op.execute("""
+        INSERT INTO coin_transactions (user_id, amount, balance_after, reason, created_at)
+        SELECT id, COALESCE(coins, 0), COALESCE(coins, 0), 'opening_balance', UTC_TIMESTAMP()
+        FROM users
+        WHERE COALESCE(coins, 0) <> 0
+    """)
+
+    for table, item_column, constraint in OWNERSHIP:
+        # ✅ дубли от гонок покупок: оставляем самую раннюю строку, экипировку переносим на неё
+        op.execute(f"""
+            UPDATE {table} keep
+            JOIN {table} dup ON dup.user_id = keep.user_id
+                AND dup.{item_column} = keep.{item_column}
+                AND dup.id > keep.id
+            SET keep.equipped = 1
+            WHERE dup.equipped = 1
+        """)
+        op.execute(f"""
+            DELETE dup FROM {table} dup
+            JOIN {table} keep ON keep.user_id = dup.user_id
+                AND keep.{item_column} = dup.{item_column}
+                AND keep.id < dup.id
+        """)
+        op.create_unique_constraint(constraint, table, ['user_id', item_column])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, item_column, constraint in OWNERSHIP:
+        op.drop_constraint(constraint, table, type_='unique')
+    op.drop_index('ix_coin_tx_user_created', table_name='coin_transactions')
+    op.drop_table('coin_transactions')
@@ -0,0 +1,62 @@
+"""achievement rules and user stats
+
+Revision ID: 5a08d0f172b2
+Revises: 157f227e79be
+Create Date: 2026-10-18 17:12:37.604915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a08d0f172b2'
+down_revision: Union[str, Sequence[str], None] = '157f227e79be'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('achievements', sa.Column('counter', sa.String(length=30), nullable=True))
+    op.add_column('achievements', sa.Column('threshold', sa.Integer(), nullable=True))
+
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('matches_played', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('wins', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('tournaments_won', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('items_owned', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+    # ✅ один раз считаем счётчики по истории (матчи — за команды, созданные пользователем);
+    # дальше они только инкрементируются событиями
+    op.execute("""
+        INSERT INTO user_stats (user_id, matches_played, wins, tournaments_won, items_owned)
+        SELECT u.id,
+            (SELECT COUNT(*) FROM matches m
+             JOIN teams t ON t.id = m.team1_id OR t.id = m.team2_id
+             WHERE t.created_by = u.id
+               AND m.team1_id IS NOT NULL AND m.team2_id IS NOT NULL
+               AND m.score_team1 IS NOT NULL AND m.score_team2 IS NOT NULL),
+            (SELECT COUNT(*) FROM matches m
+             JOIN teams t ON (t.id = m.team1_id AND m.score_team1 > m.score_team2)
+                          OR (t.id = m.team2_id AND m.score_team2 > m.score_team1)
+             WHERE t.created_by = u.id AND m.team1_id IS NOT NULL AND m.team2_id IS NOT NULL),
+            0,
+            (SELECT COUNT(*) FROM user_frames f WHERE f.user_id = u.id)
+              + (SELECT COUNT(*) FROM user_badges b WHERE b.user_id = u.id)
+        FROM users u
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_stats')
+    op.drop_column('achievements', 'threshold')
+    op.drop_column('achievements', 'counter')
@@ -0,0 +1,32 @@
+"""leaderboard indexes
+
+Revision ID: 662a9b4b639e
+Revises: 5a08d0f172b2
+Create Date: 2026-10-18 17:48:21.337460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '662a9b4b639e'
+down_revision: Union[str, Sequence[str], None] = '5a08d0f172b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_xp_total', 'users', ['xp_total', 'id'], unique=False)
+    op.create_index('ix_users_coins', 'users', ['coins', 'id'], unique=False)
+    op.create_index('ix_users_country_xp', 'users', ['country', 'xp_total', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_country_xp', table_name='users')
+    op.drop_index('ix_users_coins', table_name='users')
+    op.drop_index('ix_users_xp_total', table_name='users')
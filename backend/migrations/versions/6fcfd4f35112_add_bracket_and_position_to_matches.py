@@ -0,0 +1,45 @@
+"""add bracket and position to matches
+
+Revision ID: 6fcfd4f35112
+Revises: d59b6a7dca68
+Create Date: 2026-10-18 12:20:07.553910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6fcfd4f35112'
+down_revision: Union[str, Sequence[str], None] = 'd59b6a7dca68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('matches', sa.Column('bracket', sa.String(length=20), nullable=False, server_default='main'))
+    op.add_column('matches', sa.Column('position', sa.Integer(), nullable=False, server_default='0'))
+
+    # ✅ старые матчи: позиция = порядок по id внутри раунда (как раньше сортировала сетка)
+    op.execute("""
+        UPDATE matches m
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY tournament_id, round_number ORDER BY id
+            ) - 1 AS pos
+            FROM matches
+        ) ranked ON ranked.id = m.id
+        SET m.position = ranked.pos
+    """)
+
+    op.create_index('ix_matches_bracket_order', 'matches', ['tournament_id', 'bracket', 'round_number', 'position'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_matches_bracket_order', table_name='matches')
+    op.drop_column('matches', 'position')
+    op.drop_column('matches', 'bracket')
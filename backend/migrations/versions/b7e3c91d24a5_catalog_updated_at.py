@@ -0,0 +1,30 @@
+"""catalog updated_at
+
+Revision ID: b7e3c91d24a5
+Revises: defb414c37da
+Create Date: 2026-10-18 20:41:37.905112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c91d24a5'
+down_revision: Union[str, Sequence[str], None] = 'defb414c37da'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('profile_frames', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    op.add_column('profile_badges', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('profile_badges', 'updated_at')
+    op.drop_column('profile_frames', 'updated_at')
@@ -0,0 +1,55 @@
+"""maintenance locks and runs
+
+Revision ID: d476ea8d64a8
+Revises: 0bb4d874c912
+Create Date: 2026-10-18 14:10:52.381946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd476ea8d64a8'
+down_revision: Union[str, Sequence[str], None] = '0bb4d874c912'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('maintenance_locks',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('owner', sa.String(length=64), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('maintenance_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job', sa.String(length=64), nullable=False),
+    sa.Column('owner', sa.String(length=64), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.Column('rows_affected', sa.Integer(), nullable=False),
+    sa.Column('batches', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_maintenance_runs_job_started', 'maintenance_runs', ['job', 'started_at'], unique=False)
+
+    # ✅ индексы под выборки фоновых задач
+    op.create_index('ix_users_incomplete_created', 'users', ['profile_completed', 'created_at'], unique=False)
+    op.create_index('ix_email_codes_expires', 'email_verification_codes', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_email_codes_expires', table_name='email_verification_codes')
+    op.drop_index('ix_users_incomplete_created', table_name='users')
+    op.drop_index('ix_maintenance_runs_job_started', table_name='maintenance_runs')
+    op.drop_table('maintenance_runs')
+    op.drop_table('maintenance_locks')
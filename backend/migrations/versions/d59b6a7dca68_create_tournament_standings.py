@@ -0,0 +1,75 @@
+"""create tournament standings
+
+Revision ID: d59b6a7dca68
+Revises: 04527afe1e9a
+Create Date: 2026-10-18 11:03:52.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd59b6a7dca68'
+down_revision: Union[str, Sequence[str], None] = '04527afe1e9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PLAYED = (
+    "team1_id IS NOT NULL AND team2_id IS NOT NULL "
+    "AND score_team1 IS NOT NULL AND score_team2 IS NOT NULL"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tournament_standings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tournament_id', sa.Integer(), nullable=False),
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('played', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('draws', sa.Integer(), nullable=False),
+    sa.Column('losses', sa.Integer(), nullable=False),
+    sa.Column('scored', sa.Integer(), nullable=False),
+    sa.Column('conceded', sa.Integer(), nullable=False),
+    sa.Column('goal_diff', sa.Integer(), nullable=False),
+    sa.Column('points', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.ForeignKeyConstraint(['tournament_id'], ['tournaments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tournament_id', 'team_id', name='uq_standings_tournament_team')
+    )
+    op.create_index(op.f('ix_tournament_standings_id'), 'tournament_standings', ['id'], unique=False)
+    op.create_index('ix_standings_order', 'tournament_standings', ['tournament_id', 'points', 'goal_diff', 'scored'], unique=False)
+
+    # ✅ заполняем таблицу по уже сыгранным матчам
+    op.execute(f"""
+        INSERT INTO tournament_standings
+            (tournament_id, team_id, played, wins, draws, losses, scored, conceded, goal_diff, points)
+        SELECT tournament_id, team_id,
+               COUNT(*),
+               SUM(CASE WHEN s > c THEN 1 ELSE 0 END),
+               SUM(CASE WHEN s = c THEN 1 ELSE 0 END),
+               SUM(CASE WHEN s < c THEN 1 ELSE 0 END),
+               SUM(s), SUM(c), SUM(s - c),
+               SUM(CASE WHEN s > c THEN 3 WHEN s = c THEN 1 ELSE 0 END)
+        FROM (
+            SELECT tournament_id, team1_id AS team_id, score_team1 AS s, score_team2 AS c
+            FROM matches WHERE {PLAYED}
+            UNION ALL
+            SELECT tournament_id, team2_id AS team_id, score_team2 AS s, score_team1 AS c
+            FROM matches WHERE {PLAYED}
+        ) AS sides
+        GROUP BY tournament_id, team_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_standings_order', table_name='tournament_standings')
+    op.drop_index(op.f('ix_tournament_standings_id'), table_name='tournament_standings')
+    op.drop_table('tournament_standings')
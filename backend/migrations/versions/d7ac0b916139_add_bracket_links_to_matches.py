@@ -0,0 +1,71 @@
+"""add bracket links to matches
+
+Revision ID: d7ac0b916139
+Revises: 6fcfd4f35112
+Create Date: 2026-10-18 13:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7ac0b916139'
+down_revision: Union[str, Sequence[str], None] = '6fcfd4f35112'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# глубина самой большой сетки, которую дотягиваем при заполнении (2^16 команд)
+BACKFILL_DEPTH = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('matches', sa.Column('next_match_id', sa.Integer(), nullable=True))
+    op.add_column('matches', sa.Column('next_match_slot', sa.Integer(), nullable=True))
+    op.add_column('matches', sa.Column('loser_next_match_id', sa.Integer(), nullable=True))
+    op.add_column('matches', sa.Column('loser_next_slot', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_matches_next_match', 'matches', 'matches', ['next_match_id'], ['id'])
+    op.create_foreign_key('fk_matches_loser_next_match', 'matches', 'matches', ['loser_next_match_id'], ['id'])
+
+    # ✅ старые сетки на выбывание: связи по той же арифметике, что раньше считала страница
+    op.execute("""
+        UPDATE matches m
+        JOIN tournaments t ON t.id = m.tournament_id AND t.format IN ('single_elim', 'double_elim')
+        JOIN matches n ON n.tournament_id = m.tournament_id
+            AND n.bracket = m.bracket
+            AND n.round_number = m.round_number + 1
+            AND n.position = FLOOR(m.position / 2)
+        SET m.next_match_id = n.id, m.next_match_slot = MOD(m.position, 2) + 1
+        WHERE m.bracket = 'main'
+    """)
+
+    # ✅ победителей сыгранных матчей и bye 1-го раунда переносим в следующий раунд (по раунду за проход)
+    for _ in range(BACKFILL_DEPTH):
+        for slot, column in ((1, 'team1_id'), (2, 'team2_id')):
+            op.execute(f"""
+                UPDATE matches n
+                JOIN matches m ON m.next_match_id = n.id AND m.next_match_slot = {slot}
+                SET n.{column} = CASE
+                    WHEN m.team2_id IS NULL THEN m.team1_id
+                    WHEN m.score_team1 > m.score_team2 THEN m.team1_id
+                    ELSE m.team2_id
+                END
+                WHERE n.{column} IS NULL
+                  AND (
+                    (m.score_team1 IS NOT NULL AND m.score_team2 IS NOT NULL AND m.score_team1 <> m.score_team2)
+                    OR (m.round_number = 1 AND m.team1_id IS NOT NULL AND m.team2_id IS NULL)
+                  )
+            """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_matches_loser_next_match', 'matches', type_='foreignkey')
+    op.drop_constraint('fk_matches_next_match', 'matches', type_='foreignkey')
+    op.drop_column('matches', 'loser_next_slot')
+    op.drop_column('matches', 'loser_next_match_id')
+    op.drop_column('matches', 'next_match_slot')
+    op.drop_column('matches', 'next_match_id')
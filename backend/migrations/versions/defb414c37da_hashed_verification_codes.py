@@ -0,0 +1,45 @@
+"""hashed verification codes
+
+Revision ID: defb414c37da
+Revises: 4a33e9b1687d
+Create Date: 2026-10-18 20:07:52.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'defb414c37da'
+down_revision: Union[str, Sequence[str], None] = '4a33e9b1687d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # коды живут 10 минут, а в открытом виде их больше не храним —
+    # проще попросить пользователей запросить код заново, чем переносить
+    op.execute("DELETE FROM email_verification_codes")
+
+    op.drop_column('email_verification_codes', 'code')
+    op.add_column('email_verification_codes', sa.Column('purpose', sa.String(length=30), nullable=False))
+    op.add_column('email_verification_codes', sa.Column('code_hash', sa.String(length=64), nullable=False))
+    op.add_column('email_verification_codes', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('email_verification_codes', 'user_id', existing_type=mysql.INTEGER(), nullable=False)
+    op.create_unique_constraint('uq_email_codes_user_purpose', 'email_verification_codes', ['user_id', 'purpose'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM email_verification_codes")
+
+    op.drop_constraint('uq_email_codes_user_purpose', 'email_verification_codes', type_='unique')
+    op.alter_column('email_verification_codes', 'user_id', existing_type=mysql.INTEGER(), nullable=True)
+    op.drop_column('email_verification_codes', 'attempts')
+    op.drop_column('email_verification_codes', 'code_hash')
+    op.drop_column('email_verification_codes', 'purpose')
+    op.add_column('email_verification_codes', sa.Column('code', mysql.VARCHAR(length=6), nullable=True))
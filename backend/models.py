@@ -7,7 +7,10 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     Table,
+    UniqueConstraint,
+    Index,
 )
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 from backend.database import Base
@@ -40,6 +43,16 @@ class Role(Base):
 # -----------------------------------------------------
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # очистка незавершённых регистраций
+        Index("ix_users_incomplete_created", "profile_completed", "created_at"),
+        # доски лидеров: загрузка по порядку индекса и подсчёт места для новичков
+        Index("ix_users_xp_total", "xp_total", "id"),
+        Index("ix_users_coins", "coins", "id"),
+        Index("ix_users_country_xp", "country", "xp_total", "id"),
+        # ник уникален без учёта регистра; индекс же служит поиску по префиксу
+        UniqueConstraint("nickname_key", name="uq_users_nickname_key"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, nullable=False)
@@ -47,6 +60,9 @@ class User(Base):
     first_name = Column(String(100))
     last_name = Column(String(100))
     nickname = Column(String(100))
+    # services/nicknames.nickname_key(nickname); бинарная collation — сравнение ровно по ключу,
+    # а не по правилам *_ai_ci, где 'é' == 'e'
+    nickname_key = Column(String(100).with_variant(mysql.VARCHAR(100, collation="utf8mb4_bin"), "mysql"))
     country = Column(String(100))
     dob = Column(String(20))
     category = Column(String(50))
@@ -55,8 +71,13 @@ class User(Base):
     profile_completed = Column(Boolean, nullable=False, default=False)
     coins = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
-    xp = Column(Integer, default=0)
+    xp = Column(Integer, default=0)        # прогресс внутри текущего уровня
     level = Column(Integer, default=1)
+    xp_total = Column(Integer, nullable=False, default=0, server_default="0")  # источник истины, см. services/xp.py
+    session_version = Column(Integer, nullable=False, default=0, server_default="0")  # bump = отзыв всех сессий
+    # надетые рамка и значок: один слот — одна колонка, экипировка = запись одной строки
+    equipped_frame_id = Column(Integer, ForeignKey("profile_frames.id"), nullable=True)
+    equipped_badge_id = Column(Integer, ForeignKey("profile_badges.id"), nullable=True)
     #active_theme = Column(Integer, ForeignKey("profile_themes.id"), nullable=True)
 
 
@@ -104,6 +125,14 @@ class Team(Base):
 # -----------------------------------------------------
 class Tournament(Base):
     __tablename__ = "tournaments"
+    __table_args__ = (
+        # листинг: фильтр-равенство + keyset по (start_date, id)
+        Index("ix_tournaments_start_id", "start_date", "id"),
+        Index("ix_tournaments_discipline_start", "discipline", "start_date", "id"),
+        Index("ix_tournaments_format_start", "format", "start_date", "id"),
+        Index("ix_tournaments_status_start", "status", "start_date", "id"),
+        Index("ix_tournaments_price_start", "entry_price", "start_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -116,6 +145,8 @@ class Tournament(Base):
     format = Column(String(50), nullable=False)  # single_elim, double_elim, swiss...
     team_count = Column(Integer, default=0)
     status = Column(String(30), default="Planned")  # Planned / Registration / Live / Completed
+    entry_price = Column(Integer, nullable=False, default=0, server_default="0")  # 0 — бесплатный
+    rewards_granted_at = Column(DateTime, nullable=True)  # награды за турнир выданы (services/rewards.py)
 
 
     creator = relationship("User", back_populates="tournaments")
@@ -138,16 +169,54 @@ class Match(Base):
     tournament_id = Column(Integer, ForeignKey("tournaments.id"))
     team1_id = Column(Integer, ForeignKey("teams.id"))
     team2_id = Column(Integer, ForeignKey("teams.id"))
-    score_team1 = Column(Integer, default=0)
-    score_team2 = Column(Integer, default=0)
+    # NULL = матч ещё не сыгран (в таблицу не попадает)
+    score_team1 = Column(Integer, nullable=True)
+    score_team2 = Column(Integer, nullable=True)
     match_date = Column(DateTime, default=datetime.utcnow)
     round_number = Column(Integer, nullable=False, default=1)
+    bracket = Column(String(20), nullable=False, default="main", server_default="main")  # main / losers / grand_final
+    position = Column(Integer, nullable=False, default=0, server_default="0")  # порядок матча внутри раунда
+    # граф сетки: куда уходит победитель / проигравший (слот 1 → team1, 2 → team2)
+    next_match_id = Column(Integer, ForeignKey("matches.id"), nullable=True)
+    next_match_slot = Column(Integer, nullable=True)
+    loser_next_match_id = Column(Integer, ForeignKey("matches.id"), nullable=True)
+    loser_next_slot = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_matches_bracket_order", "tournament_id", "bracket", "round_number", "position"),
+    )
 
     tournament = relationship("Tournament", back_populates="matches")
     team1 = relationship("Team", foreign_keys=[team1_id], back_populates="matches_as_team1")
     team2 = relationship("Team", foreign_keys=[team2_id], back_populates="matches_as_team2")
 
 
+# -----------------------------------------------------
+# Турнирная таблица (материализованная, обновляется инкрементально)
+# -----------------------------------------------------
+class TournamentStanding(Base):
+    __tablename__ = "tournament_standings"
+    __table_args__ = (
+        UniqueConstraint("tournament_id", "team_id", name="uq_standings_tournament_team"),
+        # порядок строк таблицы: очки, разница, забитые
+        Index("ix_standings_order", "tournament_id", "points", "goal_diff", "scored"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tournament_id = Column(Integer, ForeignKey("tournaments.id"), nullable=False)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    played = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    scored = Column(Integer, nullable=False, default=0)
+    conceded = Column(Integer, nullable=False, default=0)
+    goal_diff = Column(Integer, nullable=False, default=0)
+    points = Column(Integer, nullable=False, default=0)
+
+    team = relationship("Team")
+
+
 
 # -----------------------------------------------------
 # Комментарии
@@ -167,12 +236,19 @@ class Comment(Base):
 
 class EmailVerificationCode(Base):
     __tablename__ = "email_verification_codes"
+    __table_args__ = (
+        Index("ix_email_codes_expires", "expires_at"),
+        # один активный код на пользователя и назначение; он же индекс поиска (services/verification.py)
+        UniqueConstraint("user_id", "purpose", name="uq_email_codes_user_purpose"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    code = Column(String(6))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    purpose = Column(String(30), nullable=False)
+    code_hash = Column(String(64), nullable=False)  # HMAC-SHA256, сам код не хранится
     email = Column(String(255))
     expires_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 # -----------------------------------------------------
@@ -228,12 +304,17 @@ class UserInventory(Base):
 
 class ProfileFrame(Base):
     __tablename__ = "profile_frames"
+    __table_args__ = (
+        UniqueConstraint("name", name="uq_profile_frames_name"),  # ключ синхронизации каталога (data/catalog.json)
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     image_url = Column(String(255), nullable=False)  # PNG overlay
     price = Column(Integer, nullable=False, default=0)
     rarity = Column(String(50), default="default")
+    # время последнего изменения (services/catalog_seed.py) — Last-Modified каталога
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     # Например:
     # name = "Gold Frame"
@@ -242,24 +323,32 @@ class ProfileFrame(Base):
 
 
 class UserFrame(Base):
-    __tablename__ = "user_frames"   
+    __tablename__ = "user_frames"
+    __table_args__ = (
+        UniqueConstraint("user_id", "frame_id", name="uq_user_frames_user_frame"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     frame_id = Column(Integer, ForeignKey("profile_frames.id"))
-    equipped = Column(Boolean, default=False)
 
     user = relationship("User", backref="frames")
     frame = relationship("ProfileFrame")
 
 class Achievement(Base):
     __tablename__ = "achievements"
+    __table_args__ = (
+        UniqueConstraint("name", name="uq_achievements_name"),  # ключ синхронизации каталога (data/catalog.json)
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(Text)
     icon_url = Column(String(255))
     xp_reward = Column(Integer, default=50) 
+    # правило: выдаётся, когда счётчик user_stats.<counter> достигает threshold
+    counter = Column(String(30), nullable=True)
+    threshold = Column(Integer, nullable=True)
 
     def __repr__(self):
         return f"<Achievement(name={self.name})>"
@@ -268,6 +357,9 @@ class Achievement(Base):
 # 🔹 Связь пользователь–ачивка
 class UserAchievement(Base):
     __tablename__ = "user_achievements"
+    __table_args__ = (
+        UniqueConstraint("user_id", "achievement_id", name="uq_user_achievements_user_achievement"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -278,8 +370,22 @@ class UserAchievement(Base):
     achievement = relationship("Achievement")
 
 
+# 🔹 Счётчики для правил ачивок: одна строка на пользователя, история не пересчитывается
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    matches_played = Column(Integer, nullable=False, default=0, server_default="0")
+    wins = Column(Integer, nullable=False, default=0, server_default="0")
+    tournaments_won = Column(Integer, nullable=False, default=0, server_default="0")
+    items_owned = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 class ProfileBadge(Base):
     __tablename__ = "profile_badges"
+    __table_args__ = (
+        UniqueConstraint("name", name="uq_profile_badges_name"),  # ключ синхронизации каталога (data/catalog.json)
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -287,6 +393,7 @@ class ProfileBadge(Base):
     price = Column(Integer, nullable=False)
     icon_url = Column(String(255), nullable=False)  # путь к иконке
     rarity = Column(String(50), default="common")
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     def __repr__(self):
         return f"<ProfileBadge(name={self.name}, price={self.price})>"
@@ -294,12 +401,66 @@ class ProfileBadge(Base):
 
 class UserBadge(Base):
     __tablename__ = "user_badges"
+    __table_args__ = (
+        UniqueConstraint("user_id", "badge_id", name="uq_user_badges_user_badge"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     badge_id = Column(Integer, ForeignKey("profile_badges.id"))
     acquired_at = Column(DateTime, default=datetime.utcnow)
-    equipped = Column(Boolean, default=False)
 
     user = relationship("User", backref="badges")
     badge = relationship("ProfileBadge")
+
+
+# -----------------------------------------------------
+# Монеты: журнал операций (только добавление)
+# -----------------------------------------------------
+class CoinTransaction(Base):
+    __tablename__ = "coin_transactions"
+    __table_args__ = (
+        # повтор запроса с тем же ключом не спишет монеты второй раз
+        UniqueConstraint("user_id", "idempotency_key", name="uq_coin_tx_idempotency"),
+        Index("ix_coin_tx_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Integer, nullable=False)         # + начисление, − списание
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(String(30), nullable=False)      # purchase / grant / reward ...
+    item_type = Column(String(20))                   # frame / badge
+    item_id = Column(Integer)
+    idempotency_key = Column(String(64))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# -----------------------------------------------------
+# Обслуживание (фоновые задачи)
+# -----------------------------------------------------
+class MaintenanceLock(Base):
+    """Аренда задачи: строку держит один воркер, пока не истечёт locked_until."""
+    __tablename__ = "maintenance_locks"
+
+    name = Column(String(64), primary_key=True)
+    owner = Column(String(64), nullable=False)
+    locked_until = Column(DateTime, nullable=False)
+
+
+class MaintenanceRun(Base):
+    __tablename__ = "maintenance_runs"
+    __table_args__ = (
+        Index("ix_maintenance_runs_job_started", "job", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job = Column(String(64), nullable=False)
+    owner = Column(String(64), nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Integer)
+    rows_affected = Column(Integer, nullable=False, default=0)
+    batches = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default="running")  # running / ok / failed
+    error = Column(Text)
@@ -1,62 +1,62 @@
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from backend.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_async_db
 from backend.models import User
+from backend.core.session_tokens import set_session_cookie, clear_session_cookie
+from backend.services.passwords import hash_password, verify_password
 from starlette import status
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
 
 # ---------------- REGISTER ----------------
 @router.post("/register")
-def register_user(
+async def register_user(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Проверяем, есть ли уже такой пользователь
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = (await db.execute(select(User.id).where(User.email == email))).first()
     if existing_user:
         return {"error": "Email already registered"}
 
-    hashed_password = get_password_hash(password)
+    hashed_password = await hash_password(password)
     user = User(email=email, password=hashed_password)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
-    # ✅ устанавливаем cookie (сохраняем ID пользователя)
+    # ✅ устанавливаем подписанный токен сессии
     response = RedirectResponse(url="/setup-profile", status_code=status.HTTP_303_SEE_OTHER)
-    response.set_cookie(key="user_id", value=str(user.id))
+    set_session_cookie(response, user)
     return response
 
 
 # ---------------- LOGIN ----------------
 @router.post("/login")
-def login_user(
+async def login_user(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password):
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if not user:
+        return {"error": "Invalid email or password"}
+    ok, new_hash = await verify_password(password, user.password)
+    if not ok:
         return {"error": "Invalid email or password"}
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
 
     # ✅ создаём cookie
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
-    response.set_cookie(key="user_id", value=str(user.id))
+    set_session_cookie(response, user)
     return response
 
 
@@ -64,5 +64,5 @@ def login_user(
 @router.get("/logout")
 def logout_user():
     response = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
-    response.delete_cookie("user_id")
+    clear_session_cookie(response)
     return response
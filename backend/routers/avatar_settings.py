@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from backend.database import get_db
+from backend.database import get_db, get_async_db
 from backend.core.templates import templates, current_user
+from backend.core.session_tokens import session_claims
 from backend.models import User
+from backend.services.catalog import get_catalog
+from backend.services.inventory import load_inventory
+from backend.services.avatars import AvatarError, AvatarTooLarge, ingest_avatar
 from fastapi import UploadFile, File, HTTPException
-import os
-import shutil
 
 router = APIRouter(prefix="/profile", tags=["Avatar"])
 
@@ -15,28 +18,35 @@ def customize_avatar_page(request: Request, db: Session = Depends(get_db)):
     user = current_user(request)
     if not user:
         return RedirectResponse("/auth")
-    db_user = db.query(User).filter(User.id == user.id).first()
-    return templates.TemplateResponse("avatar_settings.html", {"request": request, "user": db_user})
-
-AVATAR_DIR = "backend/static/avatars"
+    catalog = get_catalog(db)
+    inventory = load_inventory(db, user.id)
+    return templates.TemplateResponse(
+        "avatar_settings.html",
+        {
+            "request": request,
+            "user": user,
+            "owned_frames": inventory.frames(catalog.frames),
+            "owned_badges": inventory.badges(catalog.badges),
+            "equipped_frame_id": inventory.equipped_frame_id,
+            "equipped_badge_id": inventory.equipped_badge_id,
+        },
+    )
 
 @router.post("/upload-avatar")
-async def upload_avatar(request: Request, avatar: UploadFile = File(...), db: Session = Depends(get_db)):
-    user = current_user(request)
+async def upload_avatar(request: Request, avatar: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    user = session_claims(request)
     if not user:
         raise HTTPException(401, "Unauthorized")
 
-    os.makedirs(AVATAR_DIR, exist_ok=True)
-    filename = f"{user.id}_{avatar.filename}"
-    path = os.path.join(AVATAR_DIR, filename)
-
-    with open(path, "wb") as buffer:
-        shutil.copyfileobj(avatar.file, buffer)
-
-    db_user = db.query(User).filter(User.id == user.id).first()
-    db_user.avatar = f"/static/avatars/{filename}"
-    db.commit()
-
-    return {"success": True}
+    try:
+        url = await ingest_avatar(avatar)
+    except AvatarTooLarge as e:
+        raise HTTPException(413, str(e))
+    except AvatarError as e:
+        raise HTTPException(400, str(e))
 
+    db_user = await db.get(User, user.id)
+    db_user.avatar = url
+    await db.commit()
 
+    return {"success": True, "avatar": url}
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.database import get_db
-from backend.core.auth import current_user
+from backend.database import get_db, get_async_db
+from backend.core.auth import current_user, current_identity
+from backend.core.session_tokens import SessionClaims
 from backend.models import ProfileBadge, UserBadge, User, ProfileFrame
 from backend.core.templates import templates
+from backend.services.catalog_seed import seed_catalog
+from backend.services.coins import buy
+from backend.services.catalog import get_catalog, get_catalog_async
+from backend.services.inventory import load_inventory, equip, unequip
 
 router = APIRouter(prefix="/badges", tags=["Badges"])
 
@@ -14,34 +24,23 @@ router = APIRouter(prefix="/badges", tags=["Badges"])
 # ----------------------------
 @router.post("/init")
 def init_badges(db: Session = Depends(get_db)):
-    badges_data = [
-        {"name": "Bronze Medal",  "price": 50,     "description": "Этот значок можно купить в магазине. Стоимость — 50 монет.",    "icon_url": "/static/badges/badge_50.png"},
-        {"name": "Silver Medal",  "price": 100,    "description": "Этот значок можно купить в магазине. Стоимость — 100 монет.",   "icon_url": "/static/badges/badge_100.png"},
-        {"name": "Speed Runner",  "price": 250,    "description": "Этот значок можно купить в магазине. Стоимость — 250 монет.",   "icon_url": "/static/badges/badge_250.png"},
-        {"name": "Pro Athlete",   "price": 500,    "description": "Этот значок можно купить в магазине. Стоимость — 500 монет.",   "icon_url": "/static/badges/badge_500.png"},
-        {"name": "Champion",      "price": 2000,   "description": "Этот значок можно купить в магазине. Стоимость — 2000 монет.",  "icon_url": "/static/badges/badge_2000.png"},
-        {"name": "Elite Medal",   "price": 5000,   "description": "Этот значок можно купить в магазине. Стоимость — 5000 монет.",  "icon_url": "/static/badges/badge_5000.png"},
-        {"name": "Legend Trophy", "price": 10000,  "description": "Этот значок можно купить в магазине. Стоимость — 10000 монет.", "icon_url": "/static/badges/badge_10000.png"},
-        {"name": "Mythic Glory",  "price": 50000,  "description": "Этот значок можно купить в магазине. Стоимость — 50000 монет.", "icon_url": "/static/badges/badge_50000.png"},
-    ]
-
-    added = 0
-    for b in badges_data:
-        exists = db.query(ProfileBadge).filter_by(name=b["name"]).first()
-        if not exists:
-            db.add(ProfileBadge(**b))
-            added += 1
-
-    db.commit()
-    return {"success": True, "added": added}
+    report = seed_catalog(db, ("badges",))
+    return {"success": True, "added": len(report["badges"]["added"]), "diff": report}
 
 
 # ----------------------------
 #  LIST ALL BADGES (for store)
 # ----------------------------
 @router.get("/list")
-def list_badges(db: Session = Depends(get_db)):
-    return db.query(ProfileBadge).all()
+async def list_badges(
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    catalog = await get_catalog_async(db)
+    if catalog.not_modified(if_none_match, if_modified_since):
+        return Response(status_code=304, headers=catalog.headers())
+    return JSONResponse([asdict(b) for b in catalog.badges], headers=catalog.headers())
 
 
 # ----------------------------
@@ -50,88 +49,61 @@ def list_badges(db: Session = Depends(get_db)):
 @router.post("/buy/{badge_id}")
 def buy_badge(
     badge_id: int,
-    user: User = Depends(current_user),
-    db: Session = Depends(get_db)
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=64),
 ):
-    badge = db.query(ProfileBadge).filter_by(id=badge_id).first()
-    if not badge:
+    price = db.execute(select(ProfileBadge.price).where(ProfileBadge.id == badge_id)).scalar_one_or_none()
+    if price is None:
         raise HTTPException(status_code=404, detail="Badge not found")
 
-    # Уже куплено?
-    owned = db.query(UserBadge).filter_by(user_id=user.id, badge_id=badge_id).first()
-    if owned:
-        raise HTTPException(status_code=400, detail="You already own this badge")
-
-    # Хватает монет?
-    if user.coins < badge.price:
-        raise HTTPException(status_code=400, detail="Not enough coins")
-
-    # списываем монеты
-    user.coins -= badge.price
-
-    db.add(UserBadge(user_id=user.id, badge_id=badge.id))
-    db.commit()
-
-    return {"success": True, "coins": user.coins}
+    # списание и владение — одной транзакцией через журнал монет
+    result = buy(db, user.id, "badge", badge_id, price, idempotency_key)
+    return {"success": True, "coins": result.balance}
 
 
 # ----------------------------
 #  GET USER BADGES
 # ----------------------------
 @router.get("/user")
-def get_user_badges(
-    user: User = Depends(current_user),
-    db: Session = Depends(get_db)
+async def get_user_badges(
+    user: SessionClaims = Depends(current_identity),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    badges = (
-        db.query(UserBadge)
-        .filter_by(user_id=user.id)
-        .all()
-    )
+    badges = (await db.execute(
+        select(UserBadge).where(UserBadge.user_id == user.id)
+    )).scalars().all()
 
     return {"success": True, "badges": badges}
 
 
-from backend.models import ProfileBadge, UserBadge
-
 @router.get("/store")
 def store_page(request: Request, db: Session = Depends(get_db), user: User = Depends(current_user)):
 
-    frames = db.query(ProfileFrame).all()
-
-    badges = db.query(ProfileBadge).all()  # ← ДОБАВИЛИ
-
-    owned_frames = [f.frame_id for f in user.frames]
-    owned_badges = [b.badge_id for b in user.badges]   # ← ДОБАВИЛИ
+    catalog = get_catalog(db)
+    inventory = load_inventory(db, user.id)
 
     return templates.TemplateResponse(
-        "store.html",
+        "custom_store.html",
         {
             "request": request,
             "user": user,
-            "frames": frames,
-            "badges": badges,            # ← ПЕРЕДАЧА
-            "owned_frames": owned_frames,
-            "owned_badges": owned_badges,  # ← ПЕРЕДАЧА
+            "frames": catalog.frames,
+            "badges": catalog.badges,
+            "owned_frames": inventory.owned_frames,
+            "owned_badges": inventory.owned_badges,
+            "equipped_frame_id": inventory.equipped_frame_id,
         }
     )
 
 
 @router.post("/equip-badge/{badge_id}")
-def equip_badge(badge_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
-
-    user_db = db.query(User).filter(User.id == user.id).first()
-
-    owned = db.query(UserBadge).filter_by(user_id=user_db.id, badge_id=badge_id).first()
-    if not owned:
-        raise HTTPException(400, "Badge not owned")
+def equip_badge(badge_id: int, user: SessionClaims = Depends(current_identity), db: Session = Depends(get_db)):
 
     try:
-        # снять все значки
-        db.query(UserBadge).filter(UserBadge.user_id == user_db.id).update({"equipped": False})
-
-        # надеть выбранный
-        owned.equipped = True
+        # надеть = записать id в users.equipped_badge_id (вместо обхода всех значков)
+        if not equip(db, user.id, "badge", badge_id):
+            raise HTTPException(400, "Badge not owned")
         db.commit()
     except:
         db.rollback()
@@ -140,14 +112,13 @@ def equip_badge(badge_id: int, user: User = Depends(current_user), db: Session =
     return {"success": True}
 
 @router.post("/unequip-badge/{badge_id}")
-def unequip_badge(badge_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def unequip_badge(badge_id: int, user: SessionClaims = Depends(current_identity), db: Session = Depends(get_db)):
 
-    owned = db.query(UserBadge).filter_by(user_id=user.id, badge_id=badge_id).first()
-    if not owned:
-        raise HTTPException(400, "Badge not owned")
-
-    owned.equipped = False
-    db.commit()
+    try:
+        unequip(db, user.id, "badge", badge_id)
+        db.commit()
+    except:
+        db.rollback()
+        raise
 
     return {"success": True}
-
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Request, Depends, HTTPException, Header
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.database import get_db
+from backend.database import get_db, get_async_db
 from backend.models import User, ProfileFrame, UserFrame, ProfileBadge, UserBadge
-from backend.core.auth import current_user
+from backend.core.auth import current_user, current_identity
+from backend.core.session_tokens import SessionClaims
 from backend.core.templates import templates
+from backend.services.coins import buy, grant
+from backend.services.catalog import get_catalog, get_catalog_async
+from backend.services.inventory import load_inventory, equip
+from backend.services.catalog_seed import seed_catalog
 from sqlalchemy.orm import joinedload
 
 
@@ -16,8 +23,9 @@ router = APIRouter(prefix="/store", tags=["Store"])
 @router.post("/give-coins/{amount}")
 def give_coins(
     amount: int,
-    user: User = Depends(current_user),
-    db: Session = Depends(get_db)
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=64),
 ):
     if user.role_id != 1:  # предполагается id=1 => admin
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -25,20 +33,20 @@ def give_coins(
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be positive")
 
-    try:
-        user.coins += amount
-        db.commit()
-    except:
-        db.rollback()
-        raise
+    # IdempotencyConflict → 409 (обработчик в main.py)
+    result = grant(db, user.id, amount, "grant", idempotency_key)
 
-    return {"success": True, "new_balance": user.coins}
+    return {"success": True, "new_balance": result.balance}
 
 
 # ✅ Получение баланса
 @router.get("/coins")
-def get_balance(user: User = Depends(current_user)):
-    return {"coins": user.coins}
+async def get_balance(
+    user: SessionClaims = Depends(current_identity),
+    db: AsyncSession = Depends(get_async_db)
+):
+    coins = (await db.execute(select(User.coins).where(User.id == user.id))).scalar_one_or_none()
+    return {"coins": coins}
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -48,137 +56,86 @@ def store_page(
     db: Session = Depends(get_db)
 ):
 
-    # Загружаем пользователя с заранее подгруженными:
-    # - рамками
-    # - значками
-    user_db = (
-        db.query(User)
-        .options(
-            joinedload(User.frames),        # user.frames
-            joinedload(User.badges)         # user.badges
-        )
-        .filter(User.id == user.id)
-        .first()
-    )
-
-    # Данные рамок
-    frames = db.query(ProfileFrame).order_by(ProfileFrame.price.asc()).all()
-    owned_frames = [uf.frame_id for uf in user_db.frames]
-
-    # Данные значков
-    badges = db.query(ProfileBadge).all()
-    owned_badges = [ub.badge_id for ub in user_db.badges]
-
-    # Кто сейчас экипирован
-    equipped = (
-        db.query(UserFrame)
-        .filter(UserFrame.user_id == user.id, UserFrame.equipped == True)
-        .first()
-    )
-    equipped_id = equipped.frame_id if equipped else None
+    # Каталог — из кэша, владение и экипировка — одним запросом (множества id)
+    catalog = get_catalog(db)
+    inventory = load_inventory(db, user.id)
 
     return templates.TemplateResponse(
         "custom_store.html",
         {
             "request": request,
-            "frames": frames,
-            "badges": badges,
-            "owned_frames": owned_frames,
-            "owned_badges": owned_badges,
-            "equipped_frame_id": equipped_id,
-            "user": user_db,   # <-- ВАЖНО: теперь используем user_db
+            "frames": catalog.frames,
+            "badges": catalog.badges,
+            "owned_frames": inventory.owned_frames,
+            "owned_badges": inventory.owned_badges,
+            "equipped_frame_id": inventory.equipped_frame_id,
+            "user": user,   # загружен в этом запросе (current_user), баланс актуален
         },
     )
 
 
 
+# ✅ Каталог магазина в JSON: клиент с актуальной версией получает 304
+@router.get("/catalog")
+async def store_catalog(
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    catalog = await get_catalog_async(db)
+    if catalog.not_modified(if_none_match, if_modified_since):
+        return Response(status_code=304, headers=catalog.headers())
+    return Response(content=catalog.body, media_type="application/json", headers=catalog.headers())
+
+
 # ✅ Инициализация рамок (ТОЛЬКО ADMIN)
 @router.post("/init-frames")
-def init_frames(user: User = Depends(current_user), db: Session = Depends(get_db)):
+def init_frames(user: SessionClaims = Depends(current_identity), db: Session = Depends(get_db)):
     if user.role_id != 1:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    frames_data = [
-        {"name": "Gold", "image_url": "/static/frames/gold_frame.png", "price": 500},
-        {"name": "Silver", "image_url": "/static/frames/silver_frame.png", "price": 400},
-        {"name": "Bronze", "image_url": "/static/frames/bronze_frame.png", "price": 300},
-        {"name": "Neon", "image_url": "/static/frames/neon_frame.png", "price": 600},
-        {"name": "Fire", "image_url": "/static/frames/fire_frame.png", "price": 700},
-        {"name": "Ice", "image_url": "/static/frames/ice_frame.png", "price": 700},
-    ]
+    report = seed_catalog(db, ("frames",))
+    return {"success": True, "added": len(report["frames"]["added"]), "diff": report}
 
-    added = 0
-    try:
-        for frame in frames_data:
-            exists = db.query(ProfileFrame).filter_by(name=frame["name"]).first()
-            if not exists:
-                db.add(ProfileFrame(**frame))
-                added += 1
 
-        db.commit()
-    except:
-        db.rollback()
-        raise
+# ✅ Синхронизация всего каталога с data/catalog.json (ТОЛЬКО ADMIN)
+@router.post("/catalog/sync")
+def sync_store_catalog(user: SessionClaims = Depends(current_identity), db: Session = Depends(get_db)):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
 
-    return {"success": True, "added": added}
+    return {"success": True, "diff": seed_catalog(db)}
 
 
 @router.post("/buy-frame/{frame_id}")
 def buy_frame(
     frame_id: int,
-    user: User = Depends(current_user),
+    user: SessionClaims = Depends(current_identity),
     db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=64),
 ):
-    # Всегда достаём ORM-модель из базы!
-    user_db = db.query(User).filter(User.id == user.id).first()
-    if not user_db:
-        raise HTTPException(404, "User not found")
-
-    frame = db.query(ProfileFrame).filter_by(id=frame_id).first()
-    if not frame:
+    price = db.execute(select(ProfileFrame.price).where(ProfileFrame.id == frame_id)).scalar_one_or_none()
+    if price is None:
         raise HTTPException(status_code=404, detail="Frame not found")
 
-    owned = db.query(UserFrame).filter_by(user_id=user_db.id, frame_id=frame.id).first()
-    if owned:
-        raise HTTPException(status_code=400, detail="You already own this frame")
-
-    if user_db.coins < frame.price:
-        raise HTTPException(status_code=400, detail="Not enough coins")
-
-    user_db.coins -= frame.price
-    db.add(UserFrame(user_id=user_db.id, frame_id=frame.id))
-    db.commit()
-    db.refresh(user_db)
-
-    return {"success": True, "coins_left": user_db.coins}
-
+    # ошибки покупки (CoinError) → 400/409 — обработчики в main.py
+    result = buy(db, user.id, "frame", frame_id, price, idempotency_key)
+    return {"success": True, "coins_left": result.balance}
 
 
 @router.post("/buy-badge/{badge_id}")
 def buy_badge(
     badge_id: int,
-    user: User = Depends(current_user),
-    db: Session = Depends(get_db)
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=64),
 ):
-    user_db = db.query(User).filter(User.id == user.id).first()
-
-    badge = db.query(ProfileBadge).filter_by(id=badge_id).first()
-    if not badge:
+    price = db.execute(select(ProfileBadge.price).where(ProfileBadge.id == badge_id)).scalar_one_or_none()
+    if price is None:
         raise HTTPException(status_code=404, detail="Badge not found")
 
-    owned = db.query(UserBadge).filter_by(user_id=user_db.id, badge_id=badge.id).first()
-    if owned:
-        raise HTTPException(status_code=400, detail="You already own this badge")
-
-    if user_db.coins < badge.price:
-        raise HTTPException(status_code=400, detail="Not enough coins")
-
-    user_db.coins -= badge.price
-    db.add(UserBadge(user_id=user_db.id, badge_id=badge.id))
-    db.commit()
-    db.refresh(user_db)
-
-    return {"success": True, "coins_left": user_db.coins}
+    result = buy(db, user.id, "badge", badge_id, price, idempotency_key)
+    return {"success": True, "coins_left": result.balance}
 
 
 
@@ -187,23 +144,13 @@ def buy_badge(
 @router.post("/equip-frame/{frame_id}")
 def equip_frame(
     frame_id: int,
-    user: User = Depends(current_user),
+    user: SessionClaims = Depends(current_identity),
     db: Session = Depends(get_db)
 ):
-    owned_frame = db.query(UserFrame).filter_by(
-        user_id=user.id,
-        frame_id=frame_id
-    ).first()
-
-    if not owned_frame:
-        raise HTTPException(status_code=400, detail="Frame not owned")
-
     try:
-        # снять все рамки
-        db.query(UserFrame).filter(UserFrame.user_id == user.id).update({"equipped": False})
-
-        # экипировать выбранную
-        owned_frame.equipped = True
+        # одна строка users; владение проверяется в том же UPDATE
+        if not equip(db, user.id, "frame", frame_id):
+            raise HTTPException(status_code=400, detail="Frame not owned")
         db.commit()
     except:
         db.rollback()
@@ -3,10 +3,13 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
-from backend.core.auth import current_user
+from backend.core.auth import current_user, current_identity
+from backend.core.session_tokens import SessionClaims
 from backend.models import User, ProfileFrame, UserFrame
 from fastapi.responses import HTMLResponse
 from backend.core.templates import templates
+from backend.services.catalog import get_catalog
+from backend.services.inventory import equip, unequip
 from fastapi.responses import RedirectResponse  
 
 router = APIRouter(prefix="/frames", tags=["Frames"])
@@ -14,7 +17,7 @@ router = APIRouter(prefix="/frames", tags=["Frames"])
 # Get store page data
 @router.get("/", response_class=HTMLResponse)
 def list_frames(request: Request, db: Session = Depends(get_db), user: User = Depends(current_user)):
-    frames = db.query(ProfileFrame).order_by(ProfileFrame.price.asc()).all()
+    frames = get_catalog(db).frames
 
     return templates.TemplateResponse(
         "custom_store.html",
@@ -31,26 +34,30 @@ def list_frames(request: Request, db: Session = Depends(get_db), user: User = De
 def equip_frame(
     frame_id: int, 
     db: Session = Depends(get_db), 
-    user: User = Depends(current_user)
+    user: SessionClaims = Depends(current_identity)
 ):
-    user_frame = db.query(UserFrame).filter_by(
-        user_id=user.id,
-        frame_id=frame_id
-    ).first()
-
-    if not user_frame:
-        raise HTTPException(status_code=400, detail="Frame not owned")
-
-    # Unequip all in 1 atomic operation
-    db.query(UserFrame).filter(
-        UserFrame.user_id == user.id,
-        UserFrame.equipped == True
-    ).update({"equipped": False})
-
-    user_frame.equipped = True
-    db.commit()
+    try:
+        if not equip(db, user.id, "frame", frame_id):
+            raise HTTPException(status_code=400, detail="Frame not owned")
+        db.commit()
+    except:
+        db.rollback()
+        raise
 
     return {"success": True}
 
 
+@router.post("/unequip/{frame_id}")
+def unequip_frame(
+    frame_id: int,
+    db: Session = Depends(get_db),
+    user: SessionClaims = Depends(current_identity)
+):
+    try:
+        unequip(db, user.id, "frame", frame_id)
+        db.commit()
+    except:
+        db.rollback()
+        raise
 
+    return {"success": True}
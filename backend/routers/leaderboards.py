@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.database import get_db
+from backend.models import User, Team
+from backend.core.auth import current_identity
+from backend.core.session_tokens import SessionClaims
+from backend.routers.country_list import countries
+from backend.services.leaderboard import MAX_PAGE_SIZE, USER_METRICS, team_board, user_board, user_rank
+
+router = APIRouter(prefix="/leaderboard", tags=["Leaderboard"])
+
+COUNTRY_NAMES = frozenset(c["name"] for c in countries)
+
+
+def _metric(metric: str) -> str:
+    if metric not in USER_METRICS:
+        raise HTTPException(status_code=400, detail=f"Metric must be one of {sorted(USER_METRICS)}")
+    return metric
+
+
+def _country(country: str | None) -> str | None:
+    # каждая страна — отдельная доска в памяти, произвольные значения не принимаем
+    if country is not None and country not in COUNTRY_NAMES:
+        raise HTTPException(status_code=400, detail="Unknown country")
+    return country
+
+
+# ✅ Топ игроков: глобально или по стране
+@router.get("/users")
+def users_leaderboard(
+    metric: str = "xp",
+    country: str | None = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    board = user_board(db, _metric(metric), _country(country))
+    page = board.page(limit, offset)
+
+    # имена — одним запросом только для строк страницы
+    users = {
+        row.id: row for row in db.execute(
+            select(User.id, User.nickname, User.avatar, User.level).where(User.id.in_([i for _, i, _ in page]))
+        )
+    } if page else {}
+
+    return {
+        "metric": metric,
+        "country": country,
+        "total": len(board),
+        "items": [
+            {
+                "rank": rank,
+                "user_id": user_id,
+                "nickname": users[user_id].nickname if user_id in users else None,
+                "avatar": users[user_id].avatar if user_id in users else None,
+                "level": users[user_id].level if user_id in users else None,
+                "score": score,
+            }
+            for rank, user_id, score in page
+        ],
+    }
+
+
+# ✅ Топ команд дисциплины (очки по таблицам всех её турниров)
+@router.get("/teams")
+def teams_leaderboard(
+    discipline: str,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    board = team_board(db, discipline)
+    page = board.page(limit, offset)
+    names = dict(db.execute(
+        select(Team.id, Team.name).where(Team.id.in_([i for _, i, _ in page]))
+    ).all()) if page else {}
+
+    return {
+        "discipline": discipline,
+        "total": len(board),
+        "items": [
+            {"rank": rank, "team_id": team_id, "name": names.get(team_id), "points": points}
+            for rank, team_id, points in page
+        ],
+    }
+
+
+# ✅ Моё место
+@router.get("/me")
+def my_rank(
+    metric: str = "xp",
+    scope: str = Query("global", pattern="^(global|country)$"),
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    country = None
+    if scope == "country":
+        country = db.scalar(select(User.country).where(User.id == user.id))
+        if not country:
+            raise HTTPException(status_code=400, detail="Country is not set in your profile")
+
+    board = user_board(db, _metric(metric), country)
+    return {
+        "metric": metric,
+        "scope": scope,
+        "country": country,
+        "rank": user_rank(db, user.id, metric, country),
+        "total": len(board),
+    }
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Form, HTTPException
+from sqlalchemy.orm import Session
+
+from backend.database import get_db
+from backend.models import Match
+from backend.core.auth import current_identity
+from backend.core.session_tokens import SessionClaims
+from backend.services.standings import MatchResult, apply_match_change
+from backend.services.bracket_generator import advance_winner
+from backend.services.events import MATCH_RESULT, publish
+
+router = APIRouter(prefix="/matches", tags=["Matches"])
+
+
+# ✅ Запись результата матча (ТОЛЬКО ADMIN)
+@router.post("/{match_id}/score")
+def set_match_score(
+    match_id: int,
+    score_team1: int = Form(...),
+    score_team2: int = Form(...),
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    if score_team1 < 0 or score_team2 < 0:
+        raise HTTPException(status_code=400, detail="Score must not be negative")
+
+    # блокируем строку матча, чтобы два параллельных апдейта не посчитались дважды
+    match = db.query(Match).filter(Match.id == match_id).with_for_update().first()
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    try:
+        before = MatchResult.of(match)
+        match.score_team1 = score_team1
+        match.score_team2 = score_team2
+
+        # таблица обновляется в той же транзакции, что и счёт
+        after = MatchResult.of(match)
+        apply_match_change(db, match.tournament_id, before, after)
+        # счётчики и ачивки игроков — там же
+        publish(db, MATCH_RESULT, before=before, after=after)
+        # победитель уходит в следующий матч по связи сетки
+        advance_winner(db, match)
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except:
+        db.rollback()
+        raise
+
+    return {"success": True, "match_id": match.id}
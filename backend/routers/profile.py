@@ -1,26 +1,27 @@
-from datetime import date, datetime, timedelta
-from pathlib import Path
-import uuid, random
+from datetime import date, datetime
 
 from fastapi import APIRouter, Request, Form, UploadFile, File, Depends, Query, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.database import get_db
-from backend.models import User, EmailVerificationCode, UserFrame
+from backend.database import get_db, get_async_db
+from backend.models import User, UserFrame
 from backend.routers.country_list import countries
 from backend.core.templates import templates
-from backend.core.auth import current_user
+from backend.core.auth import current_user, current_user_async
+from backend.core.session_tokens import session_claims, set_session_cookie
 from backend.services.email_service import send_email
+from backend.services.avatars import DEFAULT_AVATAR, AvatarError, ingest_avatar
+from backend.services import nicknames
+from backend.services.verification import VerificationError, consume_code, issue_code
+from backend.services.nicknames import NicknameError, clean_nickname, nickname_key
 from sqlalchemy.orm import joinedload
 
 
 router = APIRouter()
 
-AVATAR_DIR = Path("backend/static/avatars")
-AVATAR_DIR.mkdir(parents=True, exist_ok=True)
-
-
 # ✅ Сохранение профиля после Google регистрации
 @router.post("/save-profile")
 async def save_profile(
@@ -32,13 +33,13 @@ async def save_profile(
     dob: str = Form(...),
     category: list[str] = Form(...),
     avatar: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user_id = request.cookies.get("user_id")
-    if not user_id:
+    claims = session_claims(request)
+    if not claims:
         return RedirectResponse("/login")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.get(User, claims.user_id)
     if not user:
         return RedirectResponse("/login")
 
@@ -53,10 +54,19 @@ async def save_profile(
             "countries": countries
         })
 
+    try:
+        nickname = clean_nickname(nickname)
+    except NicknameError as e:
+        return templates.TemplateResponse("setup_profile.html", {
+            "request": request, "error": str(e),
+            "countries": countries
+        }, status_code=400)
+
     # ✅ Обновляем данные
     user.first_name = first_name
     user.last_name = last_name
     user.nickname = nickname
+    user.nickname_key = nickname_key(nickname)
     user.country = country
     user.dob = dob
     user.category = ",".join(category)
@@ -64,27 +74,36 @@ async def save_profile(
 
     # ✅ Если аватар не загружен — ставим дефолт
     if (not avatar) or (not avatar.filename) or (not avatar.filename.strip()):
-        user.avatar = "/static/avatars/default.png"
+        user.avatar = DEFAULT_AVATAR
 
-    # ✅ Сохраняем аватар
+    # ✅ Сохраняем аватар (потоково, с лимитом размера — services/avatars.py)
     if avatar is not None and avatar.filename and avatar.filename.strip():
-        data = await avatar.read()
-        if data:
-            ext = Path(avatar.filename).suffix or ".png"
-            filename = f"user_{user.id}_{uuid.uuid4().hex}{ext}"
-            file_path = AVATAR_DIR / filename
-
-            with open(file_path, "wb") as f:
-                f.write(data)
-
-            user.avatar = f"/static/avatars/{filename}"
-
-    db.commit()
+        try:
+            user.avatar = await ingest_avatar(avatar)
+        except AvatarError as e:
+            await db.rollback()
+            return templates.TemplateResponse("setup_profile.html", {
+                "request": request, "error": str(e),
+                "countries": countries
+            }, status_code=400)
+
+    # ✅ уникальный индекс по ключу ника: из двух одновременных сохранений пройдёт одно
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        nicknames.remember(nickname)
+        return templates.TemplateResponse("setup_profile.html", {
+            "request": request, "error": "Nickname is already taken",
+            "countries": countries
+        }, status_code=409)
+    nicknames.remember(nickname)
 
     # ✅ Остаёмся в той же сессии, refresh не нужен
 
+    # ✅ перевыпускаем токен: в нём теперь profile_completed=True
     response = RedirectResponse("/", status_code=302)
-    response.set_cookie("user_id", str(user.id))
+    set_session_cookie(response, user)
     return response
 
 
@@ -112,9 +131,11 @@ async def edit_profile(
     dob: str = Form(...),
     category: list[str] = Form([]),
     avatar: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(current_user_async),
 ):
-    user = current_user(request)
+    if not user:
+        return RedirectResponse("/auth")
 
     try:
         birth = datetime.strptime(dob, "%Y-%m-%d")
@@ -131,27 +152,55 @@ async def edit_profile(
             status_code=400
         )
 
-    # ✅ Сохраняем аватар
-    if avatar is not None and avatar.filename and avatar.filename.strip():
-        data = await avatar.read()
-        if data:
-            ext = Path(avatar.filename).suffix or ".png"
-            filename = f"user_{user.id}_{uuid.uuid4().hex}{ext}"
-            file_path = AVATAR_DIR / filename
-
-            with open(file_path, "wb") as f:
-                f.write(data)
+    try:
+        nickname = clean_nickname(nickname)
+    except NicknameError as e:
+        return templates.TemplateResponse(
+            "edit_profile.html",
+            {
+                "request": request, "user": user, "countries": countries,
+                "message": {"type": "error", "text": f"⚠️ {e}"}
+            },
+            status_code=400
+        )
 
-            user.avatar = f"/static/avatars/{filename}"
+    # ✅ Сохраняем аватар (потоково, с лимитом размера — services/avatars.py)
+    if avatar is not None and avatar.filename and avatar.filename.strip():
+        try:
+            user.avatar = await ingest_avatar(avatar)
+        except AvatarError as e:
+            return templates.TemplateResponse(
+                "edit_profile.html",
+                {
+                    "request": request, "user": user, "countries": countries,
+                    "message": {"type": "error", "text": f"⚠️ {e}"}
+                },
+                status_code=400
+            )
 
     user.first_name = first_name
     user.last_name = last_name
     user.nickname = nickname
+    user.nickname_key = nickname_key(nickname)
     user.country = country
     user.dob = dob
     user.category = ",".join(category)
 
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await db.refresh(user)  # после rollback — снова значения из БД
+        nicknames.remember(nickname)
+        return templates.TemplateResponse(
+            "edit_profile.html",
+            {
+                "request": request, "user": user, "countries": countries,
+                "message": {"type": "error", "text": "⚠️ Nickname is already taken"}
+            },
+            status_code=409
+        )
+    nicknames.remember(nickname)
 
     return templates.TemplateResponse(
         "edit_profile.html",
@@ -164,48 +213,62 @@ async def edit_profile(
 
 # ✅ Отправка кода на email
 @router.post("/send-email-code")
-async def send_email_code(new_email: str = Form(...), request: Request = None, db: Session = Depends(get_db)):
-    user = current_user(request)
+async def send_email_code(new_email: str = Form(...), request: Request = None, db: AsyncSession = Depends(get_async_db)):
+    user = session_claims(request)
     if not user:
         return RedirectResponse("/auth")
 
-    code = str(random.randint(100000, 999999))
-    expires = datetime.now() + timedelta(minutes=10)
-
-    db.add(EmailVerificationCode(
-        user_id=user.id, code=code, email=new_email, expires_at=expires
-    ))
-    db.commit()
+    # ✅ один активный код на пользователя: новый заменяет прежний
+    code = await issue_code(db, user.id, new_email)
 
-    send_email(new_email, "Verification Code", f"Your code: {code}")
+    # ✅ только ставим в очередь — отправляет фоновый поток
+    if not send_email(new_email, "Verification Code", f"Your code: {code}"):
+        raise HTTPException(status_code=503, detail="Email service is unavailable, try again later")
     return {"success": True, "message": "Verification code sent!"}
 
 
 # ✅ Подтверждение email
 @router.post("/verify-email-code")
-async def verify_email_code(code: str = Form(...), request: Request = None, db: Session = Depends(get_db)):
-    user = current_user(request)
-
-    db_code = db.query(EmailVerificationCode).filter(
-        EmailVerificationCode.user_id == user.id,
-        EmailVerificationCode.code == code
-    ).first()
-
-    if not db_code or db_code.expires_at < datetime.now():
-        return {"error": "Invalid or expired code"}
+async def verify_email_code(
+    code: str = Form(...),
+    request: Request = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(current_user_async),
+):
+    if not user:
+        return RedirectResponse("/auth")
 
-    user.email = db_code.email
-    db.delete(db_code)
-    db.commit()
+    try:
+        user.email = await consume_code(db, user.id, code)
+    except VerificationError as e:
+        return {"error": str(e)}
+    await db.commit()
 
     return {"success": True}
 
 
-# ✅ Проверка никнейма
+# ✅ Проверка никнейма (на каждое нажатие клавиши): свободные ники — без запроса в БД
 @router.get("/check-nickname")
-def check_nickname(nickname: str = Query(...), db: Session = Depends(get_db)):
-    exists = db.query(User).filter(User.nickname == nickname).first()
-    return {"available": not bool(exists)}
+async def check_nickname(request: Request, nickname: str = Query(...), db: AsyncSession = Depends(get_async_db)):
+    claims = session_claims(request)
+    available = await nicknames.is_available(db, nickname, claims.user_id if claims else None)
+    return {"available": available}
+
+
+# ✅ Поиск игроков по началу ника
+@router.get("/players/search")
+async def search_players(
+    q: str = Query(..., max_length=nicknames.NICKNAME_MAX),
+    limit: int = Query(10, ge=1, le=nicknames.SEARCH_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = await nicknames.search(db, q, limit)
+    return {
+        "items": [
+            {"user_id": row.id, "nickname": row.nickname, "avatar": row.avatar, "level": row.level}
+            for row in rows
+        ]
+    }
 
 
 """@router.get("/profile/customize", response_class=HTMLResponse)
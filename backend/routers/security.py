@@ -1,23 +1,25 @@
+import logging
+
 from fastapi import APIRouter, Request, Form, Depends, HTTPException
 from fastapi.responses import RedirectResponse
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from backend.database import get_db
-from backend.models import User, EmailVerificationCode
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_async_db
+from backend.models import User
 from backend.core.templates import templates
-import random
-from datetime import datetime, timedelta
-from backend.core.auth import current_user
+from backend.core.auth import current_user, current_user_async
+from backend.core.session_tokens import session_claims, revoke_sessions, set_session_cookie
 from backend.services.email_service import send_email
+from backend.services.passwords import hash_password, verify_password
+from backend.services.verification import issue_code
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # 📍 Страница безопасности
 @router.get("/account-security")
 def account_security(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id:
+    if not session_claims(request):
         return RedirectResponse("/auth")
     return templates.TemplateResponse("account_security.html", {"request": request})
 
@@ -27,17 +29,15 @@ async def change_email(
     request: Request,
     new_email: str = Form(...),
     current_password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(current_user_async),
 ):
-    user = current_user(request)
     if not user:
         return RedirectResponse("/auth")
 
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
     # ✅ Проверка пароля
-    if not pwd_context.verify(current_password, user.password):
+    ok, _ = await verify_password(current_password, user.password)
+    if not ok:
         return templates.TemplateResponse(
             "account_security.html",
             {
@@ -47,7 +47,7 @@ async def change_email(
         )
 
     # ✅ Email уже занят?
-    existing = db.query(User).filter(User.email == new_email).first()
+    existing = (await db.execute(select(User.id).where(User.email == new_email))).first()
     if existing:
         return templates.TemplateResponse(
             "account_security.html",
@@ -58,15 +58,11 @@ async def change_email(
         )
 
     # ✅ Генерация и отправка кода
-    code = str(random.randint(100000, 999999))
-    expires = datetime.now() + timedelta(minutes=10)
-
-    db_code = EmailVerificationCode(user_id=user.id, code=code, email=new_email, expires_at=expires)
-    db.add(db_code)
-    db.commit()
+    code = await issue_code(db, user.id, new_email)
 
-    print("📧 Sending code to:", new_email, "CODE:", code)
-    send_email(new_email, "Email Change Verification", f"Your code: {code}")
+    logger.info("email change code issued", extra={"user_id": user.id})
+    if not send_email(new_email, "Email Change Verification", f"Your code: {code}"):
+        raise HTTPException(status_code=503, detail="Email service is unavailable, try again later")
 
 
     return templates.TemplateResponse(
@@ -82,17 +78,19 @@ async def change_email(
 
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     request: Request,
     current_password: str = Form(...),
     new_password: str = Form(...),
     confirm_password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(current_user_async),
 ):
-    user_id = request.cookies.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return RedirectResponse("/auth")
 
-    if not pwd_context.verify(current_password, user.password):
+    ok, _ = await verify_password(current_password, user.password)
+    if not ok:
         return templates.TemplateResponse(
             "account_security.html",
             {"request": request, "user": user, "message": {"type": "error", "text": "❌ Wrong current password"}}
@@ -104,10 +102,15 @@ def change_password(
             {"request": request, "user": user, "message": {"type": "error", "text": "⚠️ Passwords do not match"}}
         )
 
-    user.password = pwd_context.hash(new_password)
-    db.commit()
+    user.password = await hash_password(new_password)
+    # ✅ старые сессии на других устройствах больше не действуют
+    await db.run_sync(revoke_sessions, user.id)
+    await db.commit()
+    await db.refresh(user)
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "account_security.html",
         {"request": request, "user": user, "message": {"type": "success", "text": "✅ Password changed successfully!"}}
     )
+    set_session_cookie(response, user)
+    return response
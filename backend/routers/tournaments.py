@@ -1,11 +1,24 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from collections import defaultdict
-from datetime import datetime
-
-from backend.database import get_db
-from backend.models import Tournament, Match, Team
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from dataclasses import asdict
+from urllib.parse import urlencode
+
+from backend.database import get_db, get_async_db
+from backend.models import Tournament
+from backend.core.auth import current_user_async, current_identity
+from backend.core.session_tokens import SessionClaims
 from backend.core.templates import templates
+from backend.services.bracket_generator import generate_bracket_for_tournament, generate_next_swiss_round
+from backend.services.standings import standings_query, rebuild_standings, check_standings_consistency
+from backend.services.rewards import RewardsAlreadyGranted, finalize_tournament
+from backend.services.tournament_listing import (
+    DEFAULT_PAGE_SIZE, PRICE_FILTERS, fetch_tournament_page, tournament_card,
+)
+from backend.services.bracket_view import (
+    cached_bracket, store_bracket, bracket_rows_query, rows_from_result, match_list_query, match_list_from_result,
+)
 
 router = APIRouter()
 
@@ -26,207 +39,112 @@ GAME_LOGOS = {
     "Chess.com": "chess_com.png",
 }
 
-ROUND_LABELS = {
-    1: "Quarterfinals",
-    2: "Semifinals",
-    3: "Final",
-    4: "Grand Final",
-}
+GAMES = [
+    "FIFA", "UFC", "Dota", "CS2", "Valorant",
+    "Chess.com", "LoL", "PUBG", "Fortnite",
+    "WoT", "Clash Royale", "Rocket League",
+    "Apex Legends", "Overwatch 2",
+]
+FORMATS = ["single_elim", "double_elim", "round_robin", "swiss"]
+STATUSES = ["Planned", "Registration", "Live", "Completed"]
+
+
+async def _tournament_page(db: AsyncSession, game, format, status, price, cursor, limit):
+    if price and price not in PRICE_FILTERS:
+        raise HTTPException(status_code=400, detail="Unknown price filter")
+    try:
+        return await fetch_tournament_page(
+            db, limit=limit, discipline=game, format=format, status=status, price=price, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.get("/tournaments")
-def tournaments_page(
+async def tournaments_page(
     request: Request,
     game: str = None,
     format: str = None,
-    type: str = None,
     price: str = None,
     status: str = None,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(current_user_async),
 ):
-    query = db.query(Tournament)
-
-    if game:
-        query = query.filter(Tournament.discipline == game)
-    if format:
-        query = query.filter(Tournament.format == format)
-    if type:
-        query = query.filter(Tournament.type == type)
-    if price:
-        query = query.filter(Tournament.entry_type == price)
-    if status:
-        query = query.filter(Tournament.status == status)
-
-    tournaments = query.order_by(Tournament.start_date.asc()).all()
-
-    games = [
-        "FIFA", "UFC", "Dota", "CS2", "Valorant",
-        "Chess.com", "LoL", "PUBG", "Fortnite",
-        "WoT", "Clash Royale", "Rocket League",
-        "Apex Legends", "Overwatch 2",
-    ]
+    tournaments, next_cursor = await _tournament_page(db, game, format, status, price, cursor, limit)
+
+    # ссылка «дальше» сохраняет фильтры
+    next_url = None
+    if next_cursor:
+        params = {"game": game, "format": format, "price": price, "status": status, "limit": limit}
+        next_url = "/tournaments?" + urlencode({**{k: v for k, v in params.items() if v}, "cursor": next_cursor})
 
     return templates.TemplateResponse(
         "tournaments.html",
         {
             "request": request,
             "tournaments": tournaments,
-            "games": games,
+            "games": GAMES,
+            "formats": FORMATS,
+            "statuses": STATUSES,
             "game": game,
+            "format": format,
+            "price": price,
+            "status": status,
+            "next_url": next_url,
             "GAME_LOGOS": GAME_LOGOS,
         }
     )
 
 
-from math import log2, ceil
-from collections import defaultdict
+# ✅ Тот же листинг в JSON
+@router.get("/api/tournaments")
+async def tournaments_api(
+    game: str = None,
+    format: str = None,
+    price: str = None,
+    status: str = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_db),
+):
+    tournaments, next_cursor = await _tournament_page(db, game, format, status, price, cursor, limit)
+    return {"items": [tournament_card(t) for t in tournaments], "next_cursor": next_cursor}
 
 
 @router.get("/tournament/{tournament_id}")
-def tournament_view(
+async def tournament_view(
     tournament_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(current_user_async),
 ):
-    tournament: Tournament | None = (
-        db.query(Tournament)
-        .options(
-            joinedload(Tournament.teams),
-            joinedload(Tournament.matches).joinedload(Match.team1),
-            joinedload(Tournament.matches).joinedload(Match.team2),
-        )
-        .filter(Tournament.id == tournament_id)
-        .first()
-    )
+    # версию читаем до загрузки матчей: запись, закоммиченная между ними,
+    # поднимет версию, и собранная здесь сетка не перезапишет свежую
+    version, bracket = cached_bracket(tournament_id)
+
+    tournament: Tournament | None = (await db.execute(
+        select(Tournament)
+        .options(selectinload(Tournament.teams))
+        .where(Tournament.id == tournament_id)
+    )).scalar_one_or_none()
 
     if not tournament:
         raise HTTPException(status_code=404, detail="Tournament not found")
 
     teams = tournament.teams
 
-    # ----- ВСЕ МАТЧИ ТУРНИРА (для Matches + Standings) -----
-    matches = sorted(
-        tournament.matches,
-        key=lambda m: m.match_date or datetime.min,
-    )
-
-    # ----- STANDINGS КАК РАНЬШЕ -----
-    stats = defaultdict(
-        lambda: {
-            "team": None,
-            "played": 0,
-            "wins": 0,
-            "draws": 0,
-            "losses": 0,
-            "scored": 0,
-            "conceded": 0,
-            "points": 0,
-        }
-    )
+    # ----- ВСЕ МАТЧИ ТУРНИРА (вкладка Matches): плоские строки, без ORM-объектов -----
+    matches = match_list_from_result(await db.execute(match_list_query(tournament_id)))
 
-    for match in matches:
-        if not match.team1 or not match.team2:
-            continue
-
-        s1 = match.score_team1 or 0
-        s2 = match.score_team2 or 0
-
-        for team, scored, conceded, is_win, is_draw in [
-            (match.team1, s1, s2, s1 > s2, s1 == s2),
-            (match.team2, s2, s1, s2 > s1, s1 == s2),
-        ]:
-            row = stats[team.id]
-            row["team"] = team
-            row["played"] += 1
-            row["scored"] += scored
-            row["conceded"] += conceded
-
-            if is_draw:
-                row["draws"] += 1
-                row["points"] += 1
-            elif is_win:
-                row["wins"] += 1
-                row["points"] += 3
-            else:
-                row["losses"] += 1
-
-    standings = sorted(
-        stats.values(),
-        key=lambda r: (
-            -r["points"],
-            -(r["scored"] - r["conceded"]),
-            -r["scored"],
-        ),
-    )
-
-    # ----- BRACKET: только матчи, где round_number не None -----
-    round_map: dict[int, list[Match]] = defaultdict(list)
-    for m in matches:
-        if m.round_number is not None:
-            round_map[m.round_number].append(m)
-
-    bracket: list[dict] = []
-    previous_round_view: list[dict] | None = None
-
-    for rn in sorted(round_map.keys()):
-        raw_matches = sorted(round_map[rn], key=lambda m: m.id)
-        round_view: list[dict] = []
-
-        for idx, m in enumerate(raw_matches):
-            s1 = m.score_team1
-            s2 = m.score_team2
-
-            winner_id = None
-            if s1 is not None and s2 is not None:
-                if s1 > s2:
-                    winner_id = m.team1_id
-                elif s2 > s1:
-                    winner_id = m.team2_id
-
-            # базовые команды из БД
-            display_team1 = m.team1
-            display_team2 = m.team2
-
-            # автоподстановка победителей из прошлого раунда
-            if previous_round_view:
-                source_idx1 = idx * 2
-                source_idx2 = idx * 2 + 1
-
-                if not display_team1 and source_idx1 < len(previous_round_view):
-                    src = previous_round_view[source_idx1]
-                    display_team1 = src.get("winner_team") or src.get("team1") or src.get("team2")
-
-                if not display_team2 and source_idx2 < len(previous_round_view):
-                    src = previous_round_view[source_idx2]
-                    display_team2 = src.get("winner_team") or src.get("team1") or src.get("team2")
-
-            winner_team = None
-            if winner_id and (display_team1 and display_team1.id == winner_id):
-                winner_team = display_team1
-            elif winner_id and (display_team2 and display_team2.id == winner_id):
-                winner_team = display_team2
-
-            round_view.append(
-                {
-                    "id": m.id,
-                    "round": rn,
-                    "team1": display_team1,
-                    "team2": display_team2,
-                    "score1": s1,
-                    "score2": s2,
-                    "winner_id": winner_id,
-                    "winner_team": winner_team,
-                }
-            )
-
-        bracket.append(
-            {
-                "number": rn,
-                "label": ROUND_LABELS.get(rn, f"Round {rn}"),
-                "matches": round_view,
-            }
-        )
+    # ----- STANDINGS: готовая таблица, один индексированный запрос -----
+    standings = (await db.execute(standings_query(tournament_id))).scalars().all()
 
-        previous_round_view = round_view
+    # ----- BRACKET: из кэша, пересборка только после записи в матчи -----
+    if bracket is None:
+        rows = [m for m in matches if m["round"] is not None]
+        bracket = store_bracket(tournament_id, version, rows, tournament.format)
 
     prize = getattr(tournament, "entry_price", None) or 0
     format_ = getattr(tournament, "format", None) or "TBA"
@@ -248,4 +166,128 @@ def tournament_view(
             "GAME_LOGOS": GAME_LOGOS,
             "bracket": bracket,
         },
-    )
\ No newline at end of file
+    )
+
+
+# ✅ Сетка турнира в JSON (для live-обновления): при попадании в кэш — без БД
+@router.get("/tournament/{tournament_id}/bracket")
+async def tournament_bracket(tournament_id: int, db: AsyncSession = Depends(get_async_db)):
+    version, bracket = cached_bracket(tournament_id)
+    if bracket is None:
+        format_ = (await db.execute(select(Tournament.format).where(Tournament.id == tournament_id))).scalar_one_or_none()
+        if format_ is None:
+            raise HTTPException(status_code=404, detail="Tournament not found")
+        rows = rows_from_result(await db.execute(bracket_rows_query(tournament_id)))
+        bracket = store_bracket(tournament_id, version, rows, format_)
+
+    return {"tournament_id": tournament_id, "version": version, "rounds": bracket}
+
+
+# ✅ Генерация всей сетки по формату турнира (ТОЛЬКО ADMIN)
+@router.post("/tournament/{tournament_id}/generate-bracket")
+def generate_bracket(
+    tournament_id: int,
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    tournament = db.query(Tournament).filter(Tournament.id == tournament_id).first()
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+
+    try:
+        created = generate_bracket_for_tournament(db, tournament)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"success": True, "created": created}
+
+
+# ✅ Следующий тур швейцарки (ТОЛЬКО ADMIN)
+@router.post("/tournament/{tournament_id}/swiss/next-round")
+def swiss_next_round(
+    tournament_id: int,
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    tournament = db.query(Tournament).filter(Tournament.id == tournament_id).first()
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+    if tournament.format != "swiss":
+        raise HTTPException(status_code=400, detail="Tournament is not Swiss")
+
+    created = generate_next_swiss_round(db, tournament)
+    if not created:
+        raise HTTPException(status_code=400, detail="Current round is not finished")
+
+    return {"success": True, "created": created}
+
+
+# ✅ Полный пересчёт таблицы (ТОЛЬКО ADMIN)
+@router.post("/tournament/{tournament_id}/standings/rebuild")
+def rebuild_tournament_standings(
+    tournament_id: int,
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        rows = rebuild_standings(db, tournament_id)
+        db.commit()
+    except:
+        db.rollback()
+        raise
+
+    return {"success": True, "rows": rows}
+
+
+# ✅ Сверка таблицы с пересчётом с нуля (ТОЛЬКО ADMIN)
+@router.get("/tournament/{tournament_id}/standings/check")
+def check_tournament_standings(
+    tournament_id: int,
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    problems = check_standings_consistency(db, tournament_id)
+    return {"consistent": not problems, "problems": problems}
+
+
+# ✅ Завершение турнира и выдача наград (ТОЛЬКО ADMIN)
+@router.post("/tournament/{tournament_id}/finalize")
+def finalize_tournament_rewards(
+    tournament_id: int,
+    user: SessionClaims = Depends(current_identity),
+    db: Session = Depends(get_db),
+):
+    if user.role_id != 1:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    tournament = db.query(Tournament).filter(Tournament.id == tournament_id).first()
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+
+    try:
+        report = finalize_tournament(db, tournament)
+        db.commit()
+    except RewardsAlreadyGranted as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except:
+        db.rollback()
+        raise
+
+    return {"success": True, **asdict(report)}
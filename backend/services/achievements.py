@@ -0,0 +1,177 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from backend.models import Achievement, UserAchievement, UserStats, Team
+from backend.services.catalog import CATALOG_TTL
+from backend.services.catalog_seed import dialect_insert
+from backend.services.events import MATCH_RESULT, PURCHASE, subscribe
+from backend.services.standings import MatchResult, match_contribution
+from backend.services.xp import award_xp
+
+COUNTERS = ("matches_played", "wins", "tournaments_won", "items_owned")
+
+
+@dataclass(frozen=True)
+class Rule:
+    achievement_id: int
+    threshold: int
+    xp_reward: int
+
+
+# -----------------------------------------------------
+# Правила (из achievements.counter / threshold), кэш в процессе
+# -----------------------------------------------------
+_lock = threading.Lock()
+_rules: dict[str, tuple[list[int], list[Rule]]] | None = None
+_loaded_at = 0.0
+
+
+def get_rules(db: Session) -> dict[str, tuple[list[int], list[Rule]]]:
+    """счётчик → (пороги по возрастанию, правила в том же порядке)."""
+    global _rules, _loaded_at
+    rules = _rules
+    if rules is not None and time.monotonic() - _loaded_at < CATALOG_TTL:
+        return rules
+
+    grouped: dict[str, list[Rule]] = defaultdict(list)
+    for row in db.execute(
+        select(Achievement.id, Achievement.threshold, Achievement.xp_reward, Achievement.counter)
+        .where(Achievement.counter.in_(COUNTERS), Achievement.threshold.is_not(None))
+        .order_by(Achievement.threshold)
+    ):
+        grouped[row.counter].append(Rule(row.id, row.threshold, row.xp_reward or 0))
+    rules = {counter: ([r.threshold for r in items], items) for counter, items in grouped.items()}
+
+    with _lock:
+        _rules, _loaded_at = rules, time.monotonic()
+    return rules
+
+
+def invalidate_rules() -> None:
+    """Вызывать после синхронизации каталога ачивок."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
+
+
+def crossed(rules, counter: str, old: int, new: int) -> list[Rule]:
+    """Правила, порог которых пройден при переходе old → new: два bisect, без перебора."""
+    if counter not in rules or new <= old:
+        return []
+    thresholds, items = rules[counter]
+    return items[bisect_right(thresholds, old):bisect_right(thresholds, new)]
+
+
+# -----------------------------------------------------
+# Счётчики и выдача
+# -----------------------------------------------------
+def bump_counters(db: Session, deltas: dict[int, dict[str, int]]) -> dict[int, dict[str, int]]:
+    """
+    Прибавляет дельты одним upsert на всю пачку и читает новые значения одним SELECT.
+    Upsert блокирует строки user_stats до коммита — события одного пользователя
+    обрабатываются по очереди.
+    """
+    rows = [{"user_id": user_id, **{c: delta.get(c, 0) for c in COUNTERS}} for user_id, delta in deltas.items()]
+    stmt = dialect_insert(db, UserStats).values(rows)
+    if db.get_bind().dialect.name in ("mysql", "mariadb"):
+        stmt = stmt.on_duplicate_key_update({c: getattr(UserStats, c) + stmt.inserted[c] for c in COUNTERS})
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"], set_={c: getattr(UserStats, c) + stmt.excluded[c] for c in COUNTERS},
+        )
+    db.execute(stmt)
+
+    columns = [getattr(UserStats, c) for c in COUNTERS]
+    return {
+        row.user_id: {c: getattr(row, c) for c in COUNTERS}
+        for row in db.execute(select(UserStats.user_id, *columns).where(UserStats.user_id.in_(deltas)))
+    }
+
+
+def record(db: Session, deltas: dict[int, dict[str, int]]) -> list[tuple[int, Rule]]:
+    """
+    Применяет изменения счётчиков {user_id: {счётчик: дельта}} и выдаёт
+    ачивки, чьи пороги пройдены, одной вставкой. Стоимость зависит только
+    от размера пачки, а не от истории пользователя. Коммитит вызывающий.
+    Возвращает новые ачивки [(user_id, правило)]; XP за них начисляет вызывающий.
+    """
+    deltas = {
+        user_id: {c: v for c, v in delta.items() if v}
+        for user_id, delta in deltas.items() if any(delta.values())
+    }
+    if not deltas:
+        return []
+
+    rules = get_rules(db)
+    values = bump_counters(db, deltas)
+
+    candidates: dict[tuple[int, int], Rule] = {}
+    for user_id, delta in deltas.items():
+        for counter, change in delta.items():
+            new = values[user_id][counter]
+            for rule in crossed(rules, counter, new - change, new):
+                candidates[(user_id, rule.achievement_id)] = rule
+    if not candidates:
+        return []
+
+    # счётчик мог упасть (исправленный счёт) и снова пройти порог — ачивка выдаётся один раз
+    owned = set(db.execute(
+        select(UserAchievement.user_id, UserAchievement.achievement_id)
+        .where(tuple_(UserAchievement.user_id, UserAchievement.achievement_id).in_(list(candidates)))
+    ).all())
+    earned = [(user_id, rule) for (user_id, achievement_id), rule in candidates.items()
+              if (user_id, achievement_id) not in owned]
+    if earned:
+        db.execute(insert(UserAchievement), [
+            {"user_id": user_id, "achievement_id": rule.achievement_id} for user_id, rule in earned
+        ])
+    return earned
+
+
+def earned_xp(earned: list[tuple[int, Rule]]) -> dict[int, int]:
+    xp: dict[int, int] = defaultdict(int)
+    for user_id, rule in earned:
+        xp[user_id] += rule.xp_reward
+    return dict(xp)
+
+
+def process(db: Session, deltas: dict[int, dict[str, int]]) -> list[tuple[int, Rule]]:
+    """record + XP за новые ачивки."""
+    earned = record(db, deltas)
+    award_xp(db, earned_xp(earned))
+    return earned
+
+
+# -----------------------------------------------------
+# Подписки на события
+# -----------------------------------------------------
+@subscribe(MATCH_RESULT)
+def on_match_result(db: Session, before: MatchResult | None, after: MatchResult | None) -> None:
+    """Разница старого и нового результата → счётчики капитанов команд."""
+    team_deltas: dict[int, dict[str, int]] = defaultdict(lambda: dict.fromkeys(("matches_played", "wins"), 0))
+    for sign, result in ((-1, before), (1, after)):
+        for team_id, contribution in match_contribution(result).items():
+            team_deltas[team_id]["matches_played"] += sign * contribution["played"]
+            team_deltas[team_id]["wins"] += sign * contribution["wins"]
+    team_deltas = {team_id: d for team_id, d in team_deltas.items() if any(d.values())}
+    if not team_deltas:
+        return
+
+    deltas: dict[int, dict[str, int]] = defaultdict(lambda: dict.fromkeys(("matches_played", "wins"), 0))
+    for team_id, user_id in db.execute(
+        select(Team.id, Team.created_by).where(Team.id.in_(team_deltas), Team.created_by.is_not(None))
+    ):
+        for counter, change in team_deltas[team_id].items():
+            deltas[user_id][counter] += change
+    process(db, deltas)
+
+
+@subscribe(PURCHASE)
+def on_purchase(db: Session, user_id: int, item_type: str, item_id: int) -> None:
+    process(db, {user_id: {"items_owned": 1}})
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from backend.models import User
+from backend.services.maintenance import JobRun, register_job
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow в requirements.txt; без него — деградация: в профиле оригинал без миниатюры
+    Image = None
+
+AVATAR_DIR = Path("backend/static/avatars")
+AVATAR_URL = "/static/avatars"
+DEFAULT_AVATAR = f"{AVATAR_URL}/default.png"
+
+MAX_AVATAR_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+THUMB_SIZE = 256
+THUMB_WORKERS = int(os.getenv("AVATAR_THUMB_WORKERS", "2"))
+# файлы моложе этого не трогаем: загрузка могла ещё не закоммитить users.avatar
+GC_GRACE_SECONDS = 3600
+PROTECTED_FILES = {"default.png", "default-avatar.png"}
+
+# сигнатура → расширение; имя и Content-Type от клиента не используются
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+_CONTENT_NAME = re.compile(r"^([0-9a-f]{64})")
+
+
+class AvatarError(ValueError):
+    """Загрузка отклонена — роутер отдаёт 400."""
+
+
+class AvatarTooLarge(AvatarError):
+    def __init__(self):
+        super().__init__(f"Avatar must be at most {MAX_AVATAR_BYTES // (1024 * 1024)} MB")
+
+
+def _extension(head: bytes) -> str:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    raise AvatarError("Avatar must be a PNG, JPEG, GIF or WEBP image")
+
+
+# -----------------------------------------------------
+# Приём файла (в потоке, не на event loop)
+# -----------------------------------------------------
+def _touch(path: Path) -> bool:
+    """Есть ли уже такой файл; если да — свежий mtime, чтобы GC не удалил его до коммита ссылки."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _store(source) -> Path:
+    """
+    Копирует загрузку кусками во временный файл, считая sha256 и размер;
+    превышение лимита обрывает копирование. Итоговое имя — хэш содержимого:
+    одинаковые картинки хранятся один раз.
+    """
+    AVATAR_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = AVATAR_DIR / f".tmp-{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    size = 0
+    ext = None
+    try:
+        with open(tmp, "wb") as out:
+            while chunk := source.read(CHUNK_SIZE):
+                if ext is None:
+                    ext = _extension(chunk)
+                size += len(chunk)
+                if size > MAX_AVATAR_BYTES:
+                    raise AvatarTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            raise AvatarError("Avatar file is empty")
+
+        path = AVATAR_DIR / f"{digest.hexdigest()}{ext}"
+        if _touch(path):
+            tmp.unlink()
+        else:
+            os.replace(tmp, path)
+        return path
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def make_thumbnail(source: str, target: str, size: int = THUMB_SIZE) -> None:
+    """Квадратная миниатюра (обрезка по центру). Выполняется в пуле процессов."""
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img = ImageOps.fit(img.convert("RGBA"), (size, size), Image.LANCZOS)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        img.save(tmp, "WEBP", quality=85)
+    os.replace(tmp, target)
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _thumbnail_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # без fork — как и пул bcrypt в passwords.py
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=THUMB_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def ingest_avatar(upload: UploadFile) -> str:
+    """
+    Единая точка приёма аватара: возвращает URL для users.avatar.
+    Память воркера не зависит от размера файла, диск и ресайз — вне event loop.
+    """
+    if upload.size is not None and upload.size > MAX_AVATAR_BYTES:
+        raise AvatarTooLarge()
+
+    original = await run_in_threadpool(_store, upload.file)
+    if Image is None:
+        return f"{AVATAR_URL}/{original.name}"
+
+    digest = _CONTENT_NAME.match(original.name).group(1)
+    thumb = AVATAR_DIR / f"{digest}_{THUMB_SIZE}.webp"
+    if not await run_in_threadpool(_touch, thumb):
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                _thumbnail_pool(), make_thumbnail, str(original), str(thumb), THUMB_SIZE,
+            )
+        except Exception:
+            # сигнатура совпала, но картинка битая
+            await run_in_threadpool(original.unlink, missing_ok=True)
+            raise AvatarError("Avatar image could not be read")
+    return f"{AVATAR_URL}/{thumb.name}"
+
+
+# -----------------------------------------------------
+# Уборка файлов, на которые никто не ссылается
+# -----------------------------------------------------
+def _is_stale(path: Path) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime >= GC_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def orphaned_files(referenced: set[str]) -> list[Path]:
+    """
+    Файл живой, если на него ссылается users.avatar, или это оригинал
+    (тот же хэш) живой миниатюры. Свежие файлы и заглушки не трогаем.
+    """
+    live_digests = {m.group(1) for name in referenced if (m := _CONTENT_NAME.match(name))}
+    orphans = []
+    for path in AVATAR_DIR.iterdir():
+        if not path.is_file() or path.name in PROTECTED_FILES or path.name in referenced:
+            continue
+        match = _CONTENT_NAME.match(path.name)
+        if match and match.group(1) in live_digests:
+            continue
+        if _is_stale(path):
+            orphans.append(path)
+    return orphans
+
+
+@register_job("avatar_files", interval=6 * 3600)
+def delete_orphaned_avatars(run: JobRun) -> None:
+    prefix = f"{AVATAR_URL}/"
+    referenced = {
+        avatar[len(prefix):]
+        for avatar in run.db.execute(
+            select(User.avatar).where(User.avatar.like(f"{prefix}%")).distinct()
+            .execution_options(yield_per=run.batch_size)
+        ).scalars()
+    }
+    run.db.commit()  # снимок ссылок снят — дальше работаем только с диском
+
+    orphans = orphaned_files(referenced)
+    for start in range(0, len(orphans), run.batch_size):
+        if run.stop.is_set():
+            break
+        batch = orphans[start:start + run.batch_size]
+        for path in batch:
+            # файл могли переиспользовать (тот же хэш) уже после снимка ссылок
+            if _is_stale(path):
+                path.unlink(missing_ok=True)
+        run.checkpoint(len(batch))
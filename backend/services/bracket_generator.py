@@ -1,43 +1,437 @@
-from sqlalchemy.orm import Session
-from backend.models import Tournament, Match
+from dataclasses import dataclass
 from typing import List
 
+from sqlalchemy import insert, select, exists, update
+from sqlalchemy.orm import Session
+
+from backend.models import Tournament, Match, tournament_participants
+from backend.services.bracket_view import ELIMINATION_FORMATS, mark_bracket_dirty
+
+# адрес слота в плане: (bracket, round_number, position, slot)
+SlotRef = tuple[str, int, int, int]
+
+
+@dataclass
+class PlannedMatch:
+    """Матч плана сетки до вставки в БД."""
+    bracket: str
+    round_number: int
+    position: int
+    team1_id: int | None = None
+    team2_id: int | None = None
+    winner_to: SlotRef | None = None  # куда уходит победитель
+    loser_to: SlotRef | None = None   # куда уходит проигравший (двойное выбывание)
+
+    @property
+    def key(self) -> tuple[str, int, int]:
+        return self.bracket, self.round_number, self.position
+
+
+# -----------------------------------------------------
+# Посев
+# -----------------------------------------------------
+def seed_order(size: int) -> list[int]:
+    """
+    Стандартная расстановка посевов по слотам первого раунда (size — степень двойки):
+    8 → [1, 8, 4, 5, 2, 7, 3, 6], т.е. 1-й и 2-й сеяные встречаются только в финале.
+    """
+    order = [1]
+    while len(order) < size:
+        n = len(order) * 2
+        order = [x for seed in order for x in (seed, n + 1 - seed)]
+    return order
+
+
+def _bracket_size(team_count: int) -> int:
+    size = 1
+    while size < team_count:
+        size *= 2
+    return size
+
+
+# -----------------------------------------------------
+# Форматы
+# -----------------------------------------------------
+def plan_single_elim(team_ids: list[int], bracket: str = "main") -> list[PlannedMatch]:
+    """
+    Полное дерево на выбывание. Для N не степени двойки сильнейшие посевы
+    получают bye: в их матче 1-го раунда нет соперника.
+    """
+    size = _bracket_size(len(team_ids))
+    slots = [team_ids[seed - 1] if seed <= len(team_ids) else None for seed in seed_order(size)]
+
+    plan = [
+        PlannedMatch(bracket, 1, pos, slots[2 * pos], slots[2 * pos + 1])
+        for pos in range(size // 2)
+    ]
+
+    round_number, matches_in_round = 2, size // 4
+    while matches_in_round >= 1:
+        plan.extend(PlannedMatch(bracket, round_number, pos) for pos in range(matches_in_round))
+        round_number += 1
+        matches_in_round //= 2
 
-def generate_bracket_for_tournament(db: Session, tournament: Tournament) -> None:
+    # победитель пары (2k, 2k+1) раунда r встречается в матче k раунда r+1
+    last_round = round_number - 1
+    for m in plan:
+        if m.round_number < last_round:
+            m.winner_to = (bracket, m.round_number + 1, m.position // 2, m.position % 2 + 1)
+    return plan
+
+
+def plan_double_elim(team_ids: list[int]) -> list[PlannedMatch]:
+    """
+    Верхняя сетка + нижняя + гранд-финал.
+    Нижняя сетка для 2^k слотов — 2(k-1) раундов: нечётные раунды сводят
+    между собой выживших, чётные принимают проигравших из верхней сетки.
     """
-    Простая генерация сетки:
+    upper = plan_single_elim(team_ids, bracket="main")
+
+    size = _bracket_size(len(team_ids))
+    lower: list[PlannedMatch] = []
+    matches_in_round = size // 4
+    round_number = 1
+    while matches_in_round >= 1:
+        for _ in range(2):  # пара раундов с одинаковым числом матчей
+            lower.extend(PlannedMatch("losers", round_number, pos) for pos in range(matches_in_round))
+            round_number += 1
+        matches_in_round //= 2
+    last_lower = round_number - 1
+    last_upper = max(m.round_number for m in upper)
+    grand_final = PlannedMatch("grand_final", 1, 0)
+
+    for m in upper:
+        if m.round_number == 1:
+            # проигравшие 1-го раунда играют между собой в 1-м раунде нижней сетки
+            m.loser_to = ("losers", 1, m.position // 2, m.position % 2 + 1) if lower else None
+        else:
+            # остальные встречают выжившего снизу в чётном раунде
+            m.loser_to = ("losers", 2 * (m.round_number - 1), m.position, 2)
+        if m.round_number == last_upper:
+            m.winner_to = ("grand_final", 1, 0, 1)
+    if not lower:
+        upper[-1].loser_to = ("grand_final", 1, 0, 2)
+
+    for m in lower:
+        if m.round_number == last_lower:
+            m.winner_to = ("grand_final", 1, 0, 2)
+        elif m.round_number % 2:
+            m.winner_to = ("losers", m.round_number + 1, m.position, 1)
+        else:
+            m.winner_to = ("losers", m.round_number + 1, m.position // 2, m.position % 2 + 1)
+
+    return [*upper, *lower, grand_final]
+
+
+def plan_round_robin(team_ids: list[int]) -> list[PlannedMatch]:
+    """Круговой турнир методом «карусели»: N-1 тур (N при нечётном числе команд)."""
+    teams: list[int | None] = list(team_ids)
+    if len(teams) % 2:
+        teams.append(None)  # свободный от игры в туре
+
+    n = len(teams)
+    plan = []
+    for rnd in range(n - 1):
+        position = 0
+        for i in range(n // 2):
+            home, away = teams[i], teams[n - 1 - i]
+            if home is None or away is None:
+                continue
+            # чередуем хозяев, чтобы первая команда не всегда была team1
+            if rnd % 2:
+                home, away = away, home
+            plan.append(PlannedMatch("main", rnd + 1, position, home, away))
+            position += 1
+        # первая команда на месте, остальные сдвигаются по кругу
+        teams = [teams[0], teams[-1], *teams[1:-1]]
+    return plan
+
+
+def plan_swiss_round(
+    ranked_team_ids: list[int],
+    played_pairs: set[frozenset],
+    round_number: int,
+    had_bye: set[int] = frozenset(),
+) -> list[PlannedMatch]:
+    """
+    Пары одного тура швейцарки: команды уже отсортированы по очкам (затем по посеву).
+    Соседи по таблице играют друг с другом, повторные встречи обходятся перебором
+    с возвратом; при нечётном числе bye получает самая слабая команда без bye.
+    """
+    teams = list(ranked_team_ids)
+    bye_team = None
+    if len(teams) % 2:
+        bye_team = next((t for t in reversed(teams) if t not in had_bye), teams[-1])
+        teams.remove(bye_team)
+
+    pairs = _pair_without_rematches(teams, played_pairs)
+    if pairs is None:
+        # без повторов не разложить — просто соседние пары
+        pairs = [(teams[i], teams[i + 1]) for i in range(0, len(teams), 2)]
+
+    plan = [PlannedMatch("main", round_number, pos, a, b) for pos, (a, b) in enumerate(pairs)]
+    if bye_team is not None:
+        plan.append(PlannedMatch("main", round_number, len(plan), bye_team, None))
+    return plan
+
+
+def _pair_without_rematches(teams: list[int], played_pairs: set[frozenset], max_steps: int = 10_000):
+    """Перебор с возвратом без рекурсии (на 1000+ команд упёрлись бы в лимит стека)."""
+    pairs: list[tuple[int, int]] = []
+    stack = [[teams, 1]]  # на каждом уровне: оставшиеся команды и следующий кандидат
+    steps = 0
+    while stack:
+        steps += 1
+        if steps > max_steps:
+            return None
+        remaining, k = stack[-1]
+        if not remaining:
+            return pairs
+
+        first = remaining[0]
+        while k < len(remaining) and frozenset((first, remaining[k])) in played_pairs:
+            k += 1
+        if k >= len(remaining):
+            # тупик — откатываем пару, которая привела на этот уровень
+            stack.pop()
+            if pairs:
+                pairs.pop()
+            continue
+
+        stack[-1][1] = k + 1
+        pairs.append((first, remaining[k]))
+        stack.append([remaining[1:k] + remaining[k + 1:], 1])
+    return None
+
+
+def plan_swiss(team_ids: list[int]) -> list[PlannedMatch]:
+    """1-й тур швейцарки: верхняя половина посева против нижней."""
+    half = (len(team_ids) + 1) // 2
+    top, bottom = team_ids[:half], team_ids[half:]
+    plan = [PlannedMatch("main", 1, pos, a, b) for pos, (a, b) in enumerate(zip(top, bottom))]
+    if len(top) > len(bottom):
+        plan.append(PlannedMatch("main", 1, len(plan), top[-1], None))
+    return plan
+
+
+PLANNERS = {
+    "single_elim": plan_single_elim,
+    "double_elim": plan_double_elim,
+    "round_robin": plan_round_robin,
+    "swiss": plan_swiss,
+}
+
+
+# -----------------------------------------------------
+# Bye: матчи с пустым слотом не играются
+# -----------------------------------------------------
+def resolve_byes(plan: list[PlannedMatch]) -> list[PlannedMatch]:
+    """
+    Убирает из плана матчи, в которые заведомо придёт меньше двух команд.
+    Единственный участник такого матча сразу продвигается дальше: известная
+    команда попадает в слот следующего матча, а ожидаемая — связью от своего
+    матча-источника. Проигравший из пустого матча никуда не идёт, поэтому
+    bye каскадом доходит и до нижней сетки.
+    План должен быть упорядочен так, что источники идут раньше получателей.
+    """
+    # слот → ("team", id) | ("winner" / "loser", матч-источник) | None (пусто)
+    incoming: dict[tuple, dict[int, tuple | None]] = {
+        m.key: {1: ("team", m.team1_id) if m.team1_id else None,
+                2: ("team", m.team2_id) if m.team2_id else None}
+        for m in plan
+    }
+
+    kept: list[PlannedMatch] = []
+    for m in plan:
+        slots = incoming[m.key]
+        live = [slot for slot in (1, 2) if slots[slot] is not None]
+
+        if len(live) == 2:
+            kept.append(m)
+            winner_src, loser_src = ("winner", m), ("loser", m)
+        elif len(live) == 1:
+            winner_src, loser_src = slots[live[0]], None
+        else:
+            winner_src = loser_src = None
+
+        for ref, src in ((m.winner_to, winner_src), (m.loser_to, loser_src)):
+            if ref and src is not None:
+                incoming[ref[:3]][ref[3]] = src
+
+    # перешиваем связи и известные команды на оставшиеся матчи
+    for m in plan:
+        m.winner_to = m.loser_to = None
+    for m in kept:
+        for slot, src in incoming[m.key].items():
+            kind, value = src
+            if kind == "team":
+                setattr(m, f"team{slot}_id", value)
+            elif kind == "winner":
+                value.winner_to = (*m.key, slot)
+            else:
+                value.loser_to = (*m.key, slot)
+    return kept
+
+
+# -----------------------------------------------------
+# Запись в БД
+# -----------------------------------------------------
+def _insert_plan(db: Session, tournament: Tournament, plan: list[PlannedMatch]) -> None:
+    """
+    Все матчи одной пачкой (executemany), без ORM-объектов на каждый матч,
+    затем связи сетки одним пакетным UPDATE по первичному ключу.
+    """
+    if not plan:
+        return
+    db.execute(insert(Match), [
+        {
+            "tournament_id": tournament.id,
+            "bracket": m.bracket,
+            "round_number": m.round_number,
+            "position": m.position,
+            "team1_id": m.team1_id,
+            "team2_id": m.team2_id,
+            "match_date": tournament.start_date,
+        }
+        for m in plan
+    ])
+
+    linked = [m for m in plan if m.winner_to or m.loser_to]
+    if linked:
+        ids = {
+            (bracket, rn, pos): match_id
+            for match_id, bracket, rn, pos in db.execute(
+                select(Match.id, Match.bracket, Match.round_number, Match.position)
+                .where(Match.tournament_id == tournament.id)
+            )
+        }
+        db.execute(update(Match), [
+            {
+                "id": ids[m.key],
+                "next_match_id": ids[m.winner_to[:3]] if m.winner_to else None,
+                "next_match_slot": m.winner_to[3] if m.winner_to else None,
+                "loser_next_match_id": ids[m.loser_to[:3]] if m.loser_to else None,
+                "loser_next_slot": m.loser_to[3] if m.loser_to else None,
+            }
+            for m in linked
+        ])
+    mark_bracket_dirty(db, tournament.id)
+
+
+def _participant_ids(db: Session, tournament_id: int) -> list[int]:
+    return list(db.execute(
+        select(tournament_participants.c.team_id)
+        .where(tournament_participants.c.tournament_id == tournament_id)
+        .order_by(tournament_participants.c.team_id)
+    ).scalars())
+
+
+def generate_bracket_for_tournament(
+    db: Session,
+    tournament: Tournament,
+    seeds: List[int] | None = None,
+) -> int:
+    """
+    Строит всю сетку турнира по его формату одной вставкой и коммитит.
     - если у турнира уже есть матчи — ничего не делаем
-    - иначе создаём матчи 1-го раунда, парами (1–2, 3–4, 5–6, 7–8, ...)
+    - seeds: id команд в порядке посева (по умолчанию — по id, как раньше)
+    Возвращает число созданных матчей.
     """
+    if tournament.format not in PLANNERS:
+        raise ValueError(f"Unsupported tournament format: {tournament.format}")
 
-    teams: List = list(tournament.teams)
+    team_ids = seeds or _participant_ids(db, tournament.id)
 
     # нужно хотя бы 2 команды
-    if len(teams) < 2:
-        return
+    if len(team_ids) < 2:
+        return 0
 
     # уже есть матчи — не трогаем (чтобы не дублировать)
-    if tournament.matches and len(tournament.matches) > 0:
-        return
+    if db.scalar(select(exists().where(Match.tournament_id == tournament.id))):
+        return 0
+
+    plan = PLANNERS[tournament.format](team_ids)
+    if tournament.format in ELIMINATION_FORMATS:
+        plan = resolve_byes(plan)
+    _insert_plan(db, tournament, plan)
+    db.commit()
+    return len(plan)
+
 
-    # сортируем по id, чтобы порядок был стабильный
-    teams_sorted = sorted(teams, key=lambda t: t.id)
+def generate_next_swiss_round(db: Session, tournament: Tournament) -> int:
+    """
+    Следующий тур швейцарки по текущим очкам. Предыдущий тур должен быть доигран.
+    Возвращает число созданных матчей (0 — если тур ещё идёт).
+    """
+    rows = db.execute(
+        select(Match.round_number, Match.team1_id, Match.team2_id, Match.score_team1, Match.score_team2)
+        .where(Match.tournament_id == tournament.id)
+    ).all()
+    if not rows:
+        return generate_bracket_for_tournament(db, tournament)
+
+    played_pairs, had_bye = set(), set()
+    points: dict[int, int] = {team_id: 0 for team_id in _participant_ids(db, tournament.id)}
+    last_round = 0
+    for rn, t1, t2, s1, s2 in rows:
+        last_round = max(last_round, rn)
+        if t2 is None:
+            had_bye.add(t1)
+            points[t1] = points.get(t1, 0) + 3  # bye = победа
+            continue
+        if s1 is None or s2 is None:
+            return 0
+        played_pairs.add(frozenset((t1, t2)))
+        points[t1] = points.get(t1, 0) + (3 if s1 > s2 else 1 if s1 == s2 else 0)
+        points[t2] = points.get(t2, 0) + (3 if s2 > s1 else 1 if s1 == s2 else 0)
+
+    seed = {team_id: i for i, team_id in enumerate(sorted(points))}
+    ranked = sorted(points, key=lambda t: (-points[t], seed[t]))
+
+    plan = plan_swiss_round(ranked, played_pairs, last_round + 1, had_bye)
+    _insert_plan(db, tournament, plan)
+    db.commit()
+    return len(plan)
 
-    it = iter(teams_sorted)
 
-    for team1 in it:
-        try:
-            team2 = next(it)
-        except StopIteration:
-            team2 = None  # нечётное количество — последний без пары
+# -----------------------------------------------------
+# Продвижение по сетке
+# -----------------------------------------------------
+def match_outcome(match: Match) -> tuple[int | None, int | None]:
+    """(победитель, проигравший); (None, None) — матч не сыгран или ничья."""
+    s1, s2 = match.score_team1, match.score_team2
+    if s1 is None or s2 is None or s1 == s2:
+        return None, None
+    if s1 > s2:
+        return match.team1_id, match.team2_id
+    return match.team2_id, match.team1_id
+
+
+def advance_winner(db: Session, match: Match) -> None:
+    """
+    Ставит победителя (и проигравшего в двойном выбывании) в слоты, на которые
+    указывают связи матча: по одному UPDATE по первичному ключу, без обхода сетки.
+    Исправленный счёт перезаписывает слот, пока следующий матч не сыгран;
+    если уже сыгран — ValueError, коммит делает вызывающий.
+    Счёт без победителя (ничья, сброс) освобождает слоты — прежний победитель
+    не должен остаться в следующем матче.
+    """
+    winner, loser = match_outcome(match)
 
-        match = Match(
-            tournament_id=tournament.id,
-            team1_id=team1.id,
-            team2_id=team2.id if team2 else None,
-            round_number=1,
-            match_date=tournament.start_date,
+    for target_id, slot, team_id in (
+        (match.next_match_id, match.next_match_slot, winner),
+        (match.loser_next_match_id, match.loser_next_slot, loser),
+    ):
+        if not target_id:
+            continue
+        column = Match.team1_id if slot == 1 else Match.team2_id
+        result = db.execute(
+            update(Match)
+            .where(Match.id == target_id, Match.score_team1.is_(None), Match.score_team2.is_(None))
+            .values({column: team_id})
+            .execution_options(synchronize_session=False)
         )
-        db.add(match)
+        if result.rowcount == 0:
+            raise ValueError("Next match is already played")
 
-    db.commit()
\ No newline at end of file
+    mark_bracket_dirty(db, match.tournament_id)
@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, aliased
+
+from backend.models import Match, Team
+
+# кэш в процессе знает только о записях своего воркера — чужие изменения видны
+# не позже чем через TTL. BRACKET_CACHE_URL=redis://… — общий кэш для всех воркеров.
+BRACKET_CACHE_TTL = float(os.getenv("BRACKET_CACHE_TTL_SECONDS", "15"))
+BRACKET_CACHE_URL = os.getenv("BRACKET_CACHE_URL")
+
+ROUND_LABELS = {
+    1: "Quarterfinals",
+    2: "Semifinals",
+    3: "Final",
+    4: "Grand Final",
+}
+
+# для форматов на выбывание подпись считается от финала, а не от 1-го раунда
+FINAL_LABELS = {0: "Final", 1: "Semifinals", 2: "Quarterfinals"}
+ELIMINATION_FORMATS = {"single_elim", "double_elim"}
+PLANNED_FORMATS = {"round_robin", "swiss"}
+BRACKET_ORDER = {"main": 0, "losers": 1, "grand_final": 2}
+
+
+def round_label(bracket: str, rn: int, last_round: int, format: str | None) -> str:
+    if bracket == "grand_final":
+        return "Grand Final"
+    if bracket == "losers":
+        return f"Lower Round {rn}"
+    if format in ELIMINATION_FORMATS:
+        return FINAL_LABELS.get(last_round - rn, f"Round {rn}")
+    if format in PLANNED_FORMATS:
+        return f"Round {rn}"
+    return ROUND_LABELS.get(rn, f"Round {rn}")
+
+
+# -----------------------------------------------------
+# Построение модели сетки (только простые dict/list — годится для JSON)
+# -----------------------------------------------------
+def _team(team_id, name):
+    return {"id": team_id, "name": name} if team_id else None
+
+
+def _row(mid, bracket, rn, pos, t1_id, t1_name, t2_id, t2_name, s1, s2) -> dict:
+    return {
+        "id": mid, "bracket": bracket or "main", "round": rn, "position": pos or 0,
+        "team1": _team(t1_id, t1_name), "team2": _team(t2_id, t2_name),
+        "score1": s1, "score2": s2,
+    }
+
+
+def _match_rows(tournament_id: int):
+    t1, t2 = aliased(Team), aliased(Team)
+    return (
+        select(
+            Match.id, Match.bracket, Match.round_number, Match.position,
+            Match.team1_id, t1.name, Match.team2_id, t2.name,
+            Match.score_team1, Match.score_team2,
+        )
+        .outerjoin(t1, t1.id == Match.team1_id)
+        .outerjoin(t2, t2.id == Match.team2_id)
+        .where(Match.tournament_id == tournament_id)
+    )
+
+
+def bracket_rows_query(tournament_id: int):
+    """Матчи сетки с именами команд — без гидрации ORM."""
+    return _match_rows(tournament_id).where(Match.round_number.isnot(None))
+
+
+def rows_from_result(result) -> list[dict]:
+    return [_row(*values) for values in result]
+
+
+def match_list_query(tournament_id: int):
+    """Все матчи турнира по дате (вкладка Matches): колонки сетки плюс дата."""
+    return _match_rows(tournament_id).add_columns(Match.match_date).order_by(Match.match_date, Match.id)
+
+
+def match_list_from_result(result) -> list[dict]:
+    matches = []
+    for *values, match_date in result:
+        row = _row(*values)
+        # шаблон списка матчей читает именно эти ключи
+        row.update(match_date=match_date, score_team1=row["score1"], score_team2=row["score2"])
+        matches.append(row)
+    return matches
+
+
+def build_bracket_view(rows: list[dict], format: str | None = None) -> list[dict]:
+    """
+    Команды уже стоят в своих слотах (их туда ставит advance_winner по связям
+    матчей), поэтому сетка — просто группировка строк по раундам.
+    """
+    round_map: dict[tuple[str, int], list[dict]] = defaultdict(list)
+    last_round: dict[str, int] = defaultdict(int)
+    for row in rows:
+        if row["round"] is not None:
+            round_map[(row["bracket"], row["round"])].append(row)
+            last_round[row["bracket"]] = max(last_round[row["bracket"]], row["round"])
+
+    bracket: list[dict] = []
+    for key in sorted(round_map.keys(), key=lambda k: (BRACKET_ORDER.get(k[0], 9), k[1])):
+        kind, rn = key
+        round_view: list[dict] = []
+
+        for m in sorted(round_map[key], key=lambda m: (m["position"], m["id"])):
+            s1, s2 = m["score1"], m["score2"]
+            team1, team2 = m["team1"], m["team2"]
+
+            winner_team = None
+            if s1 is not None and s2 is not None:
+                if s1 > s2:
+                    winner_team = team1
+                elif s2 > s1:
+                    winner_team = team2
+
+            round_view.append(
+                {
+                    "id": m["id"],
+                    "bracket": kind,
+                    "round": rn,
+                    "team1": team1,
+                    "team2": team2,
+                    "score1": s1,
+                    "score2": s2,
+                    # шаблон сетки читает именно эти ключи
+                    "score_team1": s1,
+                    "score_team2": s2,
+                    "winner_id": winner_team and winner_team["id"],
+                    "winner_team": winner_team,
+                }
+            )
+
+        bracket.append(
+            {
+                "bracket": kind,
+                "number": rn,
+                "label": round_label(kind, rn, last_round[kind], format),
+                "matches": round_view,
+            }
+        )
+
+    return bracket
+
+
+# -----------------------------------------------------
+# Кэш: бэкенды
+# -----------------------------------------------------
+class BracketCacheBackend:
+    """
+    Интерфейс хранилища. Версия турнира растёт при каждой записи в его матчи;
+    запись кэша адресуется парой (турнир, версия), поэтому устаревший
+    результат, собранный параллельно с записью, никогда не будет прочитан.
+    """
+
+    def get_version(self, tournament_id: int) -> int:
+        raise NotImplementedError
+
+    def bump_version(self, tournament_id: int) -> int:
+        raise NotImplementedError
+
+    def get(self, tournament_id: int, version: int) -> list | None:
+        raise NotImplementedError
+
+    def set(self, tournament_id: int, version: int, bracket: list) -> None:
+        raise NotImplementedError
+
+
+class LRUBracketCache(BracketCacheBackend):
+    """
+    Кэш внутри процесса (по умолчанию). Инвалидируется только в том воркере,
+    где прошла запись; в остальных запись живёт не дольше ttl секунд.
+    При нескольких воркерах и живых финалах нужен SharedBracketCache.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = BRACKET_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._versions: dict[int, int] = {}
+        self._entries: "OrderedDict[tuple[int, int], tuple[float, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_version(self, tournament_id):
+        return self._versions.get(tournament_id, 0)
+
+    def bump_version(self, tournament_id):
+        with self._lock:
+            version = self._versions.get(tournament_id, 0) + 1
+            self._versions[tournament_id] = version
+            # старые версии уже не нужны
+            for key in [k for k in self._entries if k[0] == tournament_id]:
+                del self._entries[key]
+            return version
+
+    def get(self, tournament_id, version):
+        with self._lock:
+            key = (tournament_id, version)
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            if time.monotonic() - cached[0] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def set(self, tournament_id, version, bracket):
+        with self._lock:
+            self._entries[(tournament_id, version)] = (time.monotonic(), bracket)
+            self._entries.move_to_end((tournament_id, version))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SharedBracketCache(BracketCacheBackend):
+    """
+    Общий кэш для нескольких воркеров поверх redis.Redis-совместимого
+    клиента (get / set(ex=) / incr).
+    """
+
+    def __init__(self, client, prefix: str = "bracket", ttl: int = 3600):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _version_key(self, tournament_id):
+        return f"{self.prefix}:ver:{tournament_id}"
+
+    def get_version(self, tournament_id):
+        value = self.client.get(self._version_key(tournament_id))
+        return int(value) if value is not None else 0
+
+    def bump_version(self, tournament_id):
+        return int(self.client.incr(self._version_key(tournament_id)))
+
+    def get(self, tournament_id, version):
+        value = self.client.get(f"{self.prefix}:{tournament_id}:{version}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, tournament_id, version, bracket):
+        self.client.set(f"{self.prefix}:{tournament_id}:{version}", json.dumps(bracket), ex=self.ttl)
+
+
+def _default_backend() -> BracketCacheBackend:
+    if not BRACKET_CACHE_URL:
+        return LRUBracketCache()
+    try:
+        import redis
+    except ImportError as e:  # общий кэш — опциональная зависимость
+        raise RuntimeError("BRACKET_CACHE_URL is set, but the redis package is not installed") from e
+    return SharedBracketCache(redis.Redis.from_url(BRACKET_CACHE_URL))
+
+
+_backend: BracketCacheBackend = _default_backend()
+
+
+def set_bracket_cache_backend(backend: BracketCacheBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_bracket_cache_backend() -> BracketCacheBackend:
+    return _backend
+
+
+# -----------------------------------------------------
+# Кэш: чтение
+# -----------------------------------------------------
+def cached_bracket(tournament_id: int) -> tuple[int, list | None]:
+    """(версия, сетка или None при промахе)."""
+    version = _backend.get_version(tournament_id)
+    return version, _backend.get(tournament_id, version)
+
+
+def store_bracket(tournament_id: int, version: int, rows: list[dict], format: str | None = None) -> list:
+    bracket = build_bracket_view(rows, format)
+    _backend.set(tournament_id, version, bracket)
+    return bracket
+
+
+# -----------------------------------------------------
+# Инвалидация по записи в Match
+# -----------------------------------------------------
+_DIRTY_KEY = "bracket_dirty_tournaments"
+
+
+def mark_bracket_dirty(db: Session, tournament_id: int) -> None:
+    """Для массовых insert/update в обход ORM-flush: сброс после commit."""
+    db.info.setdefault(_DIRTY_KEY, set()).add(tournament_id)
+
+
+def invalidate_bracket(tournament_id: int) -> int:
+    return _backend.bump_version(tournament_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_matches(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Match) and obj.tournament_id is not None:
+            mark_bracket_dirty(session, obj.tournament_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    for tournament_id in session.info.pop(_DIRTY_KEY, ()):
+        invalidate_bracket(tournament_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_on_rollback(session, previous_transaction):
+    # откат savepoint-а не отменяет остальные изменения транзакции
+    if previous_transaction.parent is None:
+        session.info.pop(_DIRTY_KEY, None)
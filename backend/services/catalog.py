@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.models import ProfileFrame, ProfileBadge
+
+# кэш живёт в процессе: запись админа сбрасывает его сразу в своём воркере,
+# остальные воркеры подхватят изменения не позже чем через TTL
+CATALOG_TTL = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+
+
+@dataclass(frozen=True)
+class FrameItem:
+    id: int
+    name: str
+    image_url: str
+    price: int
+    rarity: str | None
+
+
+@dataclass(frozen=True)
+class BadgeItem:
+    id: int
+    name: str
+    description: str | None
+    price: int
+    icon_url: str
+    rarity: str | None
+
+
+@dataclass(frozen=True)
+class Catalog:
+    frames: tuple[FrameItem, ...]   # по цене, как в магазине
+    badges: tuple[BadgeItem, ...]
+    etag: str                       # хэш содержимого (= body) — одинаковый во всех воркерах
+    last_modified: datetime         # последний updated_at строк каталога
+    body: bytes                     # готовый JSON для /store/catalog
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",  # всегда переспрашивать, но по условному запросу
+        }
+
+    def not_modified(self, if_none_match: str | None, if_modified_since: str | None) -> bool:
+        """Условный запрос: If-None-Match важнее If-Modified-Since (RFC 9110)."""
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
+
+_FRAMES_QUERY = select(
+    ProfileFrame.id, ProfileFrame.name, ProfileFrame.image_url, ProfileFrame.price, ProfileFrame.rarity,
+).order_by(ProfileFrame.price.asc(), ProfileFrame.id.asc())
+
+_BADGES_QUERY = select(
+    ProfileBadge.id, ProfileBadge.name, ProfileBadge.description,
+    ProfileBadge.price, ProfileBadge.icon_url, ProfileBadge.rarity,
+).order_by(ProfileBadge.id.asc())
+
+_CHANGED_QUERY = select(
+    select(func.max(ProfileFrame.updated_at)).scalar_subquery(),
+    select(func.max(ProfileBadge.updated_at)).scalar_subquery(),
+)
+
+
+_lock = threading.Lock()
+_catalog: Catalog | None = None
+_loaded_at = 0.0
+
+
+def _build(frame_rows, badge_rows, changed_at) -> Catalog:
+    global _catalog, _loaded_at
+    frames = tuple(FrameItem(*row) for row in frame_rows)
+    badges = tuple(BadgeItem(*row) for row in badge_rows)
+    content = {"frames": [asdict(f) for f in frames], "badges": [asdict(b) for b in badges]}
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    # время из БД, а не загрузки в процесс: одинаково во всех воркерах и после рестарта
+    stamps = [stamp for stamp in changed_at if stamp is not None]
+    last_modified = max(stamps, default=datetime(1970, 1, 1)).replace(tzinfo=timezone.utc, microsecond=0)
+
+    catalog = Catalog(frames, badges, etag, last_modified, body)
+    with _lock:
+        _catalog = catalog
+        _loaded_at = time.monotonic()
+    return catalog
+
+
+def _fresh() -> Catalog | None:
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _loaded_at < CATALOG_TTL:
+        return catalog
+    return None
+
+
+def get_catalog(db: Session) -> Catalog:
+    return _fresh() or _build(
+        db.execute(_FRAMES_QUERY).all(), db.execute(_BADGES_QUERY).all(), db.execute(_CHANGED_QUERY).one(),
+    )
+
+
+async def get_catalog_async(db: AsyncSession) -> Catalog:
+    catalog = _fresh()
+    if catalog is None:
+        frames = (await db.execute(_FRAMES_QUERY)).all()
+        badges = (await db.execute(_BADGES_QUERY)).all()
+        changed_at = (await db.execute(_CHANGED_QUERY)).one()
+        catalog = _build(frames, badges, changed_at)
+    return catalog
+
+
+def invalidate_catalog() -> None:
+    """Вызывать после коммита записи в ProfileFrame / ProfileBadge."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
@@ -0,0 +1,131 @@
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from backend.models import ProfileFrame, ProfileBadge, Achievement
+from backend.services.catalog import invalidate_catalog
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "catalog.json")
+
+# раздел файла → модель; ключ строки — name (уникальный индекс)
+SECTIONS = {
+    "frames": ProfileFrame,
+    "badges": ProfileBadge,
+    "achievements": Achievement,
+}
+
+class CatalogFileError(ValueError):
+    """Файл каталога не подходит для синхронизации — роутер отдаёт 400."""
+
+
+_INSERTS = {"mysql": mysql.insert, "mariadb": mysql.insert, "sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def load_catalog_file(path: str = CATALOG_FILE) -> dict[str, list[dict]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fields(section: str, items: list[dict]) -> list[str]:
+    """Все строки раздела описывают одни и те же поля — иначе upsert затёр бы чужие."""
+    fields = list(items[0]) if items else []
+    for item in items:
+        if set(item) != set(fields) or "name" not in item:
+            raise CatalogFileError(f"Catalog section '{section}': every item needs the same fields, including 'name'")
+    return fields
+
+
+def dialect_insert(db: Session, model):
+    """INSERT диалекта текущей БД — с on_duplicate_key_update / on_conflict_do_update."""
+    dialect = db.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise ValueError(f"Upsert is not supported for {dialect}")
+    return _INSERTS[dialect](model)
+
+
+def _upsert(db: Session, model, fields: list[str], rows: list[dict]) -> None:
+    """Один INSERT ... ON DUPLICATE KEY / ON CONFLICT на всю пачку."""
+    stmt = dialect_insert(db, model).values(rows)
+    updated = [f for f in fields if f != "name"]
+    if db.get_bind().dialect.name in ("mysql", "mariadb"):
+        stmt = stmt.on_duplicate_key_update({f: stmt.inserted[f] for f in updated})
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={f: stmt.excluded[f] for f in updated})
+    db.execute(stmt)
+
+
+def sync_catalog(db: Session, data: dict | None = None, sections=None) -> dict:
+    """
+    Приводит таблицы каталога к файлу, коммитит вызывающий.
+    - на раздел: один SELECT текущего состояния и (если есть изменения) один upsert
+      только изменившихся строк — пустая синхронизация не пишет в БД вовсе
+    - строки, которых нет в файле, не удаляются (на них ссылается инвентарь),
+      а попадают в отчёт как "extra"
+    Возвращает diff по разделам: added / updated {name: [поля]} / unchanged / extra.
+    """
+    data = load_catalog_file() if data is None else data
+    report = {}
+
+    for section in sections or SECTIONS:
+        model = SECTIONS[section]
+        items = data.get(section, [])
+        fields = _fields(section, items)
+
+        columns = [getattr(model, f) for f in fields]
+        current = {row.name: row for row in db.execute(select(*columns))} if fields else {}
+
+        added, updated, changed_rows = [], {}, []
+        for item in items:
+            row = current.get(item["name"])
+            if row is None:
+                added.append(item["name"])
+                changed_rows.append(item)
+                continue
+            changed = [f for f in fields if getattr(row, f) != item[f]]
+            if changed:
+                updated[item["name"]] = changed
+                changed_rows.append(item)
+
+        if changed_rows:
+            if "updated_at" in model.__table__.c:
+                # отметка изменения — общий для всех воркеров Last-Modified (services/catalog.py)
+                now = datetime.utcnow()
+                _upsert(db, model, [*fields, "updated_at"], [{**row, "updated_at": now} for row in changed_rows])
+            else:
+                _upsert(db, model, fields, changed_rows)
+
+        names = {item["name"] for item in items}
+        report[section] = {
+            "added": added,
+            "updated": updated,
+            "unchanged": len(items) - len(changed_rows),
+            "extra": sorted(name for name in current if name not in names),
+        }
+
+    return report
+
+
+def changed(report: dict) -> bool:
+    return any(r["added"] or r["updated"] for r in report.values())
+
+
+def seed_catalog(db: Session, sections=None) -> dict:
+    """sync_catalog одной транзакцией + сброс кэшей каталога и правил ачивок, если что-то поменялось."""
+    # achievements сам импортирует dialect_insert отсюда
+    from backend.services.achievements import invalidate_rules
+
+    try:
+        report = sync_catalog(db, sections=sections)
+        db.commit()
+    except:
+        db.rollback()
+        raise
+
+    if changed(report):
+        invalidate_catalog()
+        invalidate_rules()
+    return report
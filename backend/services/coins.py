@@ -0,0 +1,218 @@
+from dataclasses import dataclass
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models import User, CoinTransaction, UserFrame, UserBadge
+from backend.services.events import PURCHASE, publish
+from backend.services.leaderboard import note_changes
+
+
+class CoinError(ValueError):
+    """Ошибка операции с монетами — роутер отдаёт её как 400."""
+
+
+class NotEnoughCoins(CoinError):
+    def __init__(self):
+        super().__init__("Not enough coins")
+
+
+class AlreadyOwned(CoinError):
+    def __init__(self, item_type: str):
+        super().__init__(f"You already own this {item_type}")
+
+
+class IdempotencyConflict(CoinError):
+    """Ключ уже использован для другой операции — 409."""
+
+    def __init__(self):
+        super().__init__("Idempotency key was used for a different request")
+
+
+# предмет → (таблица владения, колонка предмета)
+OWNERSHIP = {
+    "frame": (UserFrame, UserFrame.frame_id),
+    "badge": (UserBadge, UserBadge.badge_id),
+}
+
+
+@dataclass(frozen=True)
+class CoinResult:
+    balance: int
+    replayed: bool = False  # ответ на повтор запроса с тем же Idempotency-Key
+
+
+# -----------------------------------------------------
+# Журнал
+# -----------------------------------------------------
+def _balance(db: Session, user_id: int) -> int:
+    # строка уже заблокирована нашим UPDATE — значение не гоняется с чужой транзакцией
+    return db.execute(select(User.coins).where(User.id == user_id)).scalar_one()
+
+
+def _record(db: Session, user_id: int, amount: int, balance: int, reason: str, **fields) -> None:
+    db.execute(insert(CoinTransaction).values(
+        user_id=user_id, amount=amount, balance_after=balance, reason=reason, **fields,
+    ))
+
+
+def _replay(db: Session, user_id: int, key: str | None, item_type=None, item_id=None) -> CoinResult | None:
+    if not key:
+        return None
+    tx = db.execute(
+        select(CoinTransaction)
+        .where(CoinTransaction.user_id == user_id, CoinTransaction.idempotency_key == key)
+    ).scalar_one_or_none()
+    if tx is None:
+        return None
+    if (tx.item_type, tx.item_id) != (item_type, item_id):
+        raise IdempotencyConflict()
+    return CoinResult(tx.balance_after, replayed=True)
+
+
+# -----------------------------------------------------
+# Операции (коммитит вызывающий; при исключении — rollback)
+# -----------------------------------------------------
+def credit(db: Session, user_id: int, amount: int, reason: str, idempotency_key: str | None = None) -> CoinResult:
+    """Начисление: атомарный инкремент в БД, без чтения баланса в Python."""
+    replay = _replay(db, user_id, idempotency_key)
+    if replay:
+        return replay
+
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(coins=func.coalesce(User.coins, 0) + amount)
+        .execution_options(synchronize_session=False)
+    )
+    balance = _balance(db, user_id)
+    _record(db, user_id, amount, balance, reason, idempotency_key=idempotency_key)
+    note_changes(db, "coins", {user_id: amount})
+    return CoinResult(balance)
+
+
+def credit_many(db: Session, amounts: dict[int, int], reason: str, idempotency_key: str | None = None) -> dict[int, int]:
+    """
+    Начисление пачке пользователей: один UPDATE (CASE по id), одно чтение
+    балансов и одна пачка записей журнала. Повтор ключа у кого-то из
+    пользователей — IntegrityError, вся операция откатывается.
+    Возвращает новые балансы {user_id: coins}.
+    """
+    amounts = {user_id: amount for user_id, amount in amounts.items() if amount}
+    if not amounts:
+        return {}
+
+    db.execute(
+        update(User)
+        .where(User.id.in_(amounts))
+        .values(coins=func.coalesce(User.coins, 0) + case(amounts, value=User.id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    balances = dict(db.execute(select(User.id, User.coins).where(User.id.in_(amounts))).all())
+    db.execute(insert(CoinTransaction), [
+        {
+            "user_id": user_id, "amount": amount, "balance_after": balances[user_id],
+            "reason": reason, "idempotency_key": idempotency_key,
+        }
+        for user_id, amount in amounts.items()
+    ])
+    note_changes(db, "coins", amounts)
+    return balances
+
+
+def purchase(
+    db: Session,
+    user_id: int,
+    item_type: str,
+    item_id: int,
+    price: int,
+    idempotency_key: str | None = None,
+) -> CoinResult:
+    """
+    Покупка предмета за монеты.
+    - владение вставляется первым: уникальный индекс отсекает повторную покупку
+      ещё до того, как мы возьмём блокировку строки пользователя
+    - списание — единственный условный UPDATE ... WHERE coins >= price:
+      без чтения-проверки-записи, параллельные покупки не теряют обновления
+    - блокировка строки держится только до commit вызывающего
+    """
+    replay = _replay(db, user_id, idempotency_key, item_type, item_id)
+    if replay:
+        return replay
+
+    model, item_column = OWNERSHIP[item_type]
+    try:
+        db.execute(insert(model).values({"user_id": user_id, item_column.key: item_id}))
+    except IntegrityError:
+        # вся покупка всё равно откатывается — savepoint не нужен
+        raise AlreadyOwned(item_type)
+
+    debited = db.execute(
+        update(User)
+        .where(User.id == user_id, User.coins >= price)
+        .values(coins=User.coins - price)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not debited:
+        raise NotEnoughCoins()
+
+    balance = _balance(db, user_id)
+    _record(
+        db, user_id, -price, balance, "purchase",
+        item_type=item_type, item_id=item_id, idempotency_key=idempotency_key,
+    )
+    note_changes(db, "coins", {user_id: -price})
+    publish(db, PURCHASE, user_id=user_id, item_type=item_type, item_id=item_id)
+    return CoinResult(balance)
+
+
+def buy(
+    db: Session,
+    user_id: int,
+    item_type: str,
+    item_id: int,
+    price: int,
+    idempotency_key: str | None = None,
+) -> CoinResult:
+    """purchase + commit. Параллельный повтор с тем же ключом ждёт первый
+    запрос на уникальном индексе владения и получает его ответ."""
+    try:
+        result = purchase(db, user_id, item_type, item_id, price, idempotency_key)
+        db.commit()
+        return result
+    except AlreadyOwned:
+        db.rollback()
+        replay = _replay(db, user_id, idempotency_key, item_type, item_id)
+        if replay:
+            return replay
+        raise
+    except:
+        db.rollback()
+        raise
+
+
+def grant(db: Session, user_id: int, amount: int, reason: str, idempotency_key: str | None = None) -> CoinResult:
+    """credit + commit. Параллельный повтор с тем же ключом упирается в уникальный
+    индекс журнала и получает ответ первого запроса."""
+    try:
+        result = credit(db, user_id, amount, reason, idempotency_key)
+        db.commit()
+        return result
+    except IntegrityError:
+        db.rollback()
+        replay = _replay(db, user_id, idempotency_key)
+        if replay:
+            return replay
+        raise
+    except:
+        db.rollback()
+        raise
+
+
+def check_ledger(db: Session, user_id: int) -> bool:
+    """Сумма журнала совпадает с балансом."""
+    total = db.scalar(
+        select(func.coalesce(func.sum(CoinTransaction.amount), 0)).where(CoinTransaction.user_id == user_id)
+    )
+    return total == (db.scalar(select(User.coins).where(User.id == user_id)) or 0)
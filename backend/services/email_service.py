@@ -1,6 +1,21 @@
+import heapq
+import itertools
+import json
+import logging
 import os
+import queue
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+
+from backend.core.request_context import current_request_id
 
 # ✅ Load .env inside this file too
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
@@ -10,21 +25,302 @@ API_KEY = os.getenv("MAILGUN_API_KEY")
 DOMAIN = os.getenv("MAILGUN_DOMAIN")
 FROM_EMAIL = os.getenv("MAILGUN_FROM")
 
-def send_email(to, subject, text):
+# mailgun / file (письма складываются в EMAIL_SINK_DIR — только для разработки и тестов:
+# коды подтверждения там лежат открытым текстом, поэтому file — только явно)
+TRANSPORT = os.getenv("EMAIL_TRANSPORT", "mailgun")
+SINK_DIR = Path(os.getenv("EMAIL_SINK_DIR", "backend/mail_sink"))
+
+QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+CONNECT_TIMEOUT = float(os.getenv("EMAIL_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("EMAIL_READ_TIMEOUT", "10"))
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.getenv("EMAIL_BACKOFF_BASE", "1"))
+BACKOFF_MAX = 60.0
+BREAKER_THRESHOLD = int(os.getenv("EMAIL_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("EMAIL_BREAKER_RESET", "30"))
+PROBE_WAIT = 0.5  # пауза для писем, пока пробный запрос half-open ещё не ответил
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EmailMessage:
+    to: str
+    subject: str
+    text: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    # письмо уходит из фонового потока — id запроса переносим явно для логов
+    request_id: str | None = field(default_factory=current_request_id)
+
+
+class TransientEmailError(Exception):
+    """Провайдер недоступен / 429 / 5xx — можно повторить."""
+
+
+class PermanentEmailError(Exception):
+    """Письмо отклонено (4xx) — повтор не поможет."""
+
+
+# -----------------------------------------------------
+# Транспорты: send(message) или исключение
+# -----------------------------------------------------
+class MailgunTransport:
+    """Один keep-alive пул соединений на процесс, таймауты на connect и read."""
+
+    def __init__(self, api_key: str, domain: str, sender: str, pool_size: int = WORKERS):
+        self.url = f"https://api.mailgun.net/v3/{domain}/messages"
+        self.sender = sender
+        self.session = requests.Session()
+        self.session.auth = ("api", api_key)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+
+    def send(self, message: EmailMessage) -> None:
+        try:
+            response = self.session.post(
+                self.url,
+                data={"from": self.sender, "to": message.to, "subject": message.subject, "text": message.text},
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+        except requests.RequestException as e:
+            raise TransientEmailError(str(e)) from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientEmailError(f"Mailgun {response.status_code}")
+        if response.status_code >= 400:
+            raise PermanentEmailError(f"Mailgun {response.status_code}: {response.text[:200]}")
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class FileTransport:
+    """
+    Заглушка провайдера: письмо — JSON-файл в папке.
+    delay и failure_rate имитируют медленного или лежащего провайдера.
+    """
+
+    def __init__(self, directory: Path = SINK_DIR, delay: float = 0.0, failure_rate: float = 0.0):
+        self.directory = Path(directory)
+        self.delay = delay
+        self.failure_rate = failure_rate
+
+    def send(self, message: EmailMessage) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise TransientEmailError("file sink: simulated outage")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        payload = {"to": message.to, "subject": message.subject, "text": message.text}
+        (self.directory / f"{message.id}.json").write_text(json.dumps(payload, ensure_ascii=False))
+
+    def close(self) -> None:
+        pass
+
+
+def default_transport():
+    """None — почта не настроена: письма не принимаются (send_email → False, 503)."""
+    if TRANSPORT == "file":
+        return FileTransport()
     if not API_KEY or not DOMAIN or not FROM_EMAIL:
-        print("❌ Mailgun env vars missing!")
-        print("api:", API_KEY)
-        print("domain:", DOMAIN)
-        print("sender:", FROM_EMAIL)
-        return False
-
-    return requests.post(
-        f"https://api.mailgun.net/v3/{DOMAIN}/messages",
-        auth=("api", API_KEY),
-        data={
-            "from": FROM_EMAIL,
-            "to": to,
-            "subject": subject,
-            "text": text
-        }
-    )
+        logger.error("mailgun env vars missing (MAILGUN_API_KEY, MAILGUN_DOMAIN, MAILGUN_FROM), emails are disabled")
+        return None
+    return MailgunTransport(API_KEY, DOMAIN, FROM_EMAIL)
+
+
+# -----------------------------------------------------
+# Предохранитель перед провайдером
+# -----------------------------------------------------
+class CircuitBreaker:
+    """
+    closed → (threshold ошибок подряд) → open: запросы не идут reset секунд →
+    half-open: один пробный запрос; успех закрывает, ошибка открывает снова.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset else "open"
+
+    def retry_at(self) -> float:
+        """
+        Когда имеет смысл попробовать снова (monotonic). В half-open, пока идёт пробный
+        запрос, срок уже прошёл — без паузы отложенные письма крутились бы вхолостую.
+        """
+        now = time.monotonic()
+        return max((self.opened_at or now) + self.reset, now + PROBE_WAIT)
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures, self.opened_at, self._probe = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probe or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._probe = False
+
+
+# -----------------------------------------------------
+# Очередь и фоновые отправители
+# -----------------------------------------------------
+class EmailQueue:
+    """
+    Ограниченная очередь в памяти процесса. send() только кладёт письмо и сразу
+    возвращается; отправляют фоновые потоки. Повторы ждут в куче по времени,
+    не занимая поток; при открытом предохранителе письма ждут его закрытия.
+    """
+
+    def __init__(self, transport=None, maxsize: int = QUEUE_SIZE, workers: int = WORKERS,
+                 breaker: CircuitBreaker | None = None, max_attempts: int = MAX_ATTEMPTS):
+        self.transport = transport
+        self.maxsize = maxsize
+        self.workers = workers
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+        self.disabled = False  # транспорта нет — письма не принимаются вовсе
+
+        self._queue: queue.Queue[EmailMessage] = queue.Queue(maxsize)
+        self._delayed: list[tuple[float, int, EmailMessage]] = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    # ---------- публичное API ----------
+    def send(self, message: EmailMessage) -> bool:
+        """False — почта не настроена или очередь переполнена, письмо не принято."""
+        if self.disabled:
+            self._count("dropped")
+            return False
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._queue.qsize() + len(self._delayed)
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        if self.transport is None:
+            self.transport = default_transport()
+        if self.transport is None:
+            self.disabled = True
+            return
+        self.disabled = False
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"email-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, drain: float = 5.0) -> None:
+        """Даём дослать то, что уже в очереди (не дольше drain секунд)."""
+        deadline = time.monotonic() + drain
+        while self._queue.qsize() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0.1))
+        self._threads = []
+        if self.pending():
+            logger.error("email queue stopped with undelivered messages", extra={"pending": self.pending()})
+        if self.transport is not None:
+            self.transport.close()
+
+    # ---------- внутреннее ----------
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _later(self, message: EmailMessage, due: float) -> None:
+        with self._lock:
+            if len(self._delayed) >= self.maxsize:
+                self.stats["dropped"] += 1
+                logger.error("email retry queue is full, message dropped", extra={"email_id": message.id, "request_id": message.request_id})
+                return
+            heapq.heappush(self._delayed, (due, next(self._order), message))
+
+    def _next(self) -> EmailMessage | None:
+        with self._lock:
+            now = time.monotonic()
+            if self._delayed and self._delayed[0][0] <= now:
+                return heapq.heappop(self._delayed)[2]
+            wait = min(self._delayed[0][0] - now, 0.5) if self._delayed else 0.5
+        try:
+            return self._queue.get(timeout=wait)
+        except queue.Empty:
+            return None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            message = self._next()
+            if message is not None:
+                self._deliver(message)
+
+    def _deliver(self, message: EmailMessage) -> None:
+        if not self.breaker.allow():
+            # провайдер лежит — не тратим попытку, ждём пробного запроса
+            self._later(message, self.breaker.retry_at())
+            return
+
+        message.attempts += 1
+        try:
+            self.transport.send(message)
+        except PermanentEmailError as e:
+            self.breaker.record_success()  # провайдер отвечает — дело в письме
+            self._count("failed")
+            logger.error("email rejected: %s", e, extra={"email_id": message.id, "request_id": message.request_id})
+        except Exception as e:
+            self.breaker.record_failure()
+            if message.attempts >= self.max_attempts:
+                self._count("failed")
+                logger.error("email failed: %s", e, extra={
+                    "email_id": message.id, "attempts": message.attempts, "request_id": message.request_id,
+                })
+                return
+            logger.debug("email send failed, will retry: %s", e, extra={"email_id": message.id, "attempts": message.attempts})
+            # экспоненциальная пауза с джиттером
+            delay = min(BACKOFF_BASE * 2 ** (message.attempts - 1), BACKOFF_MAX)
+            self._count("retried")
+            self._later(message, time.monotonic() + delay * random.uniform(0.5, 1.0))
+        else:
+            self.breaker.record_success()
+            self._count("sent")
+            logger.debug("email sent", extra={"email_id": message.id, "request_id": message.request_id})
+
+
+outbox = EmailQueue()
+
+
+def send_email(to, subject, text) -> bool:
+    """Поставить письмо в очередь — не блокирует. False, если очередь переполнена."""
+    return outbox.send(EmailMessage(to, subject, text))
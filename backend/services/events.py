@@ -0,0 +1,24 @@
+from collections import defaultdict
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+# события домена; обработчики выполняются синхронно в транзакции издателя,
+# поэтому их записи коммитятся (или откатываются) вместе с самим изменением
+MATCH_RESULT = "match_result"  # before, after: MatchResult | None — счёт поставлен или исправлен
+PURCHASE = "purchase"          # user_id, item_type, item_id — предмет куплен
+
+HANDLERS: dict[str, list[Callable]] = defaultdict(list)
+
+
+def subscribe(event: str):
+    """Декоратор: подписать функцию (db, **payload) на событие."""
+    def decorator(handler: Callable) -> Callable:
+        HANDLERS[event].append(handler)
+        return handler
+    return decorator
+
+
+def publish(db: Session, event: str, **payload) -> None:
+    for handler in HANDLERS.get(event, ()):
+        handler(db, **payload)
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from typing import Iterable, TypeVar
+
+from sqlalchemy import literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.models import User, UserFrame, UserBadge
+
+Item = TypeVar("Item")
+
+
+@dataclass(frozen=True)
+class InventoryProjection:
+    """Что у пользователя есть и что надето — только id, без ORM-объектов."""
+    owned_frames: frozenset[int]
+    owned_badges: frozenset[int]
+    equipped_frame_id: int | None = None
+    equipped_badge_id: int | None = None
+
+    # сами предметы берём из кэша каталога (services/catalog.py)
+    def frames(self, catalog_frames: Iterable[Item]) -> list[Item]:
+        return [f for f in catalog_frames if f.id in self.owned_frames]
+
+    def badges(self, catalog_badges: Iterable[Item]) -> list[Item]:
+        return [b for b in catalog_badges if b.id in self.owned_badges]
+
+    def equipped_frame(self, catalog_frames: Iterable[Item]) -> Item | None:
+        return next((f for f in catalog_frames if f.id == self.equipped_frame_id), None)
+
+    def equipped_badge(self, catalog_badges: Iterable[Item]) -> Item | None:
+        return next((b for b in catalog_badges if b.id == self.equipped_badge_id), None)
+
+
+EMPTY_INVENTORY = InventoryProjection(frozenset(), frozenset())
+
+
+def inventory_query(user_id: int):
+    """Рамки, значки и надетые слоты одним запросом: (вид, id предмета)."""
+    return union_all(
+        select(literal("frame").label("kind"), UserFrame.frame_id.label("item_id"))
+        .where(UserFrame.user_id == user_id),
+        select(literal("badge").label("kind"), UserBadge.badge_id.label("item_id"))
+        .where(UserBadge.user_id == user_id),
+        select(literal("equipped_frame").label("kind"), User.equipped_frame_id.label("item_id"))
+        .where(User.id == user_id),
+        select(literal("equipped_badge").label("kind"), User.equipped_badge_id.label("item_id"))
+        .where(User.id == user_id),
+    )
+
+
+def _project(rows) -> InventoryProjection:
+    owned: dict[str, set[int]] = {"frame": set(), "badge": set()}
+    equipped: dict[str, int | None] = {}
+    for kind, item_id in rows:
+        if kind in owned:
+            owned[kind].add(item_id)
+        else:
+            equipped[kind] = item_id
+    return InventoryProjection(
+        frozenset(owned["frame"]),
+        frozenset(owned["badge"]),
+        equipped.get("equipped_frame"),
+        equipped.get("equipped_badge"),
+    )
+
+
+# -----------------------------------------------------
+# Экипировка: одна строка users на операцию
+# -----------------------------------------------------
+# слот → (колонка users, таблица владения, колонка предмета)
+SLOTS = {
+    "frame": (User.equipped_frame_id, UserFrame, UserFrame.frame_id),
+    "badge": (User.equipped_badge_id, UserBadge, UserBadge.badge_id),
+}
+
+
+def equip(db: Session, user_id: int, slot: str, item_id: int) -> bool:
+    """
+    Надеть предмет. Владение проверяется в том же UPDATE (EXISTS по уникальному
+    индексу владения). False — предмета у пользователя нет. Коммитит вызывающий.
+    """
+    column, model, item_column = SLOTS[slot]
+    owned = (
+        select(model.id)
+        .where(model.user_id == user_id, item_column == item_id)
+        .exists()
+    )
+    return bool(db.execute(
+        update(User)
+        .where(User.id == user_id, owned)
+        .values({column.key: item_id})
+        .execution_options(synchronize_session=False)
+    ).rowcount)
+
+
+def unequip(db: Session, user_id: int, slot: str, item_id: int | None = None) -> None:
+    """Снять предмет из слота (если указан item_id — только если надет именно он)."""
+    column, _, _ = SLOTS[slot]
+    criteria = [User.id == user_id]
+    if item_id is not None:
+        criteria.append(column == item_id)
+    db.execute(
+        update(User).where(*criteria).values({column.key: None})
+        .execution_options(synchronize_session=False)
+    )
+
+
+def load_inventory(db: Session, user_id: int) -> InventoryProjection:
+    return _project(db.execute(inventory_query(user_id)))
+
+
+async def load_inventory_async(db: AsyncSession, user_id: int) -> InventoryProjection:
+    return _project(await db.execute(inventory_query(user_id)))
@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict, defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from backend.models import User, Tournament, TournamentStanding
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # без sortedcontainers — тот же интерфейс на bisect
+    SortedList = None
+
+# доска живёт в процессе: изменения этого воркера применяются сразу после коммита,
+# чужие — при перезагрузке доски раз в TTL
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL_SECONDS", "300"))
+MAX_PAGE_SIZE = 100
+# досок стран и дисциплин может быть много — держим только последние по обращению
+MAX_BOARDS = int(os.getenv("LEADERBOARD_MAX_BOARDS", "64"))
+
+USER_METRICS = {"xp": User.xp_total, "coins": User.coins}
+
+
+class _BisectList:
+    """Запасной SortedList: поиск O(log n), вставка и удаление — O(n) memmove."""
+
+    def __init__(self, items=()):
+        self._items = sorted(items)
+
+    def add(self, value):
+        insort(self._items, value)
+
+    def remove(self, value):
+        i = bisect_left(self._items, value)
+        if i == len(self._items) or self._items[i] != value:
+            raise ValueError(value)
+        del self._items[i]
+
+    def bisect_left(self, value):
+        return bisect_left(self._items, value)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Ranking:
+    """
+    Счёт по id + упорядоченные ключи (−счёт, id).
+    Место — один bisect (O(log n)), страница топа — срез, обновление — O(log n).
+    Равные очки делят место (1, 2, 2, 4).
+    """
+
+    def __init__(self, scores: dict[int, int]):
+        self.scores = dict(scores)
+        keys = ((-score, item_id) for item_id, score in self.scores.items())
+        self._keys = SortedList(keys) if SortedList is not None else _BisectList(keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def set(self, item_id: int, score: int) -> None:
+        old = self.scores.get(item_id)
+        if old is not None:
+            self._keys.remove((-old, item_id))
+        self.scores[item_id] = score
+        self._keys.add((-score, item_id))
+
+    def add(self, item_id: int, delta: int) -> None:
+        if item_id in self.scores:
+            self.set(item_id, self.scores[item_id] + delta)
+
+    def rank(self, item_id: int) -> int | None:
+        score = self.scores.get(item_id)
+        if score is None:
+            return None
+        # (−score,) меньше любого (−score, id): слева — только строго большие счёты
+        return self._keys.bisect_left((-score,)) + 1
+
+    def page(self, limit: int, offset: int = 0) -> list[tuple[int, int, int]]:
+        """[(место, id, счёт)] — срез упорядоченных ключей."""
+        return [
+            (self._keys.bisect_left((neg,)) + 1, item_id, -neg)
+            for neg, item_id in self._keys[offset:offset + limit]
+        ]
+
+
+# -----------------------------------------------------
+# Доски: (вид, метрика, область) → Ranking
+# -----------------------------------------------------
+_lock = threading.RLock()
+_boards: "OrderedDict[tuple, tuple[float, Ranking]]" = OrderedDict()
+
+
+def _load_users(db: Session, metric: str, country: str | None) -> Ranking:
+    # один проход по индексу ix_users_<metric> / ix_users_country_xp; порядок индекса
+    # заодно делает начальную сортировку ключей почти линейной
+    column = USER_METRICS[metric]
+    query = select(User.id, func.coalesce(column, 0))
+    if country is not None:
+        query = query.where(User.country == country)
+    return Ranking(dict(db.execute(query.order_by(column.desc(), User.id)).all()))
+
+
+def _load_teams(db: Session, discipline: str) -> Ranking:
+    # очки команды по всем турнирам дисциплины (таблицы турниров уже посчитаны)
+    return Ranking(dict(db.execute(
+        select(TournamentStanding.team_id, func.sum(TournamentStanding.points))
+        .join(Tournament, Tournament.id == TournamentStanding.tournament_id)
+        .where(Tournament.discipline == discipline)
+        .group_by(TournamentStanding.team_id)
+    ).all()))
+
+
+def _cached(key: tuple) -> Ranking | None:
+    with _lock:
+        cached = _boards.get(key)
+        if cached is not None and time.monotonic() - cached[0] < LEADERBOARD_TTL:
+            _boards.move_to_end(key)
+            return cached[1]
+    return None
+
+
+def _board(key: tuple, load) -> Ranking:
+    ranking = _cached(key)
+    if ranking is not None:
+        return ranking
+    ranking = load()
+    with _lock:
+        _boards[key] = (time.monotonic(), ranking)
+        _boards.move_to_end(key)
+        while len(_boards) > MAX_BOARDS:
+            _boards.popitem(last=False)
+    return ranking
+
+
+def user_board(db: Session, metric: str = "xp", country: str | None = None) -> Ranking:
+    if metric not in USER_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'")
+    return _board(("users", metric, country), lambda: _load_users(db, metric, country))
+
+
+def team_board(db: Session, discipline: str) -> Ranking:
+    return _board(("teams", "points", discipline), lambda: _load_teams(db, discipline))
+
+
+def user_rank(db: Session, user_id: int, metric: str = "xp", country: str | None = None) -> int | None:
+    """
+    Место пользователя. Доску сам не загружает (профиль не должен читать всю
+    таблицу): есть в памяти — bisect, иначе (или пользователя в ней ещё нет) —
+    счёт по индексу ix_users_<metric>: сколько строк со счётом строго больше.
+    """
+    if metric not in USER_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'")
+    board = _cached(("users", metric, country))
+    rank = board.rank(user_id) if board is not None else None
+    if rank is not None:
+        return rank
+
+    column = USER_METRICS[metric]
+    score = db.scalar(select(func.coalesce(column, 0)).where(User.id == user_id))
+    if score is None:
+        return None
+    query = select(func.count()).where(column > score)
+    if country is not None:
+        query = query.where(User.country == country)
+    return db.scalar(query) + 1
+
+
+def invalidate_boards() -> None:
+    with _lock:
+        _boards.clear()
+
+
+# -----------------------------------------------------
+# Инкрементальные обновления после коммита
+# -----------------------------------------------------
+_PENDING = "leaderboard_changes"
+
+
+def note_changes(db: Session, metric: str, deltas: dict[int, int]) -> None:
+    """Запомнить изменения счёта; в доски попадут только после успешного коммита."""
+    pending = db.info.setdefault(_PENDING, defaultdict(Counter))
+    pending[metric].update(deltas)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    with _lock:
+        for (kind, metric, _), (_, ranking) in _boards.items():
+            if kind != "users" or metric not in pending:
+                continue
+            # в досках стран пользователь есть только в своей — add() остальных пропускает
+            for user_id, delta in pending[metric].items():
+                ranking.add(user_id, delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changes(session: Session) -> None:
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,261 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, Base
+from backend.models import User, EmailVerificationCode, MaintenanceLock, MaintenanceRun
+
+ENABLED = os.getenv("MAINTENANCE_ENABLED", "1") == "1"
+TICK_SECONDS = float(os.getenv("MAINTENANCE_TICK_SECONDS", "30"))
+BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+BATCH_PAUSE = float(os.getenv("MAINTENANCE_BATCH_PAUSE", "0.2"))
+LEASE_SECONDS = 300   # сколько держим задачу без продления (упавший воркер отпустит её сам)
+RETRY_SECONDS = 300   # повтор после ошибки
+
+# имя воркера в логах и в таблице блокировок
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------
+# Аренда задачи (одна на кластер)
+# -----------------------------------------------------
+def try_acquire(db: Session, name: str, owner: str, lease: int = LEASE_SECONDS) -> bool:
+    """
+    Строка maintenance_locks одновременно и блокировка, и расписание:
+    locked_until — конец аренды во время прогона и время следующего запуска после него.
+    Захватить можно только просроченную строку — условный UPDATE атомарен.
+    """
+    now = datetime.utcnow()
+    taken = db.execute(
+        update(MaintenanceLock)
+        .where(MaintenanceLock.name == name, MaintenanceLock.locked_until < now)
+        .values(owner=owner, locked_until=now + timedelta(seconds=lease))
+    ).rowcount
+    if not taken:
+        try:
+            db.execute(insert(MaintenanceLock).values(
+                name=name, owner=owner, locked_until=now + timedelta(seconds=lease),
+            ))
+            taken = 1
+        except IntegrityError:
+            # строка есть и аренда не истекла — задачу ведёт другой воркер
+            db.rollback()
+            return False
+    db.commit()
+    return bool(taken)
+
+
+def extend_lease(db: Session, name: str, owner: str, seconds: int) -> bool:
+    """Продлить (или перенести на следующий запуск) — только свою аренду."""
+    extended = db.execute(
+        update(MaintenanceLock)
+        .where(MaintenanceLock.name == name, MaintenanceLock.owner == owner)
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=seconds))
+    ).rowcount
+    db.commit()
+    return bool(extended)
+
+
+# -----------------------------------------------------
+# Прогон задачи
+# -----------------------------------------------------
+class LeaseLost(Exception):
+    """Аренду перехватил другой воркер — прекращаем работу."""
+
+
+@dataclass
+class JobRun:
+    name: str
+    db: Session
+    owner: str = WORKER_ID
+    batch_size: int = BATCH_SIZE
+    pause: float = BATCH_PAUSE
+    stop: threading.Event = field(default_factory=threading.Event)
+    rows: int = 0
+    batches: int = 0
+
+    def checkpoint(self, affected: int) -> None:
+        """После каждой пачки: коммит, счётчики, продление аренды, пауза."""
+        self.db.commit()
+        self.rows += affected
+        self.batches += 1
+        if not extend_lease(self.db, self.name, self.owner, LEASE_SECONDS):
+            raise LeaseLost(self.name)
+        if self.pause:
+            self.stop.wait(self.pause)
+
+    def delete_in_batches(self, model, *criteria) -> int:
+        """
+        DELETE пачками по первичному ключу: каждая транзакция короткая,
+        между пачками другие запросы успевают взять блокировки таблицы.
+        """
+        deleted = 0
+        while not self.stop.is_set():
+            ids = self.db.execute(
+                select(model.id).where(*criteria).order_by(model.id).limit(self.batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            affected = self.db.execute(
+                delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            deleted += affected
+            self.checkpoint(affected)
+        return deleted
+
+
+@dataclass
+class MaintenanceJob:
+    name: str
+    interval: int  # секунды между запусками
+    run: Callable[[JobRun], None]
+
+
+JOBS: dict[str, MaintenanceJob] = {}
+
+
+def register_job(name: str, interval: int):
+    """Декоратор: функция (run: JobRun) -> None становится периодической задачей."""
+    def decorator(func):
+        JOBS[name] = MaintenanceJob(name, interval, func)
+        return func
+    return decorator
+
+
+def run_job(job: MaintenanceJob, owner: str = WORKER_ID, stop: threading.Event | None = None) -> MaintenanceRun | None:
+    """
+    Один прогон, если аренда свободна. Возвращает запись о прогоне
+    (или None — задачу сейчас выполняет / уже выполнил другой воркер).
+    """
+    db = SessionLocal()
+    try:
+        if not try_acquire(db, job.name, owner):
+            return None
+
+        started = datetime.utcnow()
+        record = MaintenanceRun(job=job.name, owner=owner, started_at=started, status="running")
+        db.add(record)
+        db.commit()
+
+        run = JobRun(job.name, db, owner=owner, stop=stop or threading.Event())
+        next_in = job.interval
+        try:
+            job.run(run)
+            db.commit()
+            record.status = "ok"
+        except Exception:
+            db.rollback()
+            record.status = "failed"
+            record.error = traceback.format_exc(limit=5)
+            next_in = min(job.interval, RETRY_SECONDS)
+
+        finished = datetime.utcnow()
+        record.finished_at = finished
+        record.duration_ms = int((finished - started).total_seconds() * 1000)
+        record.rows_affected = run.rows
+        record.batches = run.batches
+        db.commit()
+
+        # аренда остаётся за нами до следующего запуска — остальные воркеры его пропустят
+        extend_lease(db, job.name, owner, next_in)
+        db.refresh(record)
+        db.expunge(record)
+        return record
+    finally:
+        db.close()
+
+
+# -----------------------------------------------------
+# Планировщик (поток на воркер, работу делает владелец аренды)
+# -----------------------------------------------------
+class MaintenanceScheduler:
+    def __init__(self, jobs: dict[str, MaintenanceJob] = JOBS, tick: float = TICK_SECONDS):
+        self.jobs = jobs
+        self.tick = tick
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            for job in list(self.jobs.values()):
+                if self._stop.is_set():
+                    break
+                try:
+                    run_job(job, stop=self._stop)
+                except Exception:
+                    # БД недоступна и т.п. — попробуем на следующем тике
+                    logger.exception("maintenance job failed", extra={"job": job.name})
+            self._stop.wait(self.tick)
+
+
+scheduler = MaintenanceScheduler()
+
+
+# -----------------------------------------------------
+# Задачи
+# -----------------------------------------------------
+INCOMPLETE_USER_TTL = timedelta(hours=24)
+
+
+def _user_owned_columns():
+    """Колонки всех таблиц со ссылкой на users.id (по метаданным — новые таблицы учтутся сами)."""
+    for table in Base.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            if fk.column.table is User.__table__ and table is not User.__table__:
+                yield table, fk.parent
+
+
+@register_job("incomplete_users", interval=3600)
+def delete_incomplete_users(run: JobRun) -> None:
+    """Незавершённые регистрации старше суток — пачками вместе с зависимыми строками."""
+    cutoff = datetime.utcnow() - INCOMPLETE_USER_TTL
+    while not run.stop.is_set():
+        ids = run.db.execute(
+            select(User.id)
+            .where(User.profile_completed == False, User.created_at < cutoff)
+            .order_by(User.id)
+            .limit(run.batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        for table, column in _user_owned_columns():
+            if column.nullable and column.name == "created_by":
+                # созданные команды/турниры оставляем, только отвязываем автора
+                run.db.execute(update(table).where(column.in_(ids)).values({column.name: None}))
+            else:
+                run.db.execute(delete(table).where(column.in_(ids)))
+        affected = run.db.execute(
+            delete(User).where(User.id.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+        run.checkpoint(affected)
+
+
+@register_job("expired_email_codes", interval=900)
+def delete_expired_email_codes(run: JobRun) -> None:
+    # коды сравниваются с локальным временем (см. services/verification.py)
+    run.delete_in_batches(EmailVerificationCode, EmailVerificationCode.expires_at < datetime.now())
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+import unicodedata
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import AsyncSessionLocal
+from backend.models import User
+
+NICKNAME_MAX = 100  # длина users.nickname
+SEARCH_MIN_PREFIX = 2
+SEARCH_MAX_LIMIT = 20
+
+# фильтр живёт в процессе: свои новые ники добавляются сразу, чужие (другие воркеры)
+# и освободившиеся — при пересборке раз в TTL. Окончательно решает уникальный индекс.
+NICKNAME_FILTER_TTL = float(os.getenv("NICKNAME_FILTER_TTL_SECONDS", "300"))
+FALSE_POSITIVE_RATE = 0.01
+
+logger = logging.getLogger(__name__)
+
+
+class NicknameError(ValueError):
+    """Ник пустой, слишком длинный или уже занят."""
+
+
+def nickname_key(nickname: str) -> str:
+    """Ключ уникальности: 'Ｎｉｃｋ ', 'nick' и 'NICK' — один и тот же ник."""
+    return unicodedata.normalize("NFKC", nickname).strip().casefold()
+
+
+def clean_nickname(nickname: str) -> str:
+    nickname = (nickname or "").strip()
+    if not nickname:
+        raise NicknameError("Nickname is required")
+    if len(nickname) > NICKNAME_MAX or len(nickname_key(nickname)) > NICKNAME_MAX:
+        raise NicknameError(f"Nickname must be at most {NICKNAME_MAX} characters")
+    return nickname
+
+
+# -----------------------------------------------------
+# Фильтр Блума: «точно свободен» без запроса в БД
+# -----------------------------------------------------
+class BloomFilter:
+    """
+    Битовый массив + k хэшей (двойное хэширование по blake2b).
+    Нет в фильтре — ключа точно нет; есть — возможно есть (проверяем в БД).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = FALSE_POSITIVE_RATE):
+        capacity = max(capacity, 1024)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+# Пересборка идёт фоновой задачей со своей сессией: запросы её не ждут, а до первой
+# сборки (или после сбоя) проверяют ник сразу по индексу.
+_filter: BloomFilter | None = None
+_next_refresh = 0.0
+_refresh: asyncio.Task | None = None
+_remembered: list[str] | None = None  # ники, занятые во время пересборки
+
+
+async def _rebuild() -> None:
+    global _filter, _next_refresh, _remembered
+    _remembered = []
+    try:
+        async with AsyncSessionLocal() as db:
+            keys = await db.stream_scalars(
+                select(User.nickname_key).where(User.nickname_key.isnot(None))
+                .execution_options(yield_per=10_000)
+            )
+            loaded = [key async for key in keys]
+        # запас на рост до следующей пересборки
+        bloom = BloomFilter(capacity=len(loaded) * 2)
+        for key in loaded:
+            bloom.add(key)
+        # занятые после начала чтения могли не попасть в выборку
+        for key in _remembered:
+            bloom.add(key)
+        _filter, _next_refresh = bloom, time.monotonic() + NICKNAME_FILTER_TTL
+    except Exception:
+        logger.exception("nickname filter rebuild failed")
+    finally:
+        _remembered = None
+
+
+def _taken_filter() -> BloomFilter | None:
+    """Текущий фильтр (None — ещё не собран); устаревший пересобирается в фоне."""
+    global _refresh, _next_refresh
+    if time.monotonic() >= _next_refresh:
+        loop = asyncio.get_running_loop()
+        if _refresh is None or _refresh.done() or _refresh.get_loop() is not loop:
+            # сбой пересборки повторяем не раньше, чем через TTL
+            _next_refresh = time.monotonic() + NICKNAME_FILTER_TTL
+            _refresh = loop.create_task(_rebuild())
+    return _filter
+
+
+def remember(nickname: str) -> None:
+    """Ник только что заняли (или оказалось, что занят) — сразу видим его в фильтре."""
+    global _next_refresh
+    key = nickname_key(nickname)
+    if _remembered is not None:
+        _remembered.append(key)
+    if _filter is not None:
+        _filter.add(key)
+        if _filter.count >= _filter.capacity:
+            # заполнен — ложных «занят» всё больше, пересобираем с запасом
+            _next_refresh = 0.0
+
+
+# -----------------------------------------------------
+# Проверка и поиск
+# -----------------------------------------------------
+async def is_available(db: AsyncSession, nickname: str, user_id: int | None = None) -> bool:
+    """Свой текущий ник (user_id) считается свободным."""
+    try:
+        key = nickname_key(clean_nickname(nickname))
+    except NicknameError:
+        return False
+
+    bloom = _taken_filter()
+    if bloom is not None and key not in bloom:
+        return True
+    owner = (await db.execute(select(User.id).where(User.nickname_key == key))).scalar_one_or_none()
+    return owner is None or owner == user_id
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def search(db: AsyncSession, prefix: str, limit: int = 10) -> list:
+    """Игроки, чей ник начинается с prefix (без учёта регистра) — диапазон по индексу ника."""
+    key = nickname_key(prefix or "")
+    if len(key) < SEARCH_MIN_PREFIX:
+        return []
+    rows = await db.execute(
+        select(User.id, User.nickname, User.avatar, User.level)
+        .where(User.nickname_key.like(_escape_like(key) + "%", escape="\\"))
+        .order_by(User.nickname_key)
+        .limit(min(limit, SEARCH_MAX_LIMIT))
+    )
+    return rows.all()
@@ -0,0 +1,102 @@
+"""
+Хэширование паролей вне event loop и вне пула потоков.
+
+bcrypt — сотни миллисекунд CPU на вызов. Вызовы уходят в отдельный пул процессов
+с ограниченной очередью: при наплыве логинов лишние запросы сразу получают 503,
+а не занимают потоки, которые нужны остальным эндпоинтам.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# сколько вызовов может ждать воркера (включая выполняющиеся)
+MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(HASH_WORKERS * 4)))
+DEADLINE = float(os.getenv("PASSWORD_DEADLINE", "5"))
+
+# ✅ один контекст на всё приложение; min=max=rounds — при смене стоимости
+# старые хэши считаются устаревшими и пересчитываются при следующем логине
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordServiceBusy(RuntimeError):
+    """Очередь хэширования заполнена или не уложились в срок — main отдаёт 503."""
+
+
+# -----------------------------------------------------
+# Выполняется в процессах пула
+# -----------------------------------------------------
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    if not hashed:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(password, hashed)
+    except ValueError:  # в БД не bcrypt-хэш
+        return False, None
+
+
+# -----------------------------------------------------
+# Пул и ограничение очереди
+# -----------------------------------------------------
+_pool: ProcessPoolExecutor | None = None
+_pending = 0
+
+
+def _hash_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # fork скопировал бы потоки и открытые соединения воркера (БД, логи, почта) —
+        # процессы пула стартуют из чистого интерпретатора
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= MAX_PENDING:
+        raise PasswordServiceBusy("Password queue is full")
+
+    _pending += 1
+    future = _hash_pool().submit(fn, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), DEADLINE)
+    except asyncio.TimeoutError:
+        # ещё не начатый вызов снимается с очереди и не тратит CPU
+        future.cancel()
+        raise PasswordServiceBusy("Password check timed out")
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """
+    (совпал ли пароль, новый хэш или None). Новый хэш приходит, когда сохранённый
+    сделан со старой стоимостью — вызывающий записывает его в users.password.
+    """
+    return await _run(_verify_and_update, password, hashed)
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import exists, select, update
+from sqlalchemy.orm import Session
+
+from backend.models import Tournament, Match, Team, TournamentStanding, tournament_participants
+from backend.services.achievements import earned_xp, record
+from backend.services.bracket_generator import match_outcome
+from backend.services.bracket_view import ELIMINATION_FORMATS
+from backend.services.coins import credit_many
+from backend.services.xp import award_xp
+
+# место → (XP, монеты); награда достаётся создателю (капитану) команды
+PLACE_REWARDS = ((500, 300), (300, 150), (200, 75))
+PARTICIPATION_REWARD = (100, 0)
+
+
+class RewardsAlreadyGranted(ValueError):
+    def __init__(self):
+        super().__init__("Tournament rewards were already granted")
+
+
+@dataclass(frozen=True)
+class RewardReport:
+    placements: list[int]   # команды по местам
+    users: int
+    xp: int
+    coins: int
+    achievements: int
+
+
+# -----------------------------------------------------
+# Итоговые места
+# -----------------------------------------------------
+def _unfinished(db: Session, tournament_id: int) -> bool:
+    """Есть несыгранный матч или не сыграно ни одного (сетку не сгенерировали)."""
+    pending = exists().where(
+        Match.tournament_id == tournament_id,
+        Match.team1_id.is_not(None), Match.team2_id.is_not(None),
+        Match.score_team1.is_(None),
+    )
+    played = exists().where(Match.tournament_id == tournament_id, Match.score_team1.is_not(None))
+    return db.scalar(select(pending | ~played))
+
+
+def _final_match(db: Session, tournament_id: int) -> Match | None:
+    """Матч, из которого некуда идти дальше: гранд-финал, иначе финал основной сетки."""
+    finals = db.execute(
+        select(Match).where(
+            Match.tournament_id == tournament_id,
+            Match.next_match_id.is_(None),
+            Match.bracket.in_(("main", "grand_final")),
+        )
+    ).scalars().all()
+    return max(finals, key=lambda m: (m.bracket == "grand_final", m.round_number or 0), default=None)
+
+
+def final_placements(db: Session, tournament: Tournament) -> list[int]:
+    """
+    Команды по итоговым местам: в сетке на выбывание первые двое — из финала,
+    дальше (и во всех остальных форматах) — по турнирной таблице.
+    """
+    if _unfinished(db, tournament.id):
+        raise ValueError("Tournament is not finished")
+
+    placements = []
+    if tournament.format in ELIMINATION_FORMATS:
+        final = _final_match(db, tournament.id)
+        champion, runner_up = match_outcome(final) if final else (None, None)
+        if champion is None:
+            raise ValueError("Tournament is not finished")
+        placements = [champion, runner_up]
+
+    standings = db.execute(
+        select(TournamentStanding.team_id)
+        .where(TournamentStanding.tournament_id == tournament.id)
+        .order_by(
+            TournamentStanding.points.desc(),
+            TournamentStanding.goal_diff.desc(),
+            TournamentStanding.scored.desc(),
+        )
+    ).scalars().all()
+    participants = db.execute(
+        select(tournament_participants.c.team_id)
+        .where(tournament_participants.c.tournament_id == tournament.id)
+    ).scalars().all()
+
+    for team_id in (*standings, *participants):
+        if team_id not in placements:
+            placements.append(team_id)
+    return placements
+
+
+# -----------------------------------------------------
+# Выдача наград
+# -----------------------------------------------------
+def finalize_tournament(db: Session, tournament: Tournament) -> RewardReport:
+    """
+    Завершает турнир и раздаёт награды одной транзакцией (коммитит вызывающий):
+    - отметка rewards_granted_at — условный UPDATE, повторный/параллельный вызов
+      получает RewardsAlreadyGranted и ничего не выдаёт
+    - XP всем участникам — один UPDATE (services/xp.award_xp)
+    - монеты — одна пачка через журнал (services/coins.credit_many)
+    - ачивки — одна пачка через счётчики (services/achievements.record),
+      XP за них входит в тот же UPDATE
+    """
+    placements = final_placements(db, tournament)
+
+    marked = db.execute(
+        update(Tournament)
+        .where(Tournament.id == tournament.id, Tournament.rewards_granted_at.is_(None))
+        .values(rewards_granted_at=datetime.utcnow(), status="Completed")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not marked:
+        raise RewardsAlreadyGranted()
+
+    captains = dict(db.execute(
+        select(Team.id, Team.created_by).where(Team.id.in_(placements), Team.created_by.is_not(None))
+    ).all())
+
+    # капитан нескольких команд получает награду за лучшее место
+    xp, coins = {}, {}
+    for place, team_id in enumerate(placements):
+        user_id = captains.get(team_id)
+        if user_id is None or user_id in xp:
+            continue
+        xp[user_id], coins[user_id] = PLACE_REWARDS[place] if place < len(PLACE_REWARDS) else PARTICIPATION_REWARD
+
+    # ачивки за турнир — одной пачкой через счётчики; их XP входит в тот же UPDATE
+    champion = captains.get(placements[0]) if placements else None
+    earned = record(db, {champion: {"tournaments_won": 1}}) if champion is not None else []
+    for user_id, amount in earned_xp(earned).items():
+        xp[user_id] = xp.get(user_id, 0) + amount
+
+    award_xp(db, xp)
+    credit_many(db, coins, "reward", idempotency_key=f"tournament-{tournament.id}")
+
+    return RewardReport(
+        placements=placements,
+        users=len(xp),
+        xp=sum(xp.values()),
+        coins=sum(coins.values()),
+        achievements=len(earned),
+    )
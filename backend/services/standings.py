@@ -0,0 +1,179 @@
+from collections import defaultdict
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from backend.models import Match, TournamentStanding
+
+STAT_FIELDS = ("played", "wins", "draws", "losses", "scored", "conceded", "goal_diff", "points")
+
+
+class MatchResult(NamedTuple):
+    """Срез матча, от которого зависит таблица."""
+    team1_id: int | None
+    team2_id: int | None
+    score_team1: int | None
+    score_team2: int | None
+
+    @classmethod
+    def of(cls, match: Match) -> "MatchResult":
+        return cls(match.team1_id, match.team2_id, match.score_team1, match.score_team2)
+
+
+def match_contribution(result: MatchResult | None) -> dict[int, dict[str, int]]:
+    """
+    Вклад одного матча в таблицу: {team_id: {поле: дельта}}.
+    Матч без одной из команд или без счёта (ещё не сыгран) ничего не даёт.
+    """
+    if result is None:
+        return {}
+    t1, t2, s1, s2 = result
+    if not t1 or not t2 or s1 is None or s2 is None:
+        return {}
+
+    out = {}
+    for team_id, scored, conceded in ((t1, s1, s2), (t2, s2, s1)):
+        win, draw = scored > conceded, scored == conceded
+        out[team_id] = {
+            "played": 1,
+            "wins": int(win),
+            "draws": int(draw),
+            "losses": int(not win and not draw),
+            "scored": scored,
+            "conceded": conceded,
+            "goal_diff": scored - conceded,
+            "points": 3 if win else 1 if draw else 0,
+        }
+    return out
+
+
+def compute_standings(results: Iterable[MatchResult]) -> dict[int, dict[str, int]]:
+    """Полный пересчёт с нуля: {team_id: статистика}."""
+    table: dict[int, dict[str, int]] = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    for result in results:
+        for team_id, delta in match_contribution(result).items():
+            row = table[team_id]
+            for field, value in delta.items():
+                row[field] += value
+    return dict(table)
+
+
+# -----------------------------------------------------
+# Инкрементальное обновление
+# -----------------------------------------------------
+def apply_match_change(
+    db: Session,
+    tournament_id: int,
+    before: MatchResult | None,
+    after: MatchResult | None,
+) -> None:
+    """
+    Переносит в таблицу разницу между старым и новым результатом матча.
+    Трогает максимум 4 строки (две команды до и после), commit делает вызывающий.
+    """
+    deltas: dict[int, dict[str, int]] = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    for sign, result in ((-1, before), (1, after)):
+        for team_id, delta in match_contribution(result).items():
+            for field, value in delta.items():
+                deltas[team_id][field] += sign * value
+
+    for team_id, delta in deltas.items():
+        if not any(delta.values()):
+            continue
+        _add_to_row(db, tournament_id, team_id, delta)
+
+
+def _add_to_row(db: Session, tournament_id: int, team_id: int, delta: dict[str, int]) -> None:
+    values = {field: getattr(TournamentStanding, field) + value for field, value in delta.items()}
+    stmt = (
+        update(TournamentStanding)
+        .where(
+            TournamentStanding.tournament_id == tournament_id,
+            TournamentStanding.team_id == team_id,
+        )
+        .values(**values)
+    )
+    if db.execute(stmt).rowcount:
+        return
+
+    # строки ещё нет — создаём; при гонке с параллельной вставкой повторяем UPDATE
+    try:
+        with db.begin_nested():
+            db.execute(insert(TournamentStanding).values(
+                tournament_id=tournament_id, team_id=team_id, **delta
+            ))
+    except IntegrityError:
+        db.execute(stmt)
+
+
+def rebuild_standings(db: Session, tournament_id: int) -> int:
+    """Пересобирает таблицу турнира с нуля. Возвращает число строк."""
+    table = compute_standings(_load_results(db, tournament_id))
+
+    db.execute(delete(TournamentStanding).where(TournamentStanding.tournament_id == tournament_id))
+    if table:
+        db.execute(insert(TournamentStanding), [
+            {"tournament_id": tournament_id, "team_id": team_id, **row}
+            for team_id, row in table.items()
+        ])
+    return len(table)
+
+
+def _load_results(db: Session, tournament_id: int) -> list[MatchResult]:
+    rows = db.execute(
+        select(Match.team1_id, Match.team2_id, Match.score_team1, Match.score_team2)
+        .where(Match.tournament_id == tournament_id)
+    ).all()
+    return [MatchResult(*row) for row in rows]
+
+
+# -----------------------------------------------------
+# Чтение
+# -----------------------------------------------------
+def standings_query(tournament_id: int):
+    """Один индексированный запрос (ix_standings_order) с командой в join."""
+    return (
+        select(TournamentStanding)
+        .options(joinedload(TournamentStanding.team))
+        .where(TournamentStanding.tournament_id == tournament_id)
+        .order_by(
+            TournamentStanding.points.desc(),
+            TournamentStanding.goal_diff.desc(),
+            TournamentStanding.scored.desc(),
+        )
+    )
+
+
+def get_standings(db: Session, tournament_id: int) -> list[TournamentStanding]:
+    return db.execute(standings_query(tournament_id)).scalars().all()
+
+
+def check_standings_consistency(db: Session, tournament_id: int) -> list[dict]:
+    """
+    Сравнивает сохранённую таблицу с пересчётом с нуля.
+    Возвращает расхождения: [{"team_id", "field", "stored", "expected"}].
+    """
+    expected = compute_standings(_load_results(db, tournament_id))
+    stored = {
+        row.team_id: {field: getattr(row, field) for field in STAT_FIELDS}
+        for row in db.execute(
+            select(TournamentStanding).where(TournamentStanding.tournament_id == tournament_id)
+        ).scalars()
+    }
+
+    zero = dict.fromkeys(STAT_FIELDS, 0)
+    problems = []
+    for team_id in sorted(expected.keys() | stored.keys()):
+        have = stored.get(team_id, zero)
+        want = expected.get(team_id, zero)
+        for field in STAT_FIELDS:
+            if have[field] != want[field]:
+                problems.append({
+                    "team_id": team_id,
+                    "field": field,
+                    "stored": have[field],
+                    "expected": want[field],
+                })
+    return problems
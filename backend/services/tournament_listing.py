@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import Tournament
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+PRICE_FILTERS = {"free", "paid"}
+
+
+# -----------------------------------------------------
+# Курсор: (start_date, id) последней строки страницы
+# -----------------------------------------------------
+def encode_cursor(tournament: Tournament) -> str:
+    start = tournament.start_date.isoformat() if tournament.start_date else None
+    raw = json.dumps({"d": start, "i": tournament.id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, int]:
+    """ValueError, если курсор повреждён."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        start = datetime.fromisoformat(data["d"]) if data["d"] is not None else None
+        return start, int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+# -----------------------------------------------------
+# Запрос
+# -----------------------------------------------------
+def listing_query(
+    discipline: str | None = None,
+    format: str | None = None,
+    status: str | None = None,
+    price: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    """
+    Фильтры — равенства по индексированным колонкам, порядок (start_date, id)
+    совпадает с хвостом составных индексов, поэтому страница читается
+    диапазоном индекса без сортировки всей таблицы.
+    NULL в start_date («дата TBA») идут первыми — так сортируют и MySQL, и SQLite.
+    Берём limit + 1 строку, чтобы понять, есть ли следующая страница.
+    """
+    query = select(Tournament)
+
+    if discipline:
+        query = query.where(Tournament.discipline == discipline)
+    if format:
+        query = query.where(Tournament.format == format)
+    if status:
+        query = query.where(Tournament.status == status)
+    if price == "free":
+        query = query.where(Tournament.entry_price == 0)
+    elif price == "paid":
+        query = query.where(Tournament.entry_price > 0)
+
+    if cursor:
+        start, last_id = decode_cursor(cursor)
+        if start is None:
+            query = query.where(or_(
+                and_(Tournament.start_date.is_(None), Tournament.id > last_id),
+                Tournament.start_date.isnot(None),
+            ))
+        else:
+            query = query.where(or_(
+                Tournament.start_date > start,
+                and_(Tournament.start_date == start, Tournament.id > last_id),
+            ))
+
+    return query.order_by(Tournament.start_date.asc(), Tournament.id.asc()).limit(limit + 1)
+
+
+async def fetch_tournament_page(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, **filters):
+    """(турниры страницы, курсор следующей страницы или None)."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = (await db.execute(listing_query(limit=limit, **filters))).scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def tournament_card(tournament: Tournament) -> dict:
+    return {
+        "id": tournament.id,
+        "name": tournament.name,
+        "discipline": tournament.discipline,
+        "format": tournament.format,
+        "status": tournament.status or "Planned",
+        "team_count": tournament.team_count or 0,
+        "entry_price": tournament.entry_price or 0,
+        "start_date": tournament.start_date.isoformat() if tournament.start_date else None,
+    }
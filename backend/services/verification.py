@@ -0,0 +1,163 @@
+"""
+Одноразовые коды подтверждения (смена email и т.п.).
+
+На пользователя и назначение — один активный код: повторная отправка
+перезаписывает строку, а не добавляет новую. Хранится только HMAC кода,
+неверные попытки считаются, после MAX_ATTEMPTS код сгорает.
+Просроченные строки удаляет задача expired_email_codes (services/maintenance.py).
+
+VERIFICATION_BACKEND=memory — коды в памяти процесса (один воркер, тесты):
+проверка вообще не ходит в БД.
+"""
+import hashlib
+import hmac
+import heapq
+import os
+import secrets
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import EmailVerificationCode
+from backend.services.catalog_seed import dialect_insert
+
+EMAIL_CHANGE = "email_change"
+
+CODE_TTL = timedelta(minutes=10)
+CODE_DIGITS = 6
+MAX_ATTEMPTS = 5
+BACKEND = os.getenv("VERIFICATION_BACKEND", "db")
+
+_SECRET = os.getenv("VERIFICATION_SECRET_KEY", os.getenv("SESSION_SECRET_KEY", "supersecretkey123")).encode()
+
+
+class VerificationError(ValueError):
+    """Кода нет, он просрочен, неверен или попытки кончились."""
+
+
+def new_code() -> str:
+    return f"{secrets.randbelow(10 ** CODE_DIGITS):0{CODE_DIGITS}d}"
+
+
+def code_hash(user_id: int, purpose: str, code: str) -> str:
+    # 10^6 вариантов перебираются мгновенно — поэтому HMAC с серверным ключом, а не sha256
+    message = f"{user_id}:{purpose}:{code.strip()}".encode()
+    return hmac.new(_SECRET, message, hashlib.sha256).hexdigest()
+
+
+# -----------------------------------------------------
+# Хранилище в БД (по умолчанию: общее для всех воркеров)
+# -----------------------------------------------------
+class DatabaseCodeStore:
+    async def put(self, db: AsyncSession, user_id: int, purpose: str, digest: str, email: str, expires_at: datetime) -> None:
+        values = {"user_id": user_id, "purpose": purpose, "code_hash": digest,
+                  "email": email, "expires_at": expires_at, "attempts": 0}
+        stmt = dialect_insert(db, EmailVerificationCode).values(values)
+        fresh = {k: v for k, v in values.items() if k not in ("user_id", "purpose")}
+        if db.get_bind().dialect.name in ("mysql", "mariadb"):
+            stmt = stmt.on_duplicate_key_update(fresh)
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=["user_id", "purpose"], set_=fresh)
+        await db.execute(stmt)
+        await db.commit()
+
+    async def check(self, db: AsyncSession, user_id: int, purpose: str, digest: str) -> str:
+        key = (EmailVerificationCode.user_id == user_id, EmailVerificationCode.purpose == purpose)
+        row = (await db.execute(
+            select(EmailVerificationCode.code_hash, EmailVerificationCode.email,
+                   EmailVerificationCode.expires_at, EmailVerificationCode.attempts).where(*key)
+        )).first()
+        if row is None or row.expires_at < datetime.now():
+            raise VerificationError("Invalid or expired code")
+        if row.attempts >= MAX_ATTEMPTS:
+            raise VerificationError("Too many attempts, request a new code")
+
+        if not hmac.compare_digest(row.code_hash, digest):
+            # условный инкремент: параллельные попытки не проскочат лимит
+            await db.execute(
+                update(EmailVerificationCode)
+                .where(*key, EmailVerificationCode.attempts < MAX_ATTEMPTS)
+                .values(attempts=EmailVerificationCode.attempts + 1)
+            )
+            await db.commit()
+            raise VerificationError("Invalid or expired code")
+
+        # код одноразовый: удалить сможет только один из параллельных запросов
+        used = (await db.execute(
+            delete(EmailVerificationCode).where(*key, EmailVerificationCode.code_hash == digest)
+        )).rowcount
+        if not used:
+            raise VerificationError("Invalid or expired code")
+        return row.email
+
+
+# -----------------------------------------------------
+# Хранилище в памяти процесса
+# -----------------------------------------------------
+@dataclass
+class _Entry:
+    digest: str
+    email: str
+    expires_at: datetime
+    attempts: int = 0
+
+
+class MemoryCodeStore:
+    """Словарь с TTL; просроченные записи выметаются кучей по времени истечения."""
+
+    def __init__(self):
+        self._entries: dict[tuple[int, str], _Entry] = {}
+        self._expiry: list[tuple[datetime, tuple[int, str]]] = []
+        self._lock = threading.Lock()
+
+    def _sweep(self, now: datetime) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+
+    async def put(self, db, user_id: int, purpose: str, digest: str, email: str, expires_at: datetime) -> None:
+        with self._lock:
+            self._sweep(datetime.now())
+            self._entries[(user_id, purpose)] = _Entry(digest, email, expires_at)
+            heapq.heappush(self._expiry, (expires_at, (user_id, purpose)))
+
+    async def check(self, db, user_id: int, purpose: str, digest: str) -> str:
+        with self._lock:
+            now = datetime.now()
+            self._sweep(now)
+            entry = self._entries.get((user_id, purpose))
+            if entry is None or entry.expires_at < now:
+                raise VerificationError("Invalid or expired code")
+            if entry.attempts >= MAX_ATTEMPTS:
+                raise VerificationError("Too many attempts, request a new code")
+            if not hmac.compare_digest(entry.digest, digest):
+                entry.attempts += 1
+                raise VerificationError("Invalid or expired code")
+            del self._entries[(user_id, purpose)]
+            return entry.email
+
+    def __len__(self):
+        return len(self._entries)
+
+
+store = MemoryCodeStore() if BACKEND == "memory" else DatabaseCodeStore()
+
+
+# -----------------------------------------------------
+# API для роутеров
+# -----------------------------------------------------
+async def issue_code(db: AsyncSession, user_id: int, email: str, purpose: str = EMAIL_CHANGE) -> str:
+    """Новый код (старый того же назначения перестаёт действовать); сам код — для письма."""
+    code = new_code()
+    await store.put(db, user_id, purpose, code_hash(user_id, purpose, code), email, datetime.now() + CODE_TTL)
+    return code
+
+
+async def consume_code(db: AsyncSession, user_id: int, code: str, purpose: str = EMAIL_CHANGE) -> str:
+    """Проверяет и гасит код; возвращает email, на который он был отправлен."""
+    return await store.check(db, user_id, purpose, code_hash(user_id, purpose, code))
@@ -0,0 +1,75 @@
+from math import isqrt
+
+from sqlalchemy import Integer, case, cast, func, update
+from sqlalchemy.orm import Session
+
+from backend.models import User
+from backend.services.leaderboard import note_changes
+
+# переход с уровня L на L+1 стоит 100 * L XP (как раньше в core/utils),
+# значит для уровня L нужно всего 50 * L * (L - 1) XP
+XP_STEP = 100
+TABLE_LEVELS = 200
+
+
+def xp_threshold(level: int) -> int:
+    """Сколько всего XP нужно, чтобы достичь уровня."""
+    return XP_STEP * level * (level - 1) // 2
+
+
+# LEVEL_THRESHOLDS[L - 1] — порог уровня L (для отрисовки прогресса без формул в шаблонах)
+LEVEL_THRESHOLDS = tuple(xp_threshold(level) for level in range(1, TABLE_LEVELS + 2))
+
+
+def level_for_xp(total_xp: int) -> int:
+    """
+    Уровень по суммарному XP за O(1): наибольшее L с 50·L·(L−1) ≤ X,
+    то есть L = ⌊(5 + √(25 + 2X)) / 10⌋ (целочисленный корень — без ошибок округления).
+    """
+    total_xp = max(total_xp, 0)
+    return (5 + isqrt(25 + 2 * total_xp)) // 10
+
+
+def level_progress(total_xp: int) -> tuple[int, int, int]:
+    """(уровень, XP внутри уровня, XP до следующего уровня всего)."""
+    level = level_for_xp(total_xp)
+    start = LEVEL_THRESHOLDS[level - 1] if level <= TABLE_LEVELS else xp_threshold(level)
+    return level, total_xp - start, XP_STEP * level
+
+
+# -----------------------------------------------------
+# Начисление в БД
+# -----------------------------------------------------
+def _level_expr(total):
+    # та же формула на стороне БД; √ от точного квадрата в double точен
+    return cast(func.floor((5 + func.sqrt(25 + 2 * total)) / 10), Integer)
+
+
+def award_xp(db: Session, awards: dict[int, int]) -> int:
+    """
+    Начисляет XP пачке пользователей одним UPDATE (CASE по id) и сразу
+    пересчитывает level и xp внутри уровня. Коммитит вызывающий.
+    Возвращает число обновлённых строк.
+    """
+    awards = {user_id: amount for user_id, amount in awards.items() if amount}
+    if not awards:
+        return 0
+
+    amount = case(awards, value=User.id, else_=0)
+    new_total = func.coalesce(User.xp_total, 0) + amount
+    new_level = _level_expr(new_total)
+
+    updated = db.execute(
+        update(User)
+        .where(User.id.in_(awards))
+        # MySQL вычисляет SET слева направо уже по новым значениям —
+        # xp_total меняем последним, чтобы level и xp считались от старого
+        .ordered_values(
+            (User.level, new_level),
+            (User.xp, new_total - (XP_STEP // 2) * new_level * (new_level - 1)),
+            (User.xp_total, new_total),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    note_changes(db, "xp", awards)
+    return updated